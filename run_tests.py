@@ -2,6 +2,12 @@ import unittest
 import logging
 import tests.gymdash.file_format
 import tests.gymdash.simulation
+import tests.gymdash.image_grid
+import tests.gymdash.project
+import tests.gymdash.archive
+import tests.gymdash.sweep
+import tests.gymdash.media
+import tests.gymdash.live_view
 
 logging.basicConfig(level=logging.WARNING)
 
@@ -9,4 +15,16 @@ if __name__ == "__main__":
     suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.file_format)
     unittest.TextTestRunner(verbosity=2).run(suite)
     suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.simulation)
-    unittest.TextTestRunner(verbosity=2).run(suite)
\ No newline at end of file
+    unittest.TextTestRunner(verbosity=2).run(suite)
+    suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.image_grid)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+    suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.project)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+    suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.archive)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+    suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.sweep)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+    suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.media)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+    suite = unittest.TestLoader().loadTestsFromModule(tests.gymdash.live_view)
+    unittest.TextTestRunner(verbosity=2).run(suite)
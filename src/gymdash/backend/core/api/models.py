@@ -1,10 +1,10 @@
 from collections.abc import Callable
 from datetime import datetime
 from uuid import UUID
-from typing import Any, Dict, Iterable, List, Tuple, Union
+from typing import Any, Dict, Iterable, List, Literal, Tuple, Union
 import json
 from gymdash.backend.enums import SimStatusCode
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class SimulationStartConfig(BaseModel):
@@ -67,10 +67,112 @@ class StoredSimulationInfo(BaseModel):
     cancelled:  bool                    = False
     failed:     bool                    = False
     force_stopped: bool                 = False
-    config:     SimulationStartConfig
+    # None only when left out of a history query's field projection
+    config:     Union[SimulationStartConfig, None] = None
     start_kwargs: Dict[str, Any]        = {}
     sim_type_name: str                  = None
     sim_module_name: str                = None
+    sim_key:    Union[str, None]        = None
+    # True once the run's folder was packed into a single archive file
+    archived:   bool                    = False
+    # Metric key -> summary statistics. Only set when requested.
+    summaries:  Union[Dict[str, Dict[str, Any]], None] = None
+
+class SimulationHistoryPage(BaseModel):
+    items:      List[StoredSimulationInfo]
+    # Opaque cursor for the next page. None on the last page.
+    next_cursor: Union[str, None]       = None
+
+class ParamFilter(BaseModel):
+    # Dotted path into the stored config, like "kwargs.algorithm" or
+    # "kwargs.algorithm_kwargs.learning_rate". Start kwargs are under
+    # "start_kwargs.".
+    path:       str
+    op:         Literal["eq", "ne", "lt", "le", "gt", "ge", "in"] = "eq"
+    value:      Any                     = None
+
+class ParamQuery(BaseModel):
+    filters:    List[ParamFilter]
+    sim_key:    Union[str, None]        = None
+    limit:      Union[int, None]        = None
+
+class MetricQuery(BaseModel):
+    keys:       List[str]
+    sim_ids:    Union[List[UUID], None] = None
+    sim_key:    Union[str, None]        = None
+    step_min:   Union[int, None]        = None
+    step_max:   Union[int, None]        = None
+    last_only:  bool                    = False # only the final logged value of each run
+    align:      bool                    = False # put every run of a key on the same steps
+    max_points: Union[int, None]        = None
+
+class MetricSeries(BaseModel):
+    sim_id:     UUID
+    steps:      List[int]
+    # None where an aligned run has no value at that step
+    values:     List[Union[float, None]]
+    wall_times: List[Union[float, None]]
+
+class SweepParameter(BaseModel):
+    # Either a list of values to choose from...
+    values:     Union[List[Any], None]  = None
+    # ...or a range to sample from
+    low:        Union[float, None]      = None
+    high:       Union[float, None]      = None
+    scale:      Literal["linear", "log"] = "linear"
+    integer:    bool                    = False
+    # Points taken from a range by grid search
+    grid_points: int                    = Field(0, ge=0)
+
+class EarlyStoppingConfig(BaseModel):
+    # "asha" stops runs outside the best 1/reduction_factor at each rung.
+    # "median" stops runs whose best value is worse than the median
+    # of the other runs' running averages at the same step.
+    policy:     Literal["asha", "median"] = "asha"
+    # Metric key logged with Simulation.log_metric
+    metric:     str
+    mode:       Literal["max", "min"]   = "max"
+    # Step of the first rung, and no run is stopped before it
+    min_step:   int                     = Field(1, ge=1)
+    reduction_factor: int               = Field(3, ge=2)
+    # No rungs past this step. None keeps adding rungs.
+    max_step:   Union[int, None]        = Field(None, ge=1)
+    # Runs the median rule needs to compare against
+    min_runs:   int                     = Field(3, ge=1)
+
+class SweepConfig(BaseModel):
+    name:       str
+    base_config: SimulationStartConfig
+    # Dotted path into the config kwargs, like "algorithm_kwargs.learning_rate",
+    # mapped to the values it is searched over
+    parameters: Dict[str, SweepParameter]
+    strategy:   Literal["grid", "random", "latin_hypercube"] = "grid"
+    # Configurations drawn by random and latin_hypercube search
+    num_samples: int                    = Field(10, ge=1)
+    seed:       Union[int, None]        = None
+    # Most runs of the sweep queued or running at once. 0 hands all
+    # of them to the scheduler immediately.
+    max_parallel: int                   = Field(0, ge=0)
+    priority:   int                     = 0
+    cpu_threads: int                    = Field(1, ge=0)
+    memory_mb:  float                   = Field(0, ge=0)
+    early_stopping: Union[EarlyStoppingConfig, None] = None
+
+class SweepProgress(BaseModel):
+    sweep_id:   UUID
+    name:       str
+    total:      int
+    pending:    int                     = 0 # not yet handed to the scheduler
+    queued:     int                     = 0
+    running:    int                     = 0
+    finished:   int                     = 0
+    failed:     int                     = 0
+    cancelled:  int                     = 0
+    stopped_early: int                  = 0
+    fraction_done: float                = 0
+    sim_ids:    List[UUID]              = []
+    # Simulation ID -> the kwargs paths and values it was given
+    assignments: Dict[UUID, Dict[str, Any]] = {}
 
 class ControlRequestDetails(BaseModel):
     key: str
@@ -1,7 +1,26 @@
+import dataclasses
 from abc import abstractmethod
 from uuid import UUID
 from typing import Dict, Any, List, Iterable
 
+@dataclasses.dataclass(frozen=True)
+class FileEvent:
+    """Takes after tensorboard ImageEvent and AudioEvent, but
+    reads from a source file
+
+    Attributes:
+      wall_time: Timestamp of the event in seconds.
+      step: Global step of the event.
+      encoded_string: Image content encoded in bytes.
+      tag: The file type.
+      src_name: The name of the source file.
+    """
+    wall_time: float
+    step: int
+    encoded_string: bytes
+    tag: str
+    src_name: str
+
 class StreamableStat:
     """
     Class represents an easily appendable stat.
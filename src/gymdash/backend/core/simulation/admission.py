@@ -0,0 +1,178 @@
+import dataclasses
+import logging
+import os
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+try:
+    import psutil
+    _has_psutil = True
+except ImportError:
+    _has_psutil = False
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest run when updating a learned footprint
+FOOTPRINT_ALPHA = 0.3
+
+@dataclasses.dataclass(frozen=True)
+class ResourceFootprint:
+    """Resources a simulation type was seen to use in past runs.
+
+    Attributes:
+      memory_mb: Peak resident memory in megabytes.
+      cpu_percent: Mean CPU use, where 100 is one fully busy core.
+      runs: Number of runs the footprint was learned from.
+    """
+    memory_mb: float
+    cpu_percent: float
+    runs: int = 1
+
+@dataclasses.dataclass(frozen=True)
+class MachineLoad:
+    """
+    Attributes:
+      cpu_percent: Machine-wide CPU use from 0 to 100.
+      memory_available_mb: Memory that can be given to
+        new processes without swapping.
+    """
+    cpu_percent: float
+    memory_available_mb: float
+
+def sample_machine_load() -> Union[MachineLoad, None]:
+    if not _has_psutil:
+        return None
+    return MachineLoad(
+        cpu_percent         = psutil.cpu_percent(interval=None),
+        memory_available_mb = psutil.virtual_memory().available / (1024*1024),
+    )
+
+class AdmissionController:
+    """
+    Decides whether the machine has room for one more simulation.
+
+    A queued simulation is admitted only if the live CPU idle share and
+    available memory, minus what the simulation is expected to use,
+    stay above the configured thresholds. Expected use comes from the
+    footprint learned for the simulation's sim_key, falling back to the
+    weights in its ScheduleOptions. Runs launched in the last warmup
+    seconds have not reached their footprint yet, so it is reserved
+    on top of the live sample until then.
+    """
+    def __init__(
+        self,
+        min_cpu_idle_percent: float = 10,
+        min_memory_available_mb: float = 1024,
+        warmup: float = 30,
+        footprint_loader: Union[Callable[[], Dict[str, ResourceFootprint]], None] = None,
+        sampler: Callable[[], Union[MachineLoad, None]] = sample_machine_load,
+    ) -> None:
+        """
+        Args:
+            min_cpu_idle_percent: Machine CPU share that must stay idle.
+            min_memory_available_mb: Memory that must stay available.
+            warmup: Seconds a new run's footprint stays reserved.
+            footprint_loader: Returns stored footprints by sim_key.
+                Called once by load_footprints(), or by learn() if
+                they were never loaded.
+            sampler: Returns the current MachineLoad, or None
+                when it cannot be measured.
+        """
+        self.configure(min_cpu_idle_percent, min_memory_available_mb)
+        self.warmup = warmup
+        self.footprint_loader = footprint_loader
+        self.sampler = sampler
+        self._lock = Lock()
+        self._footprints: Union[Dict[str, ResourceFootprint], None] = None
+        # (launch time, cpu percent, memory mb) of runs still warming up
+        self._launches: List[Tuple[float, float, float]] = []
+        self._cpu_count = os.cpu_count() or 1
+
+    def configure(self, min_cpu_idle_percent: float = 10, min_memory_available_mb: float = 1024) -> None:
+        self.min_cpu_idle_percent = min_cpu_idle_percent
+        self.min_memory_available_mb = min_memory_available_mb
+
+    def load_footprints(self) -> None:
+        """
+        Loads the stored footprints. Call at startup, so admit() never
+        reads the database while the scheduler lock is held.
+        """
+        footprints = {}
+        if self.footprint_loader is not None:
+            try:
+                footprints = dict(self.footprint_loader())
+            except Exception as e:
+                logger.error(f"AdmissionController could not load footprints: {e}")
+        with self._lock:
+            # Keep anything learned in the meantime
+            footprints.update(self._footprints or {})
+            self._footprints = footprints
+
+    def get_footprint(self, sim_key: Union[str, None]) -> Union[ResourceFootprint, None]:
+        with self._lock:
+            if self._footprints is None:
+                return None
+            return self._footprints.get(sim_key, None)
+
+    def set_footprint(self, sim_key: str, footprint: ResourceFootprint) -> None:
+        with self._lock:
+            if self._footprints is None:
+                self._footprints = {}
+            self._footprints[sim_key] = footprint
+
+    def learn(self, sim_key: str, memory_mb: float, cpu_percent: float) -> ResourceFootprint:
+        """
+        Folds a finished run's measured use into the footprint of its
+        sim_key and returns the result. Memory never drops below the
+        newest peak, so one small run cannot make a large type look
+        cheap.
+        """
+        if self._footprints is None:
+            # Do not start over from nothing and overwrite the stored footprint
+            self.load_footprints()
+        previous = self.get_footprint(sim_key)
+        if previous is None:
+            footprint = ResourceFootprint(memory_mb=memory_mb, cpu_percent=cpu_percent)
+        else:
+            footprint = ResourceFootprint(
+                memory_mb   = max(memory_mb, previous.memory_mb + FOOTPRINT_ALPHA*(memory_mb - previous.memory_mb)),
+                cpu_percent = previous.cpu_percent + FOOTPRINT_ALPHA*(cpu_percent - previous.cpu_percent),
+                runs        = previous.runs + 1,
+            )
+        self.set_footprint(sim_key, footprint)
+        return footprint
+
+    def estimate(self, sim: Any, options: Any) -> Tuple[float, float]:
+        """Returns the (cpu percent, memory mb) a simulation is expected to use."""
+        config = getattr(sim, "config", None)
+        footprint = self.get_footprint(getattr(config, "sim_key", None))
+        if footprint is not None:
+            return (footprint.cpu_percent, footprint.memory_mb)
+        return (100.0 * options.cpu_threads, options.memory_mb)
+
+    def _reserved(self, now: float) -> Tuple[float, float]:
+        self._launches = [launch for launch in self._launches if now - launch[0] < self.warmup]
+        return (
+            sum(launch[1] for launch in self._launches),
+            sum(launch[2] for launch in self._launches),
+        )
+
+    def admit(self, sim: Any, options: Any) -> bool:
+        load = self.sampler()
+        if load is None:
+            # Nothing to go on, leave it to the scheduler's budgets
+            return True
+        cpu_percent, memory_mb = self.estimate(sim, options)
+        with self._lock:
+            reserved_cpu, reserved_memory = self._reserved(time.monotonic())
+        # Per-process CPU percent is per core, machine percent is over all cores
+        projected_cpu = load.cpu_percent + (reserved_cpu + cpu_percent) / self._cpu_count
+        projected_memory = load.memory_available_mb - reserved_memory - memory_mb
+        return 100 - projected_cpu >= self.min_cpu_idle_percent \
+            and projected_memory >= self.min_memory_available_mb
+
+    def record_launch(self, sim: Any, options: Any) -> None:
+        cpu_percent, memory_mb = self.estimate(sim, options)
+        with self._lock:
+            self._launches.append((time.monotonic(), cpu_percent, memory_mb))
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import threading
+import uuid
+import zipfile
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Union
+
+import gymdash.backend.core.api.config.stat_tags as tags
+from gymdash.backend.core.api.stream import FileEvent
+from gymdash.backend.core.utils.file_format import format_from_bytes
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIX  = ".gdarchive"
+TOC_NAME        = "toc.json"
+ARCHIVE_VERSION = 1
+# Already compressed formats are stored as-is instead of deflated again
+STORED_EXTENSIONS = set((
+    ".mp4", ".webm", ".gif", ".png", ".jpg", ".jpeg", ".webp",
+    ".mp3", ".ogg", ".wav", ".zip", ".gz",
+))
+
+# Same fields as tensorboard's ScalarEvent, so archived scalars
+# can be packed by the same code as live ones.
+ScalarRecord = namedtuple("ScalarRecord", ["wall_time", "step", "value"])
+
+def archive_path(sim_path: str) -> str:
+    """Returns the path of the archive that replaces the folder at sim_path."""
+    return os.path.normpath(sim_path) + ARCHIVE_SUFFIX
+
+def _event_bytes(event: Any) -> Union[bytes, None]:
+    for attribute in ("encoded_string", "encoded_image_string", "encoded_audio_string"):
+        data = getattr(event, attribute, None)
+        if isinstance(data, bytes):
+            return data
+    return None
+
+def _compress_type(name: str) -> int:
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def _media_source(streamer: Any, key: str, event: Any, sim_path: str) -> Union[str, None]:
+    """Returns the archive member name of the file a media event was read from, if any."""
+    src_name = getattr(event, "src_name", None)
+    if src_name is None:
+        return None
+    for stat in getattr(streamer, "stats", []):
+        if getattr(stat, "key", None) == key and getattr(stat, "folder", None) is not None:
+            path = os.path.join(stat.folder, src_name)
+            return os.path.relpath(path, sim_path).replace(os.sep, "/")
+    return None
+
+def write_archive(sim_path: str, streamers: Iterable[Any], out_path: str) -> Dict[str, Any]:
+    """
+    Packs a finished simulation folder into a single zip bundle.
+
+    Every file in the folder is stored under its relative path, so
+    unzipping the bundle restores the folder. On top of that, every stat
+    served by the simulation's streamers is written in a compact form and
+    listed in toc.json: scalars as one JSON array per key, media as
+    references to the stored files. ArchiveStreamer serves the stats
+    straight from the bundle.
+
+    Args:
+        sim_path: Folder of the simulation.
+        streamers: The simulation's registered streamers.
+        out_path: Path of the bundle to write.
+    Returns:
+        The table of contents written to the bundle.
+    """
+    toc: Dict[str, Any] = { "version": ARCHIVE_VERSION, "keys": {}, "files": [] }
+    # Unique name, so an interrupted or concurrent pass never
+    # writes into another one's temporary file
+    tmp_path = f"{out_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _write_bundle(sim_path, streamers, tmp_path, toc)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return toc
+
+def _write_bundle(sim_path: str, streamers: Iterable[Any], tmp_path: str, toc: Dict[str, Any]) -> None:
+    with zipfile.ZipFile(tmp_path, "x") as zf:
+        if os.path.isdir(sim_path):
+            for root, dirs, files in os.walk(sim_path):
+                dirs.sort()
+                for filename in sorted(files):
+                    path = os.path.join(root, filename)
+                    member = os.path.relpath(path, sim_path).replace(os.sep, "/")
+                    zf.write(path, member, compress_type=_compress_type(member))
+                    toc["files"].append(member)
+        written = set(toc["files"])
+        num_generated = 0
+        for streamer in streamers:
+            # Read each stat from the beginning
+            streamer.reset_streamer()
+            streamer.Reload()
+            for key, tag in streamer.get_stat_keys():
+                events = streamer.get_recent_from_key(key) or []
+                if tag == tags.TB_SCALARS:
+                    member = f"_scalars/{num_generated}.json"
+                    num_generated += 1
+                    zf.writestr(member, json.dumps(
+                        [[event.step, event.wall_time, event.value] for event in events]
+                    ), compress_type=zipfile.ZIP_DEFLATED)
+                    toc["keys"][key] = { "tag": tag, "scalars": member, "points": len(events) }
+                    continue
+                entries = []
+                for event in events:
+                    data = _event_bytes(event)
+                    if data is None:
+                        continue
+                    member = _media_source(streamer, key, event, sim_path)
+                    if member not in written:
+                        media_format = format_from_bytes(data)
+                        ext = f".{media_format.ext}" if media_format is not None and media_format.has_extension else ""
+                        member = f"_media/{num_generated}/{len(entries)}{ext}"
+                        zf.writestr(member, data, compress_type=_compress_type(member))
+                    entries.append({
+                        "member":       member,
+                        "step":         event.step,
+                        "wall_time":    event.wall_time,
+                        "src_name":     getattr(event, "src_name", os.path.basename(member)),
+                    })
+                num_generated += 1
+                toc["keys"][key] = { "tag": tag, "media": entries }
+        zf.writestr(TOC_NAME, json.dumps(toc), compress_type=zipfile.ZIP_DEFLATED)
+
+class ArchiveStreamer:
+    """
+    Streamer serving the stats of an archived simulation from its
+    bundle. Only toc.json is read up front. Scalars and media files are
+    read from the bundle when they are requested.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._toc: Union[Dict[str, Any], None] = None
+        self._read_index: Dict[str, int] = {}
+        self._mutex = threading.Lock()
+
+    @property
+    def streamer_name(self):
+        return "archive_" + self.path
+
+    @property
+    def toc(self) -> Dict[str, Any]:
+        if self._toc is None:
+            with zipfile.ZipFile(self.path, "r") as zf:
+                self._toc = json.loads(zf.read(TOC_NAME))
+        return self._toc
+
+    def get_stat_keys(self):
+        return [(key, info["tag"]) for key, info in self.toc["keys"].items()]
+
+    def Reload(self):
+        pass
+
+    def reset_streamer(self):
+        with self._mutex:
+            self._read_index.clear()
+
+    def _read_events(self, key: str, start: int = 0) -> List[Any]:
+        info = self.toc["keys"].get(key, None)
+        if info is None:
+            return []
+        with zipfile.ZipFile(self.path, "r") as zf:
+            if "scalars" in info:
+                points = json.loads(zf.read(info["scalars"]))[start:]
+                return [ScalarRecord(wall_time=wall_time, step=step, value=value) for step, wall_time, value in points]
+            return [
+                FileEvent(
+                    wall_time       = entry["wall_time"],
+                    step            = entry["step"],
+                    encoded_string  = zf.read(entry["member"]),
+                    tag             = info["tag"],
+                    src_name        = entry["src_name"]
+                )
+                for entry in info["media"][start:]
+            ]
+
+    def _num_events(self, key: str) -> int:
+        info = self.toc["keys"].get(key, {})
+        return info["points"] if "scalars" in info else len(info.get("media", []))
+
+    def get_values(self, key: str) -> List[Any]:
+        return self._read_events(key)
+
+    def get_recent_from_key(self, key: str) -> List[Any]:
+        with self._mutex:
+            start = self._read_index.get(key, 0)
+            self._read_index[key] = self._num_events(key)
+        if start >= self._num_events(key):
+            return []
+        return self._read_events(key, start)
+
+    def get_all_recent(self):
+        return {key: self.get_recent_from_key(key) for key, tag in self.get_stat_keys()}
+
+    def get_recent_from_tag(self, tag: str):
+        return {key: self.get_recent_from_key(key) for key, key_tag in self.get_stat_keys() if key_tag == tag}
+
+    def get_all_from_tag(self, tag: str):
+        return {key: self.get_values(key) for key, key_tag in self.get_stat_keys() if key_tag == tag}
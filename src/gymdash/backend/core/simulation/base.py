@@ -1,11 +1,13 @@
+import asyncio
 import copy
 import logging
 import os
+import time
 import traceback
 from abc import abstractmethod
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import datetime
-from threading import Lock, Thread
+from threading import Condition, Lock, Thread
 from typing import (Any, Callable, Dict, Iterable, List, Literal, Set, Tuple,
                     Union)
 from uuid import UUID, uuid4
@@ -15,6 +17,10 @@ from typing_extensions import Self
 from gymdash.backend.core.api.models import (ControlRequestDetails, SimStatus,
                                              SimulationStartConfig,
                                              StoredSimulationInfo)
+from gymdash.backend.core.simulation.archive import (ArchiveStreamer,
+                                                     archive_path)
+from gymdash.backend.core.simulation.live_view import LiveFrameBuffer
+from gymdash.backend.core.simulation.process import SimulationProcess
 from gymdash.backend.core.utils.kwarg_utils import overwrite_new_kwargs
 from gymdash.backend.enums import SimStatusCode, SimStatusSubcode
 
@@ -159,6 +165,69 @@ class InteractorFlagChannel:
     #     self._consume_in_queued = False
     #     self._consume_out_queued = False
 
+# Most requests waiting on one interactor channel at once
+RPC_QUEUE_SIZE = 64
+
+class InteractorRequest:
+    """
+    One request sent to a simulation over an interactor channel,
+    answered by exactly one reply or given up on.
+
+    Unlike the single value slot of an InteractorFlagChannel, any number
+    of requests can wait on the same channel at once, and each gets its
+    own reply.
+    """
+    def __init__(
+        self,
+        channel_key: str,
+        value: Any = None,
+        request_id: Union[UUID, None] = None,
+        on_done: Union[Callable[["InteractorRequest"], None], None] = None,
+    ) -> None:
+        """
+        Args:
+            channel_key: Channel the request is sent over.
+            value: Value the simulation reads for the request.
+            request_id: Correlates the request with its reply.
+                A new ID is made if None.
+            on_done: Called from the answering thread once the request
+                is replied to or cancelled.
+        """
+        self.channel_key = channel_key
+        self.value = value
+        self.request_id = request_id if request_id is not None else uuid4()
+        self.on_done = on_done
+        self.replied = False
+        self.response: Any = None
+        self._done = False
+        self._lock = Lock()
+
+    @property
+    def done(self):
+        return self._done
+
+    def _finish(self, replied: bool, response: Any = None) -> bool:
+        with self._lock:
+            if self._done:
+                return False
+            self._done = True
+            self.replied = replied
+            self.response = response
+        if self.on_done is not None:
+            try:
+                self.on_done(self)
+            except Exception:
+                logger.exception(f"Exception in done callback of request '{self.request_id}'")
+        return True
+
+    def reply(self, value: Any) -> bool:
+        """Answers the request. Returns False if it was already done."""
+        return self._finish(True, value)
+
+    def cancel(self) -> bool:
+        """Gives up on the request. Returns False if it was already done."""
+        return self._finish(False)
+
 class SimulationInteractor:
     ALL_CHANNELS: Set[str] = set((
         "stop_simulation",
@@ -178,8 +247,25 @@ class SimulationInteractor:
         self.triggered_in   = []
         self.triggered_out  = []
 
+        # Requests waiting for a reply, oldest first on each channel
+        self._rpc_lock = Lock()
+        self._rpc_queues: Dict[str, deque] = {
+            channel_key:  deque() for channel_key in SimulationInteractor.ALL_CHANNELS
+        }
+        self._num_pending = 0
+        self._closed = False
+        # Set when an incoming flag may be triggered. Read without
+        # locks by has_input, so hot loops can skip the channel locks.
+        self._flags_in = False
+        # Notified whenever an incoming value or request arrives,
+        # for simulation code blocking in wait_for_in() or wait_any()
+        self._in_condition = Condition()
+
         self._has_requests = False
         self._requests_lock = Lock()
+        # Receives each control request as it is made instead of it
+        # being kept in requests, e.g. to push it to API clients
+        self.control_request_sink: Union[Callable[[ControlRequestDetails], None], None] = None
         self.requests: Dict[str, List[ControlRequestDetails]] = {
             channel_key:  [] for channel_key in SimulationInteractor.ALL_CHANNELS
         }
@@ -188,6 +274,17 @@ class SimulationInteractor:
     def has_requests(self):
         return self._has_requests
     @property
+    def has_pending(self):
+        return self._num_pending > 0
+    @property
+    def has_input(self):
+        """
+        Lock-free check for pending requests or incoming flags. False
+        means there is nothing to answer, so callers can skip
+        set_out_if_in() and the like entirely.
+        """
+        return self._num_pending > 0 or self._flags_in
+    @property
     def outgoing(self):
         return { channel_key: channel for channel_key, channel in self.channels.items() if channel.outgoing.triggered }
     @property
@@ -211,16 +308,194 @@ class SimulationInteractor:
     def _release(self, channel_key: str):
         self._channel_locks[channel_key].release()
 
+    def submit(self, request: InteractorRequest) -> bool:
+        """
+        Queues a request on its channel until the simulation replies.
+
+        Returns:
+            False if the channel does not exist, its queue is full,
+            or the interactor was closed. The request is cancelled.
+        """
+        with self._rpc_lock:
+            queue = self._rpc_queues.get(request.channel_key, None)
+            accepted = not self._closed and queue is not None and len(queue) < RPC_QUEUE_SIZE
+            if accepted:
+                queue.append(request)
+                self._num_pending += 1
+        if accepted:
+            self._notify_in()
+        else:
+            logger.warning(f"Cannot queue request on channel '{request.channel_key}'")
+            request.cancel()
+        return accepted
+
+    async def request(self, channel_key: str, value: Any = None, timeout: Union[float, None] = None) -> Tuple[bool, Any]:
+        """
+        Sends a request over a channel and waits for its own reply.
+
+        Args:
+            channel_key: Channel to send the request over.
+            value: Value the simulation reads for the request.
+            timeout: Seconds to wait for the reply. None waits until
+                the request is replied to or cancelled.
+        Returns:
+            (True, reply) if the simulation replied, otherwise (False, None).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        def resolve(request: InteractorRequest):
+            if not future.done():
+                future.set_result((request.replied, request.response))
+        def on_done(request: InteractorRequest):
+            try:
+                loop.call_soon_threadsafe(resolve, request)
+            except RuntimeError:
+                # Loop already closed
+                pass
+        request = InteractorRequest(channel_key, value, on_done=on_done)
+        if not self.submit(request):
+            return (False, None)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return (False, None)
+        finally:
+            # Timed out or cancelled, so the simulation should not answer it
+            self.cancel_request(request.request_id)
+
+    def _pop_requests(self, channel_key: str, match: Union[Callable[[InteractorRequest], bool], None] = None) -> List[InteractorRequest]:
+        with self._rpc_lock:
+            queue = self._rpc_queues.get(channel_key, None)
+            if queue is None or len(queue) < 1:
+                return []
+            popped = [request for request in queue if match is None or match(request)]
+            if len(popped) > 0:
+                kept = [request for request in queue if request not in popped]
+                queue.clear()
+                queue.extend(kept)
+                self._num_pending -= len(popped)
+            return popped
+
+    def _pop_request_by_id(self, request_id: Any) -> Union[InteractorRequest, None]:
+        with self._rpc_lock:
+            for queue in self._rpc_queues.values():
+                for request in queue:
+                    if request.request_id == request_id:
+                        queue.remove(request)
+                        self._num_pending -= 1
+                        return request
+        return None
+
+    def pending_requests(self, channel_key: Union[str, None] = None) -> List[InteractorRequest]:
+        """Returns the requests waiting for a reply, on one channel or all of them."""
+        with self._rpc_lock:
+            if channel_key is not None:
+                return list(self._rpc_queues.get(channel_key, []))
+            return [request for queue in self._rpc_queues.values() for request in queue]
+
+    def serve(self, channel_key: str, handler: Callable[[Any], Any]) -> int:
+        """
+        Replies to every request waiting on a channel with handler(value).
+        Meant to be called from the simulation's run loop.
+
+        Returns:
+            Number of requests replied to.
+        """
+        requests = self._pop_requests(channel_key)
+        for request in requests:
+            try:
+                request.reply(handler(request.value))
+            except Exception:
+                logger.exception(f"Exception when serving request on channel '{channel_key}'")
+                request.cancel()
+        return len(requests)
+
+    def reply_to(self, request_id: Any, value: Any) -> bool:
+        """Replies to a pending request by ID. Returns False if it is not pending."""
+        request = self._pop_request_by_id(request_id)
+        return request is not None and request.reply(value)
+
+    def cancel_request(self, request_id: Any) -> bool:
+        request = self._pop_request_by_id(request_id)
+        return request is not None and request.cancel()
+
+    def cancel_all_requests(self) -> int:
+        with self._rpc_lock:
+            requests = [request for queue in self._rpc_queues.values() for request in queue]
+            for queue in self._rpc_queues.values():
+                queue.clear()
+            self._num_pending = 0
+        for request in requests:
+            request.cancel()
+        return len(requests)
+
+    def close(self):
+        """
+        Cancels pending requests and refuses new ones. Called once the
+        simulation has stopped running and can no longer reply.
+        """
+        with self._rpc_lock:
+            self._closed = True
+        self.cancel_all_requests()
+
+    def _notify_in(self):
+        with self._in_condition:
+            self._in_condition.notify_all()
+
+    def _has_in(self, channel_key: str) -> bool:
+        queue = self._rpc_queues.get(channel_key, None)
+        if queue is not None and len(queue) > 0:
+            return True
+        channel = self.channels.get(channel_key, None)
+        return channel is not None and channel.has_incoming
+
+    def wait_for_in(self, channel_key: str, timeout: Union[float, None] = None) -> Tuple[bool, Any]:
+        """
+        Blocks until the channel has a pending request or incoming value,
+        then returns it like get_in(). Meant for simulation code that
+        pauses for input, which then uses no CPU while it waits.
+
+        Args:
+            channel_key: Channel to wait on.
+            timeout: Most seconds to wait. None waits indefinitely.
+        Returns:
+            The get_in() result, which is (False, None) on timeout.
+        """
+        with self._in_condition:
+            if not self._in_condition.wait_for(lambda: self._has_in(channel_key), timeout):
+                return (False, None)
+        return self.get_in(channel_key)
+
+    def wait_any(self, channel_keys: Iterable[str], timeout: Union[float, None] = None) -> Union[str, None]:
+        """
+        Blocks until any of the channels has a pending request or
+        incoming value.
+
+        Args:
+            channel_keys: Channels to wait on, in order of precedence.
+            timeout: Most seconds to wait. None waits indefinitely.
+        Returns:
+            The first of channel_keys with input, or None on timeout.
+        """
+        channel_keys = list(channel_keys)
+        ready = lambda: next((key for key in channel_keys if self._has_in(key)), None)
+        with self._in_condition:
+            return self._in_condition.wait_for(ready, timeout)
+
     def add_control_request(self, channel_key: str, details: str="", *other_keys) -> bool:
+        sink = self.control_request_sink
         with self._requests_lock:
             if channel_key in self.requests:
                 request = ControlRequestDetails(key=channel_key, details=details, subkeys=[*other_keys])
-                self.requests[channel_key].append(request)
-                self._has_requests = True
-                return True
+                if sink is None:
+                    self.requests[channel_key].append(request)
+                    self._has_requests = True
             else:
                 logger.warning(f"Cannot set new control request for channel '{channel_key}'")
                 return False
+        if sink is not None:
+            sink(request)
+        return True
     # def clear_control_requests_for(self, channel_key: str) -> bool:
     #     with self._requests_lock:
     #         if channel_key in self.requests:
@@ -234,6 +509,13 @@ class SimulationInteractor:
             self._has_requests = False
             for request_list in self.requests.values():
                 request_list.clear()
+    def pop_all_control_requests(self) -> Dict[str, List[ControlRequestDetails]]:
+        """Returns and clears all pending control requests at once."""
+        with self._requests_lock:
+            batch = { channel_key: request_list for channel_key, request_list in self.requests.items() if len(request_list) > 0 }
+            self.requests = { channel_key: [] for channel_key in self.requests.keys() }
+            self._has_requests = False
+            return batch
     # def get_control_requests_for(self, channel_key: str) -> List[ControlRequestDetails]:
     #     with self._requests_lock:
     #         if channel_key in self.requests:
@@ -258,6 +540,12 @@ class SimulationInteractor:
         self._aquire_all_locks()
         for channel in self.channels.values():
             channel.reset()
+        self._flags_in = False
+        self._release_all_locks()
+    def _update_flags_in(self):
+        # Under all locks, so a concurrent set_in() cannot be missed
+        self._aquire_all_locks()
+        self._flags_in = any(channel.has_incoming for channel in self.channels.values())
         self._release_all_locks()
     def reset_outgoing_channels(self, channel_keys: Iterable[str]):
         for key in channel_keys:
@@ -271,6 +559,7 @@ class SimulationInteractor:
                 self._aquire(key)
                 self.channels[key].reset_incoming()
                 self._release(key)
+        self._update_flags_in()
 
     def _try_get_channel(self, key):
         if key in self.channels:
@@ -279,6 +568,15 @@ class SimulationInteractor:
             return (False, None)
 
     def get_in(self, channel_key) -> Tuple[bool, Any]:
+        """
+        Returns the value of the oldest pending request on the channel,
+        or of the incoming flag if no requests are pending.
+        """
+        if self._num_pending > 0:
+            with self._rpc_lock:
+                queue = self._rpc_queues.get(channel_key, None)
+                if queue is not None and len(queue) > 0:
+                    return (True, queue[0].value)
         found, channel = self._try_get_channel(channel_key)
         return channel.get_in() if found else (False, None)
         
@@ -302,6 +600,22 @@ class SimulationInteractor:
         return values
     
     def set_out(self, channel_key: str, out_value: Any):
+        """
+        Replies to the oldest pending request on the channel, the
+        one get_in() returned. Sets the outgoing flag if none are pending.
+        """
+        if self._num_pending > 0:
+            with self._rpc_lock:
+                queue = self._rpc_queues.get(channel_key, None)
+                request = queue.popleft() if queue else None
+                if request is not None:
+                    self._num_pending -= 1
+            if request is not None:
+                request.reply(out_value)
+                return
+        self.set_out_flag(channel_key, out_value)
+    def set_out_flag(self, channel_key: str, out_value: Any):
+        """Sets only the outgoing flag, leaving pending requests alone."""
         found, channel = self._try_get_channel(channel_key)
         if found:
             self._aquire(channel_key)
@@ -313,41 +627,68 @@ class SimulationInteractor:
         if found:
             self._aquire(channel_key)
             channel.set_in(in_value)
+            self._flags_in = True
             self._release(channel_key)
+            self._notify_in()
             
     def set_out_if_in(self, channel_key: str, out_value: Any) -> bool:
+        """
+        Replies to every pending request on the channel, and sets the
+        outgoing flag if the incoming flag is triggered.
+
+        Returns:
+            True if any request was replied to or the flag was set.
+        """
+        if not self.has_input:
+            return False
+        replied = False
+        if self._num_pending > 0:
+            for request in self._pop_requests(channel_key):
+                replied = request.reply(out_value) or replied
         found, channel = self._try_get_channel(channel_key)
         if found:
             self._aquire(channel_key)
             was_set = channel.set_out_if_in(out_value)
             self._release(channel_key)
-            return was_set
+            return was_set or replied
         else:
-            return False
+            return replied
     def set_in_if_out(self, channel_key: str, in_value: Any) -> bool:
         found, channel = self._try_get_channel(channel_key)
         if found:
             self._aquire(channel_key)
             was_set = channel.set_in_if_out(in_value)
+            self._flags_in = self._flags_in or was_set
             self._release(channel_key)
+            if was_set:
+                self._notify_in()
             return was_set
         else:
             return False
     def set_out_if_in_value(self, channel_key: str, out_value: Any, comparison: Any):
+        if not self.has_input:
+            return False
+        replied = False
+        if self._num_pending > 0:
+            for request in self._pop_requests(channel_key, lambda request: request.value == comparison):
+                replied = request.reply(out_value) or replied
         found, channel = self._try_get_channel(channel_key)
         if found:
             self._aquire(channel_key)
             was_set = channel.set_out_if_in_value(out_value, comparison)
             self._release(channel_key)
-            return was_set
+            return was_set or replied
         else:
-            return False
+            return replied
     def set_in_if_out_value(self, channel_key: str, in_value: Any, comparison: Any):
         found, channel = self._try_get_channel(channel_key)
         if found:
             self._aquire(channel_key)
             was_set = channel.set_in_if_out_value(in_value, comparison)
+            self._flags_in = self._flags_in or was_set
             self._release(channel_key)
+            if was_set:
+                self._notify_in()
             return was_set
         else:
             return False
@@ -487,6 +828,7 @@ class Simulation():
         self.start_kwargs                       = None
         self.interactor                         = SimulationInteractor()
         self.streamer                           = SimulationStreamer()
+        self.live_view                          = LiveFrameBuffer()
         self.kwarg_defaults                     = self.create_kwarg_defaults()
         self._callback_map: Dict[str, List[Callable[[Simulation], Simulation]]] = {
             Simulation.START_SETUP:     [],
@@ -496,12 +838,27 @@ class Simulation():
         }
         self.force_stopped: bool                = False
         self.from_disk: bool                    = False
+        # "thread" runs _run on a thread of this process.
+        # "process" runs it in a child process, see SimulationProcess.
+        self.execution_mode: str                = "thread"
+        self.process: Union[SimulationProcess, None] = None
 
         self._meta_mutex: Lock                  = Lock()
         self._meta_cancelled: bool              = False
         self._meta_failed: bool                 = False
         self._meta_statuses: List[SimStatus]    = []
         self._meta_num_saved_statuses: int      = 0
+        # (key, step, wall_time, value) rows not yet saved to the project
+        self._meta_metrics: List[Tuple[str, int, float, float]] = []
+        self._meta_metrics_flush_requested: bool= False
+        # Newest (step, value) of each logged metric key
+        self._meta_latest_metrics: Dict[str, Tuple[int, float]] = {}
+        # Called with this simulation when new metrics are logged.
+        # Set by the tracker to save metrics while the simulation runs.
+        self.metric_sink: Union[Callable[[Simulation], None], None] = None
+        # Metric key -> callbacks given the (step, value) of every point
+        # logged for it, in the order logged
+        self._metric_listeners: Dict[str, List[Callable[[int, float], None]]] = {}
 
         self._meta_create_time                  = datetime.now()
         self._meta_start_time                   = None
@@ -510,6 +867,7 @@ class Simulation():
         self._project_info_set: bool            = False
         self._project_sim_id: UUID              = None
         self._project_sim_base_path: str        = None
+        self._project_resources_path: str       = None
 
     @property
     def sim_path(self) -> Union[str, None]:
@@ -517,6 +875,12 @@ class Simulation():
             return os.path.join(self._project_sim_base_path, str(self._project_sim_id))
         else:
             return None
+
+    @property
+    def archive_path(self) -> Union[str, None]:
+        """Path of the bundle replacing this simulation's folder once archived."""
+        sim_path = self.sim_path
+        return archive_path(sim_path) if sim_path is not None else None
         
     def fill_from_stored_info(self, info: StoredSimulationInfo):
         logger.debug(f"fill_from_stored_info config: {info.config}")
@@ -540,6 +904,11 @@ class Simulation():
             config_kwargs = config.kwargs
         if kwargs is None:
             kwargs = {}
+        # Archived runs no longer have a folder to stream from
+        archive = self.archive_path
+        if archive is not None and os.path.isfile(archive):
+            self.streamer.get_or_register(ArchiveStreamer(archive))
+            return
         self._create_streamers(
             self._overwrite_new_kwargs(self.kwarg_defaults, config_kwargs, kwargs)
         )
@@ -592,6 +961,56 @@ class Simulation():
             self._meta_num_saved_statuses = len(self._meta_statuses)
             return new_statuses
 
+    def log_metric(self, key: str, value: float, step: int, wall_time: Union[float, None] = None) -> None:
+        """
+        Records a scalar for the project-wide metric store, which
+        can be queried across many simulations at once.
+        """
+        self.log_metrics({key: value}, step, wall_time)
+    def log_metrics(self, metrics: Dict[str, float], step: int, wall_time: Union[float, None] = None) -> None:
+        if wall_time is None:
+            wall_time = time.time()
+        self._add_metric_rows([(key, int(step), wall_time, float(value)) for key, value in metrics.items()])
+    def _add_metric_rows(self, rows: List[Tuple[str, int, float, float]]) -> None:
+        with self._meta_mutex:
+            self._meta_metrics.extend(rows)
+            for key, step, _, value in rows:
+                latest = self._meta_latest_metrics.get(key, None)
+                if latest is None or step >= latest[0]:
+                    self._meta_latest_metrics[key] = (step, value)
+            # Only one save request is outstanding at a time.
+            # It picks up everything logged until it runs.
+            request_flush = self.metric_sink is not None and not self._meta_metrics_flush_requested
+            if request_flush:
+                self._meta_metrics_flush_requested = True
+            to_notify = [
+                (callback, step, value)
+                for key, step, _, value in rows
+                for callback in self._metric_listeners.get(key, ())
+            ]
+        if request_flush:
+            self.metric_sink(self)
+        for callback, step, value in to_notify:
+            callback(step, value)
+    def add_metric_listener(self, key: str, callback: Callable[[int, float], None]) -> None:
+        """
+        Calls callback with the (step, value) of every point logged for
+        key from now on, on the thread that logged it. Points relayed from
+        a simulation process are passed on as they arrive.
+        """
+        with self._meta_mutex:
+            self._metric_listeners.setdefault(key, []).append(callback)
+    def latest_metric(self, key: str) -> Union[Tuple[int, float], None]:
+        """Returns the (step, value) logged last for a metric key, if any."""
+        with self._meta_mutex:
+            return self._meta_latest_metrics.get(key, None)
+    def retrieve_new_metrics(self) -> List[Tuple[str, int, float, float]]:
+        with self._meta_mutex:
+            new_metrics = self._meta_metrics
+            self._meta_metrics = []
+            self._meta_metrics_flush_requested = False
+            return new_metrics
+
     def create_kwarg_defaults(self) -> Dict[str, Any]:
         return {}
 
@@ -643,11 +1062,56 @@ class Simulation():
         on a worker thread.
         """
         self.start_kwargs = kwargs
+        if self.execution_mode == "process" and not self.from_disk:
+            if SimulationProcess.locate_type(type(self)) is not None:
+                return self._start_process(**kwargs)
+            logger.warning(f"Simulation type '{type(self).__name__}' cannot be imported by a simulation process. Running it in thread mode.")
         self.setup(**kwargs)
         self.thread = Thread(target=self.run)
         self.thread.start(**kwargs)
         return self.thread
 
+    def _start_process(self, **kwargs):
+        """
+        Runs setup() and _run() on a copy of this simulation in a child
+        process. This object stays in the API process and mirrors the
+        child's state on its thread for the tracker and API.
+        """
+        # Setup callbacks belong to the tracker, so they run here
+        try:
+            self.trigger_callbacks(Simulation.START_SETUP)
+        except Exception:
+            logger.exception(f"Exception when running Simulation '{Simulation.START_SETUP}' callbacks.")
+        # Streamers read from files, so they work across processes
+        try:
+            self.create_streamers(self.config, kwargs)
+        except Exception:
+            logger.exception(f"Exception when creating streamers for Simulation process.")
+        try:
+            self.trigger_callbacks(Simulation.END_SETUP)
+        except Exception:
+            logger.exception(f"Exception when running Simulation '{Simulation.END_SETUP}' callbacks.")
+        self.process = SimulationProcess(self, kwargs)
+        self.process.start()
+        self.thread = Thread(target=self._run_process)
+        self.thread.start()
+        return self.thread
+
+    def _run_process(self) -> None:
+        try:
+            self.trigger_callbacks(Simulation.START_RUN)
+        except Exception:
+            logger.exception(f"Exception when running Simulation '{Simulation.START_RUN}' callbacks.")
+        self._meta_start_time = datetime.now()
+        try:
+            self.process.relay()
+        except Exception:
+            logger.exception(f"Exception when relaying Simulation process.")
+        self._meta_end_time = datetime.now()
+        self.trigger_callbacks(Simulation.END_RUN)
+        self.interactor.set_out_if_in("stop_simulation", True)
+        self.interactor.close()
+
     def reset_interactions(self):
         self.interactor.reset()
 
@@ -741,6 +1205,8 @@ class Simulation():
         # Make sure it's after all the callbacks so we don't have any
         # funny business.
         self.interactor.set_out_if_in("stop_simulation", True)
+        # Nothing is left to answer requests that are still pending
+        self.interactor.close()
     
     @abstractmethod
     def _setup(self, **kwargs):
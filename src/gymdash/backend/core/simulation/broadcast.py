@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from collections import deque
+from threading import Lock
+from typing import Any, Dict, List, Tuple, Union
+from uuid import UUID
+
+from gymdash.backend.core.api.models import (ControlRequestBatch,
+                                             ControlRequestDetails)
+
+logger = logging.getLogger(__name__)
+
+# Most undelivered requests kept per subscriber, and while nobody listens
+SUBSCRIBER_QUEUE_SIZE   = 256
+BACKLOG_SIZE            = 256
+# Seconds between keep-alive comments on an idle stream, so
+# proxies do not drop a connection that has nothing to send
+KEEPALIVE_INTERVAL      = 15
+
+class ControlRequestBroadcaster:
+    """
+    Pushes simulation control requests to every subscribed event loop
+    queue as they are made.
+
+    publish() may be called from any thread, so simulation threads and
+    process relays hand their requests over directly. Requests published
+    while nobody is subscribed are kept and handed to the next subscriber,
+    so a pause point reached before a client connects is not lost.
+    """
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._subscribers: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._backlog: deque = deque(maxlen=BACKLOG_SIZE)
+        self._closed = False
+
+    @property
+    def num_subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Returns a queue of (sim_id, ControlRequestDetails) items, or None
+        once the broadcaster is closed. Must be called from the event
+        loop that reads the queue, and removed with unsubscribe().
+        """
+        # One slot past the limit is kept for the end of stream
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + 1)
+        with self._lock:
+            for item in self._backlog:
+                self._put(queue, item)
+            self._backlog.clear()
+            if self._closed:
+                self._put(queue, None)
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, item: Union[Tuple[UUID, ControlRequestDetails], None]) -> None:
+        if item is not None and queue.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+            logger.warning(f"Dropping control request for a subscriber that is not keeping up")
+            return
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Stream already ended
+            pass
+
+    def _send(self, item: Union[Tuple[UUID, ControlRequestDetails], None]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+            if len(subscribers) < 1 and item is not None:
+                self._backlog.append(item)
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, item)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    def publish(self, sim_id: UUID, request: ControlRequestDetails) -> None:
+        self._send((sim_id, request))
+
+    def close(self) -> None:
+        """Ends every subscriber's stream."""
+        with self._lock:
+            self._closed = True
+        self._send(None)
+
+def drain_to_batch(first: Tuple[UUID, ControlRequestDetails], queue: asyncio.Queue) -> Tuple[ControlRequestBatch, bool]:
+    """
+    Groups first and every item already waiting in queue into one batch.
+
+    Returns:
+        The batch, and whether the end of the stream was reached.
+    """
+    requests: Dict[UUID, Dict[str, List[ControlRequestDetails]]] = {}
+    items: List[Any] = [first]
+    ended = False
+    while not queue.empty():
+        item = queue.get_nowait()
+        if item is None:
+            ended = True
+            break
+        items.append(item)
+    for sim_id, request in items:
+        requests.setdefault(sim_id, {}).setdefault(request.key, []).append(request)
+    return (ControlRequestBatch(requests=requests), ended)
@@ -0,0 +1,139 @@
+import logging
+import statistics
+from threading import Lock
+from typing import Any, Dict, List, Tuple, Union
+
+from gymdash.backend.core.api.models import EarlyStoppingConfig
+
+logger = logging.getLogger(__name__)
+
+class EarlyStoppingPolicy:
+    """
+    Decides which runs of a sweep to stop from the values they report
+    for one target metric. Runs report with observe(), and should_stop()
+    is asked about a run after its newest report.
+    """
+    def __init__(self, config: EarlyStoppingConfig) -> None:
+        self.config = config
+        self._lock = Lock()
+        # Run -> (step, value) reports in step order
+        self._history: Dict[Any, List[Tuple[int, float]]] = {}
+
+    def _better(self, a: float, b: float) -> bool:
+        """Returns True if a is strictly better than b."""
+        return a > b if self.config.mode == "max" else a < b
+
+    def _best(self, values: List[float]) -> float:
+        return max(values) if self.config.mode == "max" else min(values)
+
+    def observe(self, run_id: Any, step: int, value: float) -> None:
+        with self._lock:
+            history = self._history.setdefault(run_id, [])
+            if len(history) < 1 or step > history[-1][0]:
+                history.append((step, value))
+
+    def should_stop(self, run_id: Any) -> bool:
+        with self._lock:
+            history = self._history.get(run_id, None)
+            if history is None or len(history) < 1 or history[-1][0] < self.config.min_step:
+                return False
+            return self._should_stop(run_id, history)
+
+    def _should_stop(self, run_id: Any, history: List[Tuple[int, float]]) -> bool:
+        raise NotImplementedError
+
+class AsyncSuccessiveHalving(EarlyStoppingPolicy):
+    """
+    Asynchronous successive halving (ASHA).
+
+    Rungs sit at min_step * reduction_factor^k steps. When a run passes
+    a rung, its value there is recorded, and it is only promoted past the
+    rung if it is within the best 1/reduction_factor of all values
+    recorded at that rung so far. Runs are judged as they arrive instead
+    of waiting for a full bracket, so no slot sits idle waiting on the
+    slowest run.
+    """
+    def __init__(self, config: EarlyStoppingConfig) -> None:
+        super().__init__(config)
+        self.reduction_factor = max(2, config.reduction_factor)
+        # Rung index -> run -> value recorded there
+        self._rungs: List[Dict[Any, float]] = []
+
+    def rung_step(self, rung: int) -> int:
+        return max(1, self.config.min_step) * self.reduction_factor**rung
+
+    def _value_at(self, history: List[Tuple[int, float]], step: int) -> float:
+        """
+        The newest value reported at or before step. Runs that first
+        report past step are judged on that first report, which is
+        when they reached the rung.
+        """
+        value = history[0][1]
+        for reported_step, reported_value in history:
+            if reported_step > step:
+                break
+            value = reported_value
+        return value
+
+    def _promoted(self, rung: Dict[Any, float], value: float) -> bool:
+        if len(rung) < self.reduction_factor:
+            # Too few runs to judge against yet
+            return True
+        ranked = sorted(rung.values(), reverse=self.config.mode == "max")
+        cutoff = ranked[max(1, len(rung) // self.reduction_factor) - 1]
+        return not self._better(cutoff, value)
+
+    def _should_stop(self, run_id: Any, history: List[Tuple[int, float]]) -> bool:
+        step = history[-1][0]
+        rung = 0
+        while self.rung_step(rung) <= step:
+            if self.config.max_step is not None and self.rung_step(rung) > self.config.max_step:
+                break
+            if rung >= len(self._rungs):
+                self._rungs.append({})
+            if run_id not in self._rungs[rung]:
+                value = self._value_at(history, self.rung_step(rung))
+                self._rungs[rung][run_id] = value
+                if not self._promoted(self._rungs[rung], value):
+                    logger.info(f"ASHA stopping run {run_id} at rung {rung} (step {self.rung_step(rung)}, value {value})")
+                    return True
+            rung += 1
+        return False
+
+class MedianStopping(EarlyStoppingPolicy):
+    """
+    Median stopping rule.
+
+    Past min_step, a run is stopped if its best value so far is worse
+    than the median of the other runs' running averages up to the same
+    step. Only runs that have reached that step count, and at least
+    min_runs of them are needed.
+    """
+    def _running_average(self, history: List[Tuple[int, float]], step: int) -> float:
+        values = [value for reported_step, value in history if reported_step <= step]
+        return sum(values) / len(values)
+
+    def _should_stop(self, run_id: Any, history: List[Tuple[int, float]]) -> bool:
+        step = history[-1][0]
+        others = [
+            self._running_average(other, step)
+            for other_id, other in self._history.items()
+            if other_id != run_id and len(other) > 0 and other[-1][0] >= step and other[0][0] <= step
+        ]
+        if len(others) < max(1, self.config.min_runs):
+            return False
+        median = statistics.median(others)
+        best = self._best([value for _, value in history])
+        if self._better(median, best):
+            logger.info(f"Median rule stopping run {run_id} at step {step} (best {best}, median {median})")
+            return True
+        return False
+
+def make_policy(config: Union[EarlyStoppingConfig, None]) -> Union[EarlyStoppingPolicy, None]:
+    if config is None:
+        return None
+    if config.policy == "asha":
+        return AsyncSuccessiveHalving(config)
+    if config.policy == "median":
+        return MedianStopping(config)
+    raise ValueError(f"Unknown early stopping policy '{config.policy}'")
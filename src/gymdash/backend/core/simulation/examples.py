@@ -3,12 +3,10 @@ import logging
 import os
 import pathlib
 import time
-import math
 from typing import Union
 from abc import abstractmethod
 from gymdash.backend.core.utils.thread_utils import run_on_main_thread
 
-import matplotlib.pyplot as plt
 from torch import Tensor
 from torch.utils.tensorboard import SummaryWriter
 
@@ -53,12 +51,17 @@ try:
     _has_torch = True
 except ImportError:
     _has_torch = False
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 import gymdash.backend.core.api.config.stat_tags as stat_tags
 from gymdash.backend.core.api.models import SimulationStartConfig
 from gymdash.backend.core.simulation.base import Simulation
 from gymdash.backend.core.simulation.manage import SimulationRegistry
+from gymdash.backend.core.utils.image_grid import save_image, tile_images
+from gymdash.backend.core.utils.render_worker import (render_pool,
+                                                      render_sample_figure)
+from gymdash.backend.core.utils.media_preview import (preview_step_extractor,
+                                                      preview_worker)
 from gymdash.backend.gymnasium.wrappers.MediaFileStatLinker import \
     MediaFileStatLinker
 from gymdash.backend.gymnasium.wrappers.RecordVideoCustom import \
@@ -67,8 +70,8 @@ from gymdash.backend.gymnasium.wrappers.RecordVideoToTensorboard import \
     RecordVideoToTensorboard
 from gymdash.backend.gymnasium.wrappers.TensorboardStreamWrapper import (
     TensorboardStreamer, TensorboardStreamWrapper)
-from gymdash.backend.stable_baselines.callbacks import \
-    SimulationInteractionCallback
+from gymdash.backend.stable_baselines.callbacks import (
+    SimulationInteractionCallback, SimulationMetricWriter)
 from gymdash.backend.tensorboard.MediaLinkStreamableStat import \
     MediaLinkStreamableStat
 from gymdash.backend.torch.examples import (ClassifierMNIST,
@@ -120,9 +123,29 @@ class StableBaselinesSimulation(Simulation):
                     video_path,
                     r"rl-video-(episode|step)-[0-9]+_[0-9]+\.mp4",
                     lambda fname: int(fname.split("_")[-1][:-4])
+                ),
+                # Small poster/preview images for galleries
+                MediaLinkStreamableStat(
+                    "episode_video_poster",
+                    stat_tags.IMAGES,
+                    video_path,
+                    r"rl-video-(episode|step)-[0-9]+_[0-9]+_poster\.png$",
+                    preview_step_extractor
+                ),
+                MediaLinkStreamableStat(
+                    "episode_video_preview",
+                    stat_tags.IMAGES,
+                    video_path,
+                    r"rl-video-(episode|step)-[0-9]+_[0-9]+_preview\.gif$",
+                    preview_step_extractor
                 )
             ]
         ))
+        # Fill in previews for any videos recorded without them
+        preview_worker.submit_missing(
+            video_path,
+            r"rl-video-(episode|step)-[0-9]+_[0-9]+\.mp4$"
+        )
 
     def create_kwarg_defaults(self):
         return {
@@ -131,6 +154,10 @@ class StableBaselinesSimulation(Simulation):
             "step_trigger":     lambda x: False,
             "video_length":     0,
             "fps":              30,
+            "live_view_fps":    10,
+            "interaction_check_steps":      1,
+            "interaction_check_seconds":    0,
+            "progressive_video": False,
             "env":              "CartPole-v1",
             "policy":           "MlpPolicy",
             "algorithm":        "ppo",
@@ -152,6 +179,10 @@ class StableBaselinesSimulation(Simulation):
         step_trigger        = self._to_every_x_trigger(kwargs["step_trigger"])
         video_length        = kwargs["video_length"]
         fps                 = kwargs["fps"]
+        live_view_fps       = kwargs["live_view_fps"]
+        check_steps         = kwargs["interaction_check_steps"]
+        check_seconds       = kwargs["interaction_check_seconds"]
+        progressive_video   = kwargs["progressive_video"]
         policy              = kwargs["policy"]
         env_name            = kwargs["env"]
         algorithm           = self._to_alg_initializer(kwargs["algorithm"])
@@ -186,10 +217,27 @@ class StableBaselinesSimulation(Simulation):
                     video_path,
                     r"rl-video-(episode|step)-[0-9]+_[0-9]+\.mp4",
                     lambda fname: int(fname.split("_")[-1][:-4])
+                ),
+                # Small poster/preview images for galleries
+                MediaLinkStreamableStat(
+                    "episode_video_poster",
+                    stat_tags.IMAGES,
+                    video_path,
+                    r"rl-video-(episode|step)-[0-9]+_[0-9]+_poster\.png$",
+                    preview_step_extractor
+                ),
+                MediaLinkStreamableStat(
+                    "episode_video_preview",
+                    stat_tags.IMAGES,
+                    video_path,
+                    r"rl-video-(episode|step)-[0-9]+_[0-9]+_preview\.gif$",
+                    preview_step_extractor
                 )
             ]
         ))
         # Record every X episodes to video.
+        # Also feeds the live view whenever a viewer is connected.
+        self.live_view.max_fps = live_view_fps
         env = RecordVideoCustom(
             env,
             video_path,
@@ -197,6 +245,8 @@ class StableBaselinesSimulation(Simulation):
             step_trigger,
             video_length=video_length,
             fps=fps,
+            live_view=self.live_view,
+            progressive=progressive_video,
         )
         # Also Store the video record in the tb file.
         # r_env = RecordVideoToTensorboard(
@@ -212,9 +262,15 @@ class StableBaselinesSimulation(Simulation):
         # Hook into the running simulation.
         # This callback provides communication channels between the
         # simulation and the user as the simulation runs.
-        sim_interact_callback = SimulationInteractionCallback(self)
+        sim_interact_callback = SimulationInteractionCallback(
+            self,
+            check_every_steps=check_steps,
+            check_every_seconds=check_seconds
+        )
         # Logger
         backend_logger = configure(tb_path, ["tensorboard"])
+        # Also copy every logged scalar into the project's metric store
+        backend_logger.output_formats.append(SimulationMetricWriter(self))
 
         # Setup Model
         self.model = algorithm(
@@ -342,6 +398,8 @@ class CustomControlSimulation(Simulation):
         if interactive:
             self.interactor.add_control_request("custom_query", interactive_text)
             while True:
+                # Sleep until the user sends something
+                self.interactor.wait_any(("stop_simulation", "custom_query"))
                 # HANDLE INCOMING INFORMATION
                 if self.interactor.set_out_if_in("stop_simulation", True):
                     self.set_cancelled()
@@ -360,8 +418,6 @@ class CustomControlSimulation(Simulation):
                     self.interactor.set_out("custom_query", custom)
                     if "continue" in custom:
                         break
-                    else:
-                        time.sleep(0.1)
 
         st = time.time()
         try:
@@ -376,15 +432,17 @@ class CustomControlSimulation(Simulation):
                     # Once we get a custom query with a "continue" key, then
                     # we can increment the pause point index and move on
                     while True:
+                        # Sleep until the user sends something
+                        self.interactor.wait_any(("stop_simulation", "custom_query", "progress"))
                         # Handle normal
                         self.interactor.set_out_if_in("progress", (timer, total_runtime))
-                        # Handle custom
+                        # Handle custom. Other queries are answered too,
+                        # or they would wake the wait again right away.
                         triggered, custom = self.interactor.get_in("custom_query")
-                        if triggered and "continue" in custom:
+                        if triggered:
                             self.interactor.set_out("custom_query", custom)
-                            break
-                        else:
-                            time.sleep(0.1)
+                            if "continue" in custom:
+                                break
                         # HANDLE INCOMING INFORMATION
                         if self.interactor.set_out_if_in("stop_simulation", True):
                             self.set_cancelled()
@@ -393,7 +451,9 @@ class CustomControlSimulation(Simulation):
                     curr_pause_point += 1
                 start_time = time.time()
                 # Perform functions
-                writer.add_scalar("my_number", step + 4*np.random.random(), step)
+                my_number = step + 4*np.random.random()
+                writer.add_scalar("my_number", my_number, step)
+                self.log_metric("my_number", my_number, step)
                 step += 1
                 # Handle interactions
                 self.interactor.set_out_if_in("progress", (timer, total_runtime))
@@ -454,6 +514,16 @@ class MLSimulationUpdateCallback(MLSimulationCallback):
         return should_continue
     
 class MLSimulationSampleRecordCallback(MLSimulationCallback):
+    # Set to False in subclasses whose media creation does not use
+    # matplotlib, so media is made on the simulation thread instead
+    # of waiting for the main thread queue.
+    needs_main_thread: bool = True
+    # Module-level function taking (payload, out_path). If set, media is
+    # rendered in the render worker process from create_render_payload()
+    # and neither thread above does any rendering. Wrap with
+    # staticmethod() when assigning on a subclass.
+    render_function: Union[Callable[[Any, str], None], None] = None
+
     def __init__(
         self,
         simulation: Simulation,
@@ -507,6 +577,17 @@ class MLSimulationSampleRecordCallback(MLSimulationCallback):
     def save_media_to_folder(self, media_savable, step):
         pass
 
+    def create_render_payload(self, inputs, outputs) -> Any:
+        """
+        Returns picklable data for render_function. Only used when
+        render_function is set. Defaults to the media savable itself.
+        """
+        return self.create_media_savable(inputs, outputs)
+
+    def media_file_path(self, step) -> str:
+        """Returns the output path of the media recorded at step."""
+        return os.path.join(self.media_path, f"sample_{step}.png")
+
     def media_on_main_thread(self, inputs, outputs, curr_samples):
         media = self.create_media_savable(inputs, outputs)
         self.save_media_to_folder(media, curr_samples)
@@ -520,40 +601,56 @@ class MLSimulationSampleRecordCallback(MLSimulationCallback):
             curr_samples %self.step_trigger == 0):
         # Generate outputs upon trigger activation
             inputs, outputs = self._generate_outputs()
-            run_on_main_thread(self.media_on_main_thread, inputs, outputs, curr_samples)
+            if self.render_function is not None:
+                render_pool.submit(
+                    self.render_function,
+                    self.create_render_payload(inputs, outputs),
+                    self.media_file_path(curr_samples)
+                )
+            elif self.needs_main_thread:
+                run_on_main_thread(self.media_on_main_thread, inputs, outputs, curr_samples)
+            else:
+                self.media_on_main_thread(inputs, outputs, curr_samples)
             # media = self.create_media_savable(inputs, outputs)
             # self.save_media_to_folder(media, curr_samples)
         return True
     
 class MLClassifierRecordCallback(MLSimulationSampleRecordCallback):
-    def __init__(self, simulation: Simulation, sim_model: InferenceModel, inputs: Union[None, Tensor], media_path: str, step_trigger=1, random_samples: int = -1):
+    needs_main_thread = False
+
+    def __init__(self, simulation: Simulation, sim_model: InferenceModel, inputs: Union[None, Tensor], media_path: str, step_trigger=1, random_samples: int = -1, use_matplotlib: bool = False):
         super().__init__(simulation, sim_model, inputs, media_path, step_trigger, random_samples)
+        # Matplotlib figures are slower, so they are drawn
+        # in the render worker instead of the simulation thread.
+        if use_matplotlib:
+            self.render_function = render_sample_figure
+
+    def _to_batch_and_labels(self, inputs:Union[torch.Tensor, torch.utils.data.Dataset], outputs):
+        if isinstance(inputs, torch.Tensor):
+            img_batch = inputs
+        elif isinstance(inputs, torch.utils.data.Dataset):
+            img_batch = torch.stack([inputs[idx][0] for idx in range(len(inputs))])
+        else:
+            raise TypeError(f"Expected inputs to be a Tensor or Dataset, got {type(inputs).__name__}")
+        labels = [f"pred: {pred}" for pred in outputs.detach().cpu().reshape(-1).tolist()]
+        return (img_batch.detach().cpu().numpy(), labels)
 
     def create_media_savable(self, inputs:Union[torch.Tensor, torch.utils.data.Dataset], outputs):
-        num_plots = len(inputs)
-        ncols = math.ceil(math.sqrt(num_plots))
-        nrows = math.ceil(num_plots / ncols)
-        fig, axs = plt.subplots(nrows, ncols)
-        for p in range(num_plots):
-            idx = p
-            r = idx // ncols
-            c = idx % ncols
-            target = ""
-            if isinstance(inputs, torch.Tensor):
-                img_tensor = inputs[idx]
-            elif isinstance(inputs, torch.utils.data.Dataset):
-                img_tensor = inputs[idx][0]
-                target = str(inputs[idx][1])
-            axs[r,c].set_title(f"pred: {outputs[idx].item()}")
-            axs[r,c].imshow(torch.permute(img_tensor, (1, 2, 0)).cpu().numpy())
-        for r in range(nrows):
-            for c in range(ncols):
-                axs[r,c].set_axis_off()
-        return fig
-    def save_media_to_folder(self, media_savable:plt.Figure, step):
-        fname = os.path.join(self.media_path, f"sample_{step}.png")
-        media_savable.savefig(fname)
-        plt.close(media_savable)
+        img_batch, labels = self._to_batch_and_labels(inputs, outputs)
+        return tile_images(
+            img_batch,
+            labels=labels,
+            channels_first=True
+        )
+    def save_media_to_folder(self, media_savable:np.ndarray, step):
+        save_image(media_savable, self.media_file_path(step))
+
+    def create_render_payload(self, inputs, outputs):
+        img_batch, labels = self._to_batch_and_labels(inputs, outputs)
+        return {
+            "images": np.moveaxis(img_batch, 1, -1),
+            "titles": labels
+        }
 
 class MLSimulation(Simulation):
     def __init__(self, config: SimulationStartConfig) -> None:
@@ -720,6 +817,7 @@ class MLSimulation(Simulation):
                 torch.utils.data.Subset(train_data, torch.arange(0,10)),
                 image_path,
                 100,
+                use_matplotlib=train_kwargs.get("matplotlib_samples", False),
             )
         ])
 
@@ -728,6 +826,7 @@ class MLSimulation(Simulation):
                 dataloader=train_loader,
                 epochs=epochs,
                 tb_logger=tb_path,
+                metric_logger=self.log_metric,
                 log_step=5,
                 do_val=True,
                 # val_per_epoch=1,
@@ -0,0 +1,181 @@
+import asyncio
+import io
+import logging
+import time
+from threading import Lock
+from typing import Any, AsyncGenerator, Callable, Literal, Tuple, Union
+
+try:
+    import numpy as np
+    _has_np = True
+except ImportError:
+    _has_np = False
+try:
+    from PIL import Image
+    _has_pil = True
+except ImportError:
+    _has_pil = False
+
+logger = logging.getLogger(__name__)
+
+LIVE_VIEW_BOUNDARY = "frame"
+LIVE_VIEW_MEDIA_TYPE = f"multipart/x-mixed-replace; boundary={LIVE_VIEW_BOUNDARY}"
+# Highest frame rate a viewer may ask for
+LIVE_VIEW_MAX_FPS = 60
+
+_FORMAT_INFO = {
+    "mjpeg":    ("JPEG", "image/jpeg"),
+    "webp":     ("WEBP", "image/webp"),
+}
+
+class LiveFrameBuffer:
+    """
+    Single-slot buffer holding the most recent rendered frame of a
+    running Simulation. The simulation thread overwrites the slot
+    while viewers read whatever is newest, so a slow viewer skips
+    frames instead of building up a backlog. Producers should check
+    wants_frame() before rendering so that no capture work is done
+    while nobody is watching.
+    """
+    DEFAULT_MAX_FPS = 10
+
+    def __init__(self, max_fps: float = DEFAULT_MAX_FPS) -> None:
+        self.max_fps: float         = max_fps
+        self._lock: Lock            = Lock()
+        self._frame: Any            = None
+        self._frame_id: int         = 0
+        self._num_viewers: int      = 0
+        self._last_put_time: float  = 0
+
+    @property
+    def has_viewers(self) -> bool:
+        return self._num_viewers > 0
+    @property
+    def num_viewers(self) -> int:
+        return self._num_viewers
+
+    def add_viewer(self) -> None:
+        with self._lock:
+            self._num_viewers += 1
+    def set_num_viewers(self, num_viewers: int) -> None:
+        """Mirrors the viewer count of a buffer in another process."""
+        with self._lock:
+            self._num_viewers = max(0, num_viewers)
+    def remove_viewer(self) -> None:
+        with self._lock:
+            self._num_viewers = max(0, self._num_viewers - 1)
+            # Drop the stale frame so the next viewer does not
+            # see an old image before capture resumes.
+            if self._num_viewers == 0:
+                self._frame = None
+
+    def wants_frame(self) -> bool:
+        """
+        Returns True if at least one viewer is connected and enough
+        time has passed since the last frame to respect max_fps.
+        Cheap enough to call on every environment step.
+        """
+        if self._num_viewers < 1:
+            return False
+        if self.max_fps is None or self.max_fps <= 0:
+            return True
+        return (time.monotonic() - self._last_put_time) >= 1.0 / self.max_fps
+
+    def put(self, frame: Any) -> None:
+        """Replaces the buffered frame with a newer one."""
+        with self._lock:
+            self._frame = frame
+            self._frame_id += 1
+            self._last_put_time = time.monotonic()
+
+    def get(self) -> Tuple[int, Any]:
+        """
+        Returns the ID and value of the newest frame. The ID
+        increases with every put() so readers can skip frames
+        they have already sent.
+        """
+        with self._lock:
+            return (self._frame_id, self._frame)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frame = None
+
+def encode_frame(
+    frame: "np.ndarray",
+    fmt: Literal["mjpeg", "webp"] = "mjpeg",
+    quality: int = 75
+) -> bytes:
+    """
+    Encodes an RGB(A) frame as a single JPEG or WebP image.
+
+    Args:
+        frame: HxWxC uint8 frame as returned by env.render().
+        fmt: Stream format the image is encoded for.
+        quality: Encoder quality from 1-100.
+    Returns:
+        Encoded image bytes.
+    """
+    if not _has_pil or not _has_np:
+        raise ImportError("Install pillow and numpy to encode live view frames.")
+    pil_format = _FORMAT_INFO[fmt][0]
+    image = Image.fromarray(np.asarray(frame, dtype=np.uint8))
+    # JPEG has no alpha channel
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, quality=quality)
+    return buffer.getvalue()
+
+def effective_fps(live_buffer: LiveFrameBuffer, fps: float) -> float:
+    """
+    Returns the rate frames are actually sent at for a requested fps.
+    Frames are never sent faster than the simulation captures them.
+    """
+    if live_buffer.max_fps is not None and live_buffer.max_fps > 0:
+        return min(fps, live_buffer.max_fps)
+    return fps
+
+async def live_view_generator(
+    live_buffer: LiveFrameBuffer,
+    fps: float = LiveFrameBuffer.DEFAULT_MAX_FPS,
+    fmt: Literal["mjpeg", "webp"] = "mjpeg",
+    should_stop: Union[Callable[[], bool], None] = None,
+    quality: int = 75,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Yields multipart/x-mixed-replace parts containing the newest frame
+    in the live buffer. The viewer is registered for as long as the
+    generator runs, so capture stops once every client disconnects.
+
+    Args:
+        live_buffer: Buffer filled by the simulation thread.
+        fps: Maximum rate at which frames are sent. Must be positive,
+            and is capped by the buffer's own max_fps (see effective_fps).
+        fmt: Either 'mjpeg' or 'webp'.
+        should_stop: Optional check that ends the stream when True.
+        quality: Encoder quality from 1-100.
+    """
+    if fps <= 0:
+        raise ValueError(f"Live view fps must be positive, got {fps}")
+    content_type = _FORMAT_INFO[fmt][1]
+    last_sent_id = -1
+    live_buffer.add_viewer()
+    logger.info(f"Live view viewer connected ({live_buffer.num_viewers} total).")
+    try:
+        while should_stop is None or not should_stop():
+            frame_id, frame = live_buffer.get()
+            if frame is not None and frame_id != last_sent_id:
+                last_sent_id = frame_id
+                # Encode off the event loop so other requests are not held up
+                data = await asyncio.to_thread(encode_frame, frame, fmt, quality)
+                yield (
+                    f"--{LIVE_VIEW_BOUNDARY}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n"
+                ).encode("utf-8") + data + b"\r\n"
+            # Read every time, the simulation may set max_fps after the viewer connects
+            await asyncio.sleep(1.0 / effective_fps(live_buffer, fps))
+    finally:
+        live_buffer.remove_viewer()
+        logger.info(f"Live view viewer disconnected ({live_buffer.num_viewers} remaining).")
@@ -2,7 +2,8 @@ import asyncio
 import functools
 import logging
 import copy
-from collections import defaultdict
+import os
+import shutil
 from datetime import datetime
 from threading import Lock
 from typing import Any, Callable, Dict, Iterable, List, Set, Tuple, Union
@@ -13,8 +14,17 @@ from gymdash.backend.core.api.models import (InteractorChannelModel,
                                              SimulationInteractionModel,
                                              SimulationStartConfig,
                                              StoredSimulationInfo,
-                                             ControlRequestBatch)
-from gymdash.backend.core.simulation.base import Simulation
+                                             SweepConfig)
+from gymdash.backend.core.simulation.admission import AdmissionController
+from gymdash.backend.core.simulation.archive import write_archive
+from gymdash.backend.core.simulation.base import (Simulation,
+                                                  SimulationInteractor)
+from gymdash.backend.core.simulation.broadcast import (KEEPALIVE_INTERVAL,
+                                                       ControlRequestBroadcaster,
+                                                       drain_to_batch)
+from gymdash.backend.core.simulation.scheduler import (ScheduleOptions,
+                                                       SimulationScheduler)
+from gymdash.backend.core.simulation.sweep import DEFAULT_MAX_CONFIGS, Sweep
 from gymdash.backend.project import ProjectManager
 from gymdash.backend.core.utils.type_utils import get_type
 
@@ -164,17 +174,28 @@ class SimulationGroup:
 
 class SimulationTracker:
 
-    QUERY_POLL_PERIOD = 0.2
     no_id = UUID('{00000000-0000-0000-0000-000000000000}')
 
     def __init__(self) -> None:
         self.running_sim_map:           Dict[UUID, Simulation] = {}
         self.done_sim_map:              Dict[UUID, Simulation] = {}
-        self._current_needed_outgoing:  Dict[UUID, Dict[UUID, Set[str]]] = defaultdict(dict)
-        self._current_needed_incoming:  Dict[UUID, Dict[UUID, Set[str]]] = defaultdict(dict)
-        self.queued_sims:               List[Tuple[Simulation, Dict[str,Any]]] = []
+        self.scheduler:                 SimulationScheduler = SimulationScheduler()
+        # Learns footprints from finished runs. Only consulted by the
+        # scheduler once enable_admission_control() is called.
+        self.admission:                 AdmissionController = AdmissionController(
+            footprint_loader=ProjectManager.get_sim_footprints
+        )
+        self.sweeps:                    Dict[UUID, Sweep] = {}
+        # Most configurations a single sweep may expand to. 0 disables the limit.
+        self.max_sweep_configs:         int = DEFAULT_MAX_CONFIGS
+        # Every tracked simulation publishes its control requests here
+        self.control_requests:          ControlRequestBroadcaster = ControlRequestBroadcaster()
 
         self._access_mutex:             Lock = Lock()
+        # Simulations being archived, so a manual archive and
+        # archive_loop never pack the same folder at once
+        self._archiving:                Set[UUID] = set()
+        self._archiving_lock:           Lock = Lock()
         
         self._clear_poll_period:        float= 0.1
         # This flag should be true while clear() is being called.
@@ -207,6 +228,7 @@ class SimulationTracker:
     
     def stop(self):
         self._is_stopping = True
+        self.control_requests.close()
 
     def update_simulation_db(self, sim_id: UUID, sim: Simulation):
         logger.info(f"Updating simulation DB entry: {str(sim_id)}")
@@ -220,20 +242,16 @@ class SimulationTracker:
             return results
         else:
             # Check in queued simulations to remove it
-            num_queued = len(self.queued_sims)
-            for i in range(num_queued-1, -1, -1):
-                logger.info(f"{self.queued_sims[i][0]._project_sim_id} vs {sim_id}")
-                if (self.queued_sims[i][0]._project_sim_id is not None and self.queued_sims[i][0]._project_sim_id == sim_id):
-                    popped = self.queued_sims.pop(i)
-                    popped[0].set_cancelled()
-                    # self.update_sim_dbs([sim_id])
-                    self.update_simulation_db(sim_id, popped[0])
-                    self._set_sim_done(sim_id, popped[0])
-                    return SimulationInteractionModel(
-                        id=str(sim_id),
-                        stop_simulation=InteractorChannelModel(triggered=True, value=""),
-                        cancelled=InteractorChannelModel(triggered=popped[0]._meta_cancelled, value=""),
-                    )
+            popped = self.scheduler.remove(sim_id)
+            if popped is not None:
+                popped[0].set_cancelled()
+                self.update_simulation_db(sim_id, popped[0])
+                self._set_sim_done(sim_id, popped[0])
+                return SimulationInteractionModel(
+                    id=str(sim_id),
+                    stop_simulation=InteractorChannelModel(triggered=True, value=""),
+                    cancelled=InteractorChannelModel(triggered=popped[0]._meta_cancelled, value=""),
+                )
     
     async def stop_simulation(self, sim_id):
         if (sim_id not in self.running_sim_map):
@@ -272,7 +290,12 @@ class SimulationTracker:
         # for each running simulation
         self._is_clearing_internal = True
         # Possibly wait here while other unrelated fulfillments finish up.
-        # Other interactions should be checking for the _is_clearing_internal flag
+        # Other interactions should be checking for the _is_clearing_internal flag,
+        # so give up their pending requests to let them return.
+        with self._access_mutex:
+            waiting_sims = list(self.running_sim_map.values()) + list(self.done_sim_map.values())
+        for sim in waiting_sims:
+            sim.interactor.cancel_all_requests()
         while (self._fullfilling_query):
             print(f"Waiting on {self._current_queries} query fulfillment")
             await asyncio.sleep(self._clear_poll_period)
@@ -287,10 +310,9 @@ class SimulationTracker:
         # Now clear out all my maps and such
         self.running_sim_map.clear()
         self.done_sim_map.clear()
-        self._current_needed_outgoing.clear()
-        self._current_needed_incoming.clear()
         self.callback_groups.clear()
-        self.queued_sims.clear()
+        self.sweeps.clear()
+        self.scheduler.clear()
         self._is_clearing_internal = False
         self._is_clearing = False
         return responses
@@ -323,10 +345,7 @@ class SimulationTracker:
             if self.running_sim_map.pop(sim_id, None) is None:
                 if self.done_sim_map.pop(sim_id, None) is None:
                     # Now try to remove from queud sims if queued
-                    num_queued = len(self.queued_sims)
-                    for i in range(num_queued-1, -1, -1):
-                        if (self.queued_sims[i][0]._project_sim_id is not None and self.queued_sims[i][0]._project_sim_id == sim_id):
-                            self.queued_sims.pop(i)
+                    self.scheduler.remove(sim_id)
 
         return responses
         
@@ -378,6 +397,57 @@ class SimulationTracker:
                 self.done_sim_map[sim_id] = revived_sim
                 print(f"SimulationTracker done_sim_map: {self.done_sim_map}")
 
+    def archive_simulations(self, sim_ids: Iterable[Union[str, UUID]]) -> Dict[str, bool]:
+        """
+        Packs the folders of finished simulations into single archive
+        files and switches their streamers over to read from the
+        archives. Simulations that are still running, were never saved,
+        or are already archived are skipped.
+
+        Args:
+            sim_ids: IDs of the simulations to archive.
+        Returns:
+            Map from each simulation ID to whether it was archived.
+        """
+        results = {}
+        for sim_id in sim_ids:
+            key = self._to_key(sim_id)
+            results[str(sim_id)] = False
+            if key == SimulationTracker.no_id or key in self.running_sim_map:
+                continue
+            with self._archiving_lock:
+                if key in self._archiving:
+                    continue
+                self._archiving.add(key)
+            try:
+                results[str(sim_id)] = self._archive_simulation(key)
+            finally:
+                with self._archiving_lock:
+                    self._archiving.discard(key)
+        return results
+
+    def _archive_simulation(self, key: UUID) -> bool:
+        stored = ProjectManager.get_filtered_simulations(sim_id=str(key))
+        if len(stored) < 1 or stored[0].archived:
+            return False
+        # Finished runs from earlier sessions may not be loaded yet
+        if key not in self.done_sim_map:
+            self.load_old_simulations_from_info(stored)
+        found, sim = self.try_get_sim(key)
+        if not found or sim.sim_path is None or not os.path.isdir(sim.sim_path):
+            return False
+        try:
+            write_archive(sim.sim_path, sim.streamer.streamers(), sim.archive_path)
+        except Exception as e:
+            logger.error(f"Could not archive simulation ({key}): {e}")
+            return False
+        ProjectManager.set_simulation_archived(key)
+        shutil.rmtree(sim.sim_path, ignore_errors=True)
+        sim.streamer.clear()
+        sim.create_streamers(stored[0].config, stored[0].start_kwargs)
+        logger.info(f"Archived simulation ({key}) to '{sim.archive_path}'")
+        return True
+
 
     def _to_key(self, key: Union[str, UUID]) -> UUID:
         # If UUID, we're good
@@ -533,6 +603,11 @@ class SimulationTracker:
             logger.warning(f"Could not create valid simulation.")
             return (SimulationTracker.no_id, None)
         simulation.set_project_info(ProjectManager.sims_folder(), ProjectManager.resources_folder(), new_id)
+        simulation.execution_mode = ProjectManager.execution_mode()
+        simulation.metric_sink = functools.partial(ProjectManager.add_simulation_metrics, new_id)
+        simulation.interactor.control_request_sink = functools.partial(self.control_requests.publish, new_id)
+        simulation.add_callback(Simulation.END_RUN, functools.partial(ProjectManager.add_simulation_summaries, new_id, simulation))
+        simulation.add_callback(Simulation.END_RUN, functools.partial(self._record_footprint, simulation))
         self.update_simulation_db(new_id, simulation)
         return (new_id, simulation)
 
@@ -582,51 +657,154 @@ class SimulationTracker:
         """
         id, simulation = self.create_simulation(to_start)
         if simulation is not None:
-            # Upon simulation finishing,
-            # trigger its removal from running simulations
-            # Add other callbacks. Mostly to update sim db at certain points/
-            on_done = functools.partial(self.on_sim_done, sim_ids=[id])
-            on_start_setup = functools.partial(self.update_sim_dbs, sim_ids=[id])
-            simulation.add_callback(Simulation.END_RUN, on_done)
-            simulation.add_callback(Simulation.START_SETUP, on_start_setup)
-            # Begin simulation/
-            simulation.start(**kwargs)
-            self.add_running_sim(id, simulation)
-            logger.info(f"Started simulation (id='{id}')")
+            self._launch_sim(id, simulation, **kwargs)
             return (id, simulation)
         
         logger.warning(f"Could not start simulation (key='{id}')")
         return (SimulationTracker.no_id, None)
+
+    def enable_admission_control(self, min_cpu_idle_percent: float, min_memory_available_mb: float) -> None:
+        """
+        Holds queued simulations back while the machine lacks headroom.
+        Footprints are only learned from process-mode runs, which can
+        be measured on their own.
+        """
+        self.admission.configure(min_cpu_idle_percent, min_memory_available_mb)
+        self.admission.load_footprints()
+        self.scheduler.admission = self.admission
+
+    def _record_footprint(self, sim: Simulation) -> None:
+        """Learns the resource footprint of a finished process-mode run."""
+        if sim.process is None or sim.config is None or sim.was_cancelled():
+            return
+        measured = sim.process.footprint()
+        if measured is None:
+            return
+        footprint = self.admission.learn(sim.config.sim_key, *measured)
+        ProjectManager.set_sim_footprint(sim.config.sim_key, footprint)
+
+    def _launch_sim(self, id: UUID, simulation: Simulation, **kwargs) -> None:
+        """Starts an already created simulation and tracks it as running."""
+        # Upon simulation finishing,
+        # trigger its removal from running simulations
+        # Add other callbacks. Mostly to update sim db at certain points/
+        on_done = functools.partial(self.on_sim_done, sim_ids=[id])
+        on_start_setup = functools.partial(self.update_sim_dbs, sim_ids=[id])
+        simulation.add_callback(Simulation.END_RUN, on_done)
+        simulation.add_callback(Simulation.START_SETUP, on_start_setup)
+        # Begin simulation/
+        simulation.start(**kwargs)
+        self.add_running_sim(id, simulation)
+        logger.info(f"Started simulation (id='{id}')")
     
-    def start_next_queued_sim(self) -> Tuple[UUID, Simulation]:
+    def start_queued_sims(self) -> List[Tuple[UUID, Simulation]]:
+        """
+        Starts every queued simulation that the scheduler
+        has capacity for. Returns the started simulations.
+        """
         if self._is_clearing:
-            return (SimulationTracker.no_id, None)
-        if len(self.queued_sims) > 0:
-            # with self._access_mutex:
-            to_start, kwargs = self.queued_sims.pop(0)
-            logger.info(f"Starting queued simulation {to_start._project_sim_id}")
-            logger.debug(f"Starting queued simulation {to_start._project_sim_id} with kwargs {kwargs}")
-            return self.start_sim(to_start, **kwargs)
+            return []
+        # Sweeps hand over more runs as their earlier ones finish
+        for sweep in list(self.sweeps.values()):
+            try:
+                sweep.fill(self)
+            except Exception:
+                logger.exception(f"Could not queue more runs of sweep '{sweep.id}'")
+        started = []
+        for sim_id, to_start, kwargs in self.scheduler.pop_ready():
+            logger.info(f"Starting queued simulation {sim_id}")
+            logger.debug(f"Starting queued simulation {sim_id} with kwargs {kwargs}")
+            try:
+                self._launch_sim(sim_id, to_start, **kwargs)
+            except Exception:
+                logger.exception(f"Failed to start queued simulation {sim_id}")
+                self._on_launch_failed(sim_id, to_start)
+                continue
+            started.append((sim_id, to_start))
+        return started
+
+    def _on_launch_failed(self, sim_id: UUID, simulation: Simulation) -> None:
+        """Frees the resources of a simulation that could not start and records it as failed."""
+        self.scheduler.release(sim_id)
+        with self._access_mutex:
+            self.running_sim_map.pop(sim_id, None)
+        with simulation._meta_mutex:
+            simulation._meta_failed = True
+        simulation.add_error_details("Simulation failed to start")
+        self.update_simulation_db(sim_id, simulation)
+        self._set_sim_done(sim_id, simulation)
 
     def queue_sim(
         self,
         to_start: Union[str, SimulationStartConfig, Simulation],
+        schedule_options: Union[ScheduleOptions, None] = None,
         **kwargs
     ) -> Tuple[UUID, Simulation]:
+        """
+        Creates a simulation and queues it to start once the
+        scheduler has a free slot and enough resources for it.
+
+        Args:
+            to_start: Simulation, config, or simulation name to queue.
+            schedule_options: Priority and resource weights of the
+                simulation. Defaults to ScheduleOptions().
+            kwargs: Custom start kwarg overrides for the simulation.
+        Returns:
+            info: The queued simulation ID and the simulation.
+        """
         # Create new simulation with config, then queue
         # it if it was created correctly
         new_id, sim = self.create_simulation(to_start)
         if (new_id != SimulationTracker.no_id and sim is not None):
-            self.queued_sims.append((
-                sim,
-                kwargs
-            ))
+            self.scheduler.push(new_id, sim, kwargs, schedule_options)
         else:
             logger.warning(f"Could not queue simulation because created simulation was invalid")
-        if len(self.running_sim_map) < 1 and len(self.queued_sims) > 0:
-            return self.start_next_queued_sim()
+        self.start_queued_sims()
         return (new_id, sim)
 
+    def start_sweep(self, config: SweepConfig) -> Sweep:
+        """
+        Expands a sweep's search space and queues its runs, at most
+        config.max_parallel at a time.
+
+        Raises:
+            ValueError: If the search space is invalid or larger
+                than max_sweep_configs.
+        """
+        sweep = Sweep(config, self.max_sweep_configs)
+        # Registered only once its first runs are queued, so a
+        # sweep that fails here is not retried by every later fill
+        sweep.fill(self)
+        self.sweeps[sweep.id] = sweep
+        logger.info(f"Started sweep '{config.name}' (id='{sweep.id}') with {sweep.total} configurations")
+        self.start_queued_sims()
+        return sweep
+
+    def get_sweep(self, sweep_id: Union[str, UUID]) -> Union[Sweep, None]:
+        return self.sweeps.get(self._to_key(sweep_id), None)
+
+    def update_sweeps(self) -> None:
+        """Applies each sweep's early stopping policy to its runs."""
+        if self._is_clearing:
+            return
+        for sweep in list(self.sweeps.values()):
+            try:
+                sweep.check_early_stopping(self)
+            except Exception:
+                logger.exception(f"Early stopping check failed for sweep '{sweep.id}'")
+
+    async def cancel_sweep(self, sweep_id: Union[str, UUID]) -> bool:
+        """Drops a sweep's remaining configurations and stops its queued and running simulations."""
+        sweep = self.get_sweep(sweep_id)
+        if sweep is None:
+            return False
+        sweep.cancel_pending()
+        await asyncio.gather(*(
+            self.stop_simulation_call(sim_id)
+            for sim_id in list(sweep.ids) if self.scheduler.holds(sim_id) or sim_id in self.running_sim_map
+        ))
+        return True
+
     def add_running_sim(
         self,
         sim_key: Union[str, UUID],
@@ -652,10 +830,10 @@ class SimulationTracker:
     def on_sim_done(self, sim_ids: Iterable[Union[str, UUID]]) -> None:
         self.remove_sims(sim_ids)
         self.update_sim_dbs(sim_ids)
-        # If there are not simulations left running,
-        # then start a queued simulation
-        if len(self.running_sim_map) < 1:
-                self.start_next_queued_sim()
+        # Hand the freed capacity to queued simulations
+        for sim_id in sim_ids:
+            self.scheduler.release(self._to_key(sim_id))
+        self.start_queued_sims()
             
     def update_sim_dbs(self, sim_ids: Iterable[Union[str, UUID]]) -> None:
         for sim_key in sim_ids:
@@ -678,50 +856,12 @@ class SimulationTracker:
     def _end_query(self, query_id: UUID):
         self._current_queries.remove(query_id)
 
-    def _reset_free_outgoing_response_triggers(self, sim_key: Union[str, UUID], just_freed: Set[str]):
-        """
-        Resets all outgoing channels that were just freed from an interaction
-        as long as they are also not being used by any other interaction
-        for the simulation.
-
-        Args:
-            sim_key: Simulation ID to which the freeing should apply.
-            just_freed: Set of channel keys that was just freed after
-                a completed interaction.
-        """
-        found, sim = self.try_get_sim(sim_key)
-        if not found: return
-        used = set() if len(self._current_needed_outgoing[sim_key]) < 1 else set.union(*self._current_needed_outgoing[sim_key].values())
-        to_reset = just_freed.difference(used)
-        logger.debug(f"SimulationTracker attempting to reset outgoing channels for {to_reset}")
-        logger.debug(f"SimulationTracker pre-reset status of outgoing channels {to_reset}: {[(item[0], item[1].outgoing.triggered) for item in sim.interactor.channels.items() if item[0] in to_reset]}")
-        sim.interactor.reset_outgoing_channels(to_reset)
-        logger.debug(f"SimulationTracker post-reset status of outgoing channels {to_reset}: {[(item[0], item[1].outgoing.triggered) for item in sim.interactor.channels.items() if item[0] in to_reset]}")
-
-    def _reset_free_incoming_response_triggers(self, sim_key: Union[str, UUID], just_freed: Set[str]):
-        """
-        Resets all incoming channels that were just freed from an interaction
-        as long as they are also not being used by any other interaction
-        for the simulation.
-
-        Args:
-            sim_key: Simulation ID to which the freeing should apply.
-            just_freed: Set of channel keys that was just freed after
-                a completed interaction.
-        """
-        found, sim = self.try_get_sim(sim_key)
-        if not found: return
-        used = set() if len(self._current_needed_incoming[sim_key]) < 1 else set.union(*self._current_needed_incoming[sim_key].values())
-        to_reset = just_freed.difference(used)
-        logger.debug(f"SimulationTracker attempting to reset incoming channels for {to_reset}")
-        logger.debug(f"SimulationTracker pre-reset status of incoming channels {to_reset}: {[(item[0], item[1].incoming.triggered) for item in sim.interactor.channels.items() if item[0] in to_reset]}")
-        sim.interactor.reset_incoming_channels(to_reset)
-        logger.debug(f"SimulationTracker post-reset status of incoming channels {to_reset}: {[(item[0], item[1].incoming.triggered) for item in sim.interactor.channels.items() if item[0] in to_reset]}")
-
     async def fulfill_query_interaction(self, sim_query: SimulationInteractionModel):
         """
-        Attempts to fulfill a query to a simulation by triggering incoming channels
-        and polling those triggered channels for outgoing values.
+        Attempts to fulfill a query to a simulation by sending a request
+        over each triggered interactor channel and waiting for the replies.
+        Every request is answered on its own, so any number of queries can
+        wait on the same simulation and channel at once.
 
         Args:
             sim_query: Query representing all channels for which information
@@ -741,76 +881,36 @@ class SimulationTracker:
         logger.debug(f"Query interaction details (interaction: {str(interaction_id)}): {sim_query}")
         query       = sim_query
         id          = self._to_key(query.id)
-        timeout     = query.timeout
-        can_timeout = query.timeout > 0
+        timeout     = query.timeout if query.timeout > 0 else None
         found, sim  = self.try_get_sim(id)
 
         if not found or self._is_clearing_internal:
             self._end_query(interaction_id)
             return SimulationInteractionModel(id=str(SimulationTracker.no_id))
         
-        # We want to assemble a list of attributes that be checked off
-        # as they resolve in each simulation and their data populates
-        # our response
-        needed_response_keys = set((
-            channel_tuple[0] for channel_tuple in query.triggered_channels
-        ))
+        needed_response_keys = [channel_tuple[0] for channel_tuple in query.triggered_channels]
         logger.debug(f"Query needed response keys: {needed_response_keys}")
-        response_data = {}
-        # Add the channels keys needed to fulfill this response to the list
-        self._current_needed_outgoing[id][interaction_id] = needed_response_keys
-        self._current_needed_incoming[id][interaction_id] = needed_response_keys
-        # Mark needed response channels by triggering them so the simulation
-        # knows to populate the outgoing channel with an update.
+        # Interactor channels are answered by the simulation.
+        # The rest are meta values read once those are in.
+        request_keys = [key for key in needed_response_keys if key in SimulationInteractor.ALL_CHANNELS]
+        replies = await asyncio.gather(*(
+            sim.interactor.request(key, query.get_channel(key).value, timeout)
+            for key in request_keys
+        ))
+        response_data = {
+            key: value for key, (replied, value) in zip(request_keys, replies) if replied
+        }
+        if self._is_clearing_internal:
+            self._end_query(interaction_id)
+            return response_data
+        retrieved_values = sim.get_outgoing_values()
         for channel_key in needed_response_keys:
-            incoming_query_channel_ref = query.get_channel(channel_key)
-            if incoming_query_channel_ref is not None:
-                sim.interactor.set_in(channel_key, incoming_query_channel_ref.value)
-        
-        # After marking channels for output, begin polling loop
-        await asyncio.sleep(0)
-        poll_period = SimulationTracker.QUERY_POLL_PERIOD
-        done = False
-        timer = 0
-        while not done:
-            if self._is_clearing_internal:
-                self._end_query(interaction_id)
-                return response_data
-            retrieved_values = sim.get_outgoing_values()
-            logger.debug(f"Simulation tracker retrieved outgoing values: {retrieved_values}")
-            for channel_key, outgoing_value in retrieved_values.items():
-                # If the outgoing key was not part of this query, then ignore it
-                if channel_key not in needed_response_keys:
-                    continue
-                # If the outgoing key has already been logged, then do NOT overwrite it
-                # with the new outgoing value. This could happen if another query
-                # API request comes in at the same time this one is processing.
-                if channel_key in response_data:
-                    continue
-                # channel_key not is a needed response and is not already logged
-                # so log the response
-                response_data[channel_key] = outgoing_value
-            # We are done assembling our response if we time-out or if
-            # we gather a full response
-            done_success = len(response_data) >= len(needed_response_keys)
-            done_timeout = can_timeout and timer >= timeout
-            done = done_success or done_timeout
-            if done_success:    logger.info(f"Query {id} (interaction: {str(interaction_id)}) successfully gathered.")
-            elif done_timeout:  logger.info(f"Query {id} (interaction: {str(interaction_id)}) timed out.")
-            # If not yet done, then increase our timer and wait until
-            # next polling
-            if not done:
-                timer += poll_period
-                await asyncio.sleep(poll_period)
-
-        # Remove the channel keys needed for my response from
-        # the collection of required keys for this Simulation,
-        # and then try to reset any outgoing channels that are
-        # now free in this Simulation.
-        self._current_needed_outgoing[id].pop(interaction_id)
-        self._current_needed_incoming[id].pop(interaction_id)
-        self._reset_free_outgoing_response_triggers(id, needed_response_keys)
-        self._reset_free_incoming_response_triggers(id, needed_response_keys)
+            if channel_key not in request_keys and channel_key in retrieved_values:
+                response_data[channel_key] = retrieved_values[channel_key]
+        if len(response_data) >= len(needed_response_keys):
+            logger.info(f"Query {id} (interaction: {str(interaction_id)}) successfully gathered.")
+        else:
+            logger.info(f"Query {id} (interaction: {str(interaction_id)}) timed out.")
 
         self._end_query(interaction_id)
         return response_data
@@ -839,29 +939,25 @@ class SimulationTracker:
         await asyncio.sleep(wait_time)
         return False
     
-    async def control_request_generator(self):
-        while True:
-            try:
-                done = await self.sleep(2)
-                if done: break
-                requests = self.get_control_requests()
-                requests_json = requests.model_dump_json()
-                logger.debug(f"control request json: '{requests_json}'")
-                requests_message = f"event: retrieval\ndata: {requests_json}\n\n"
-                yield requests_message
-            except Exception as e:
-                done = await self.sleep(10)
-                if done: break
-    
-    def get_control_requests(self) -> ControlRequestBatch:
+    async def control_request_generator(self, keepalive: float = KEEPALIVE_INTERVAL):
         """
-        Retrieve all control requests for all running simulations and
-        clear the control requests.
+        Yields a server-sent event with a ControlRequestBatch as soon as
+        any simulation makes control requests. While idle, only a comment
+        is sent every keepalive seconds to hold the connection open.
         """
-        control_requests = {}
-        with self._access_mutex:
-            for id, sim in self.running_sim_map.items():
-                if sim.interactor.has_requests:
-                    control_requests[id] = sim.interactor.get_all_control_requests()
-                    sim.interactor.clear_all_control_requests()
-        return ControlRequestBatch(requests=control_requests)
\ No newline at end of file
+        queue = self.control_requests.subscribe()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None: break
+                requests, ended = drain_to_batch(item, queue)
+                requests_json = requests.model_dump_json()
+                logger.debug(f"control request json: '{requests_json}'")
+                yield f"event: retrieval\ndata: {requests_json}\n\n"
+                if ended: break
+        finally:
+            self.control_requests.unsubscribe(queue)
\ No newline at end of file
@@ -0,0 +1,381 @@
+import inspect
+import logging
+import multiprocessing
+import threading
+import time
+from typing import Any, Dict, Set, Tuple, Type, Union
+
+try:
+    import psutil
+    _has_psutil = True
+except ImportError:
+    _has_psutil = False
+
+from gymdash.backend.core.api.models import (SimStatus,
+                                             SimulationStartConfig)
+from gymdash.backend.core.simulation.live_view import LiveFrameBuffer
+from gymdash.backend.core.utils.type_utils import get_type
+from gymdash.backend.enums import SimStatusCode, SimStatusSubcode
+
+logger = logging.getLogger(__name__)
+
+# Seconds between relay ticks on both ends of the pipe
+RELAY_PERIOD    = 0.05
+# Seconds between resource samples of the simulation process
+SAMPLE_PERIOD   = 1.0
+
+# Messages are (kind, payload) tuples.
+# Parent -> child:
+#   ("in", {channel_key: value})     set incoming channels
+#   ("reset_in", [channel_key])      reset incoming channels
+#   ("viewers", num_viewers)         live view viewer count
+#   ("rpc", [(id, key, value)])      new requests waiting for a reply
+#   ("rpc_cancel", [id])             requests no longer waited on
+# Child -> parent:
+#   ("update", {...})                everything new since the last tick
+#   ("done", {...})                  last update before the child exits
+
+class _ChildRelay:
+    """
+    Runs in the simulation process next to the simulation. Applies
+    the parent's channel writes and ships everything the simulation
+    produced back over the pipe, one batch per tick.
+    """
+    def __init__(self, sim: Any, conn) -> None:
+        self.sim = sim
+        self.conn = conn
+        self._stop = threading.Event()
+        self._last_frame_id = 0
+        self._sent_max_fps = LiveFrameBuffer.DEFAULT_MAX_FPS
+        self._sent_cancelled = False
+        self._sent_failed = False
+        # (request id, reply) pairs not yet sent to the parent
+        self._replies = []
+        self._replies_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="gymdash-child-relay", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _receive(self) -> None:
+        interactor = self.sim.interactor
+        while self.conn.poll():
+            kind, payload = self.conn.recv()
+            if kind == "in":
+                for channel_key, value in payload.items():
+                    interactor.set_in(channel_key, value)
+            elif kind == "reset_in":
+                interactor.reset_incoming_channels(payload)
+            elif kind == "viewers":
+                self.sim.live_view.set_num_viewers(payload)
+            elif kind == "rpc":
+                # Imported here, base imports this module
+                from gymdash.backend.core.simulation.base import \
+                    InteractorRequest
+                for request_id, channel_key, value in payload:
+                    interactor.submit(InteractorRequest(channel_key, value, request_id, self._on_request_done))
+            elif kind == "rpc_cancel":
+                for request_id in payload:
+                    interactor.cancel_request(request_id)
+
+    def _on_request_done(self, request: Any) -> None:
+        # Cancelled requests were given up on by the parent, or the
+        # child is closing and the parent closes its own requests
+        if request.replied:
+            with self._replies_lock:
+                self._replies.append((request.request_id, request.response))
+
+    def collect(self) -> Dict[str, Any]:
+        sim = self.sim
+        interactor = sim.interactor
+        update = {}
+        outgoing = interactor.get_all_outgoing_values()
+        if len(outgoing) > 0:
+            # The parent owns the channel state from here on
+            interactor.reset_outgoing_channels(outgoing.keys())
+            interactor.reset_incoming_channels(outgoing.keys())
+            update["out"] = outgoing
+        with self._replies_lock:
+            if len(self._replies) > 0:
+                update["replies"] = self._replies
+                self._replies = []
+        statuses = sim.retrieve_new_statuses()
+        if len(statuses) > 0:
+            update["statuses"] = statuses
+        metrics = sim.retrieve_new_metrics()
+        if len(metrics) > 0:
+            update["metrics"] = metrics
+        if interactor.has_requests:
+            update["requests"] = interactor.pop_all_control_requests()
+        # Usually set in _setup, so the parent caps viewers at the same rate
+        if sim.live_view.max_fps != self._sent_max_fps:
+            self._sent_max_fps = sim.live_view.max_fps
+            update["max_fps"] = sim.live_view.max_fps
+        frame_id, frame = sim.live_view.get()
+        if frame_id != self._last_frame_id and frame is not None:
+            self._last_frame_id = frame_id
+            update["frame"] = frame
+        if sim._meta_cancelled and not self._sent_cancelled:
+            self._sent_cancelled = True
+            update["cancelled"] = True
+        if sim._meta_failed and not self._sent_failed:
+            self._sent_failed = True
+            update["failed"] = True
+        return update
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._receive()
+                update = self.collect()
+                if len(update) > 0:
+                    self.conn.send(("update", update))
+            except (EOFError, OSError):
+                # Parent is gone, nothing left to report to
+                return
+            self._stop.wait(RELAY_PERIOD)
+
+def _import_sim_type(sim_type_name: str, sim_module_name: str, sim_file_path: Union[str, None]) -> Type:
+    """
+    Imports the simulation type by module name, or from its source
+    file for types that are not importable by name, like the ones
+    SimulationExporter loads from a path.
+    """
+    try:
+        sim_type = get_type(sim_type_name, sim_module_name)
+    except (ImportError, AttributeError):
+        sim_type = None
+    if sim_type is None and sim_file_path is not None:
+        # Imported here, export imports the simulation modules
+        from gymdash.backend.core.simulation.export import SimulationExporter
+        # Never replace the child's own __main__
+        module_name = SimulationExporter.DEFAULT_MODULE_NAME if sim_module_name == "__main__" else sim_module_name
+        module = SimulationExporter.import_from_path(module_name, sim_file_path)
+        sim_type = getattr(module, sim_type_name, None)
+    if sim_type is None:
+        raise ImportError(f"Could not import simulation type '{sim_type_name}' from module '{sim_module_name}' or file '{sim_file_path}'")
+    return sim_type
+
+def _process_main(
+    conn,
+    sim_type_name: str,
+    sim_module_name: str,
+    sim_file_path: Union[str, None],
+    config: SimulationStartConfig,
+    sims_folder: str,
+    resources_folder: str,
+    sim_id: Any,
+    kwargs: Dict[str, Any],
+) -> None:
+    """Entry point of a simulation process."""
+    logging.basicConfig(level = logging.INFO, format = '[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(message)s')
+    sim_type = _import_sim_type(sim_type_name, sim_module_name, sim_file_path)
+    sim = sim_type(config)
+    if sims_folder is not None:
+        sim.set_project_info(sims_folder, resources_folder, sim_id)
+    else:
+        sim._project_sim_id = sim_id
+    relay = _ChildRelay(sim, conn)
+    relay.start()
+    try:
+        sim.start_kwargs = kwargs
+        sim.setup(**kwargs)
+        sim.run()
+    finally:
+        relay.stop()
+        relay._receive()
+        conn.send(("done", relay.collect()))
+        conn.close()
+
+class SimulationProcess:
+    """
+    Parent side of a simulation running in its own process.
+
+    The simulation object in the API process stays the one the tracker
+    and API work with. Its interactor, statuses, metrics, control
+    requests and live view are mirrored to and from a copy of the
+    simulation in a child process over a pipe. relay() runs on the
+    parent simulation's thread, so is_done and the run callbacks behave
+    the same as in thread mode.
+    """
+    def __init__(self, sim: Any, kwargs: Dict[str, Any]) -> None:
+        self.sim = sim
+        self.kwargs = kwargs
+        self.process: Union[multiprocessing.Process, None] = None
+        self._conn = None
+        self._forwarded: Dict[str, Any] = {}
+        self._forwarded_requests: Set[Any] = set()
+        self._num_viewers = 0
+        # Resource use of the process tree, for admission control
+        self._ps_process = None
+        self._last_sample = 0
+        self.peak_memory_mb: float = 0
+        self._cpu_samples: int = 0
+        self._cpu_total: float = 0
+
+    @staticmethod
+    def locate_type(sim_type: Type) -> Union[Tuple[str, str, Union[str, None]], None]:
+        """
+        Returns the (type name, module name, source file) a simulation
+        process imports sim_type with, or None if it cannot import it.
+        """
+        try:
+            sim_file_path = inspect.getfile(sim_type)
+        except (TypeError, OSError):
+            sim_file_path = None
+        # Defined in an interactive session, no module or file to import
+        if sim_file_path is None and sim_type.__module__ == "__main__":
+            return None
+        return (sim_type.__name__, sim_type.__module__, sim_file_path)
+
+    def start(self) -> None:
+        sim = self.sim
+        location = SimulationProcess.locate_type(type(sim))
+        if location is None:
+            raise ImportError(f"Simulation type '{type(sim).__name__}' cannot be imported by a simulation process")
+        # Spawn instead of fork. The API process has threads and
+        # open database connections that must not be copied.
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_process_main,
+            args=(
+                child_conn,
+                *location,
+                sim.config,
+                sim._project_sim_base_path,
+                sim._project_resources_path,
+                sim._project_sim_id,
+                self.kwargs,
+            ),
+            name=f"gymdash-sim-{sim._project_sim_id}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        if _has_psutil:
+            try:
+                self._ps_process = psutil.Process(self.process.pid)
+                self._ps_process.cpu_percent(interval=None)
+            except psutil.Error:
+                self._ps_process = None
+
+    def _sample(self) -> None:
+        now = time.monotonic()
+        if self._ps_process is None or now - self._last_sample < SAMPLE_PERIOD:
+            return
+        self._last_sample = now
+        try:
+            memory = self._ps_process.memory_info().rss
+            for child in self._ps_process.children(recursive=True):
+                try:
+                    memory += child.memory_info().rss
+                except psutil.Error:
+                    pass
+            cpu_percent = self._ps_process.cpu_percent(interval=None)
+        except psutil.Error:
+            return
+        self.peak_memory_mb = max(self.peak_memory_mb, memory / (1024*1024))
+        self._cpu_total += cpu_percent
+        self._cpu_samples += 1
+
+    def footprint(self) -> Union[Tuple[float, float], None]:
+        """Returns the (peak memory mb, mean cpu percent) measured, if any."""
+        if self._cpu_samples < 1:
+            return None
+        return (self.peak_memory_mb, self._cpu_total / self._cpu_samples)
+
+    def _apply(self, update: Dict[str, Any]) -> None:
+        sim = self.sim
+        for channel_key, value in update.get("out", {}).items():
+            sim.interactor.set_out_flag(channel_key, value)
+            self._forwarded.pop(channel_key, None)
+        for request_id, value in update.get("replies", []):
+            sim.interactor.reply_to(request_id, value)
+            self._forwarded_requests.discard(request_id)
+        for status in update.get("statuses", []):
+            # Keep the time the child recorded
+            with sim._meta_mutex:
+                sim._meta_statuses.append(status)
+        if "metrics" in update:
+            sim._add_metric_rows(update["metrics"])
+        for channel_key, requests in update.get("requests", {}).items():
+            for request in requests:
+                sim.interactor.add_control_request(channel_key, request.details, *(request.subkeys or []))
+        if "max_fps" in update:
+            sim.live_view.max_fps = update["max_fps"]
+        if "frame" in update:
+            sim.live_view.put(update["frame"])
+        if update.get("cancelled", False):
+            sim.set_cancelled()
+        if update.get("failed", False):
+            with sim._meta_mutex:
+                sim._meta_failed = True
+
+    def _forward(self) -> None:
+        """Sends incoming channel writes and requests the child has not answered yet."""
+        to_send = {}
+        to_reset = []
+        for channel_key, channel in self.sim.interactor.channels.items():
+            if channel.incoming.triggered and not channel.outgoing.triggered:
+                if channel_key not in self._forwarded or self._forwarded[channel_key] != channel.incoming.value:
+                    to_send[channel_key] = channel.incoming.value
+            elif not channel.incoming.triggered and channel_key in self._forwarded:
+                # Query was given up on, so the child should not answer it
+                to_reset.append(channel_key)
+        for channel_key in to_reset:
+            self._forwarded.pop(channel_key)
+        if len(to_reset) > 0:
+            self._conn.send(("reset_in", to_reset))
+        if len(to_send) > 0:
+            self._forwarded.update(to_send)
+            self._conn.send(("in", to_send))
+        pending = self.sim.interactor.pending_requests()
+        new_requests = [
+            (request.request_id, request.channel_key, request.value)
+            for request in pending if request.request_id not in self._forwarded_requests
+        ]
+        # Timed out or cancelled on this side
+        given_up = self._forwarded_requests.difference(request.request_id for request in pending)
+        self._forwarded_requests = set(request.request_id for request in pending)
+        if len(given_up) > 0:
+            self._conn.send(("rpc_cancel", list(given_up)))
+        if len(new_requests) > 0:
+            self._conn.send(("rpc", new_requests))
+        num_viewers = self.sim.live_view.num_viewers
+        if num_viewers != self._num_viewers:
+            self._num_viewers = num_viewers
+            self._conn.send(("viewers", num_viewers))
+
+    def relay(self) -> None:
+        """Mirrors state between the two processes until the child exits."""
+        finished = False
+        while not finished:
+            try:
+                if self._conn.poll(RELAY_PERIOD):
+                    while self._conn.poll():
+                        kind, update = self._conn.recv()
+                        self._apply(update)
+                        finished = finished or kind == "done"
+                if not finished:
+                    if not self.process.is_alive() and not self._conn.poll():
+                        break
+                    self._forward()
+                    self._sample()
+            except (EOFError, OSError):
+                break
+        self.process.join()
+        self._conn.close()
+        if not finished:
+            # Crashed or killed without reporting back
+            with self.sim._meta_mutex:
+                self.sim._meta_failed = True
+            self.sim.add_status(SimStatus(
+                code=SimStatusCode.FAIL,
+                subcode=SimStatusSubcode.ERROR,
+                details=f"Simulation process exited unexpectedly with code {self.process.exitcode}",
+            ))
@@ -0,0 +1,167 @@
+import dataclasses
+import heapq
+import itertools
+import logging
+import os
+from threading import Lock
+from typing import Any, Dict, List, Tuple, Union
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+@dataclasses.dataclass(frozen=True)
+class ScheduleOptions:
+    """How a queued simulation competes for the scheduler's capacity.
+
+    Attributes:
+      priority: Higher priorities start first. Equal priorities start
+        in the order they were queued.
+      cpu_threads: CPU threads the simulation is expected to occupy.
+      memory_mb: Estimated peak memory of the simulation in megabytes.
+    """
+    priority: int = 0
+    cpu_threads: int = 1
+    memory_mb: float = 0
+
+@dataclasses.dataclass
+class _QueuedEntry:
+    sim_id: UUID
+    sim: Any
+    kwargs: Dict[str, Any]
+    options: ScheduleOptions
+
+class SimulationScheduler:
+    """
+    Priority queue of simulations waiting to run, bounded by a number of
+    slots and by CPU thread and memory budgets.
+
+    Entries are ordered by priority and then by queue order. The scheduler
+    never lets a later entry jump ahead of the head of the queue, so a
+    large, high priority run cannot be starved by a stream of small ones.
+    A run whose weight exceeds a budget on its own is still started once
+    nothing else is running.
+
+    An optional admission controller (see AdmissionController) is asked
+    as a last check, so runs are also held back while the machine
+    itself is short on CPU or memory.
+    """
+    def __init__(
+        self,
+        slots: int = 1,
+        cpu_budget: Union[int, None] = None,
+        memory_budget_mb: float = 0,
+        admission: Any = None,
+    ) -> None:
+        self.admission = admission
+        self._lock = Lock()
+        self._heap: List[Tuple[int, int, UUID]] = []
+        self._entries: Dict[UUID, _QueuedEntry] = {}
+        self._running: Dict[UUID, ScheduleOptions] = {}
+        self._counter = itertools.count()
+        self.configure(slots, cpu_budget, memory_budget_mb)
+
+    def configure(
+        self,
+        slots: int = 1,
+        cpu_budget: Union[int, None] = None,
+        memory_budget_mb: float = 0,
+    ) -> None:
+        """
+        Args:
+            slots: Most simulations running at once. 0 uses the CPU count.
+            cpu_budget: Most CPU threads reserved at once. None
+                or 0 uses the CPU count.
+            memory_budget_mb: Most estimated memory reserved at once.
+                0 disables the memory limit.
+        """
+        cpu_count = os.cpu_count() or 1
+        with self._lock:
+            self.slots = slots if slots > 0 else cpu_count
+            self.cpu_budget = cpu_budget if cpu_budget else cpu_count
+            self.memory_budget_mb = memory_budget_mb
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def num_running(self) -> int:
+        with self._lock:
+            return len(self._running)
+
+    def push(self, sim_id: UUID, sim: Any, kwargs: Dict[str, Any], options: Union[ScheduleOptions, None] = None) -> None:
+        """Queues a created simulation to be started with kwargs."""
+        options = options if options is not None else ScheduleOptions()
+        with self._lock:
+            if sim_id in self._entries:
+                raise ValueError(f"Simulation '{sim_id}' is already queued")
+            self._entries[sim_id] = _QueuedEntry(sim_id, sim, kwargs, options)
+            heapq.heappush(self._heap, (-options.priority, next(self._counter), sim_id))
+
+    def remove(self, sim_id: UUID) -> Union[Tuple[Any, Dict[str, Any]], None]:
+        """Removes a queued simulation. Returns its (sim, kwargs) if it was queued."""
+        with self._lock:
+            # Left in the heap and skipped when reached
+            entry = self._entries.pop(sim_id, None)
+        return (entry.sim, entry.kwargs) if entry is not None else None
+
+    def queued_ids(self) -> List[UUID]:
+        """Returns the queued simulation IDs in the order they will start."""
+        with self._lock:
+            return [sim_id for _, _, sim_id in sorted(self._heap) if sim_id in self._entries]
+
+    def holds(self, sim_id: UUID) -> bool:
+        """Returns True while a simulation is queued or holds reserved resources."""
+        with self._lock:
+            return sim_id in self._entries or sim_id in self._running
+
+    def _fits(self, entry: _QueuedEntry) -> bool:
+        options = entry.options
+        if len(self._running) == 0:
+            return True
+        if len(self._running) >= self.slots:
+            return False
+        cpu_used = sum(o.cpu_threads for o in self._running.values())
+        if cpu_used + options.cpu_threads > self.cpu_budget:
+            return False
+        if self.memory_budget_mb > 0:
+            memory_used = sum(o.memory_mb for o in self._running.values())
+            if memory_used + options.memory_mb > self.memory_budget_mb:
+                return False
+        if self.admission is not None:
+            return self.admission.admit(entry.sim, options)
+        return True
+
+    def pop_ready(self) -> List[Tuple[UUID, Any, Dict[str, Any]]]:
+        """
+        Removes and returns (sim_id, sim, kwargs) for every queued simulation
+        that can start now, reserving their resources until release().
+        """
+        ready = []
+        with self._lock:
+            while len(self._heap) > 0:
+                _, _, sim_id = self._heap[0]
+                entry = self._entries.get(sim_id, None)
+                if entry is None:
+                    heapq.heappop(self._heap)
+                    continue
+                if not self._fits(entry):
+                    break
+                heapq.heappop(self._heap)
+                del self._entries[sim_id]
+                self._running[sim_id] = entry.options
+                if self.admission is not None:
+                    self.admission.record_launch(entry.sim, entry.options)
+                ready.append((sim_id, entry.sim, entry.kwargs))
+        return ready
+
+    def release(self, sim_id: UUID) -> bool:
+        """Frees the resources of a finished simulation. Returns False if it held none."""
+        with self._lock:
+            return self._running.pop(sim_id, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+            self._running.clear()
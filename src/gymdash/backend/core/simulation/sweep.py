@@ -0,0 +1,273 @@
+import copy
+import functools
+import itertools
+import logging
+import math
+import random
+from threading import Lock
+from typing import Any, Dict, List, Set
+from uuid import UUID, uuid4
+
+from gymdash.backend.core.api.models import (SimulationStartConfig,
+                                             SweepConfig, SweepParameter,
+                                             SweepProgress)
+from gymdash.backend.core.simulation.base import InteractorRequest
+from gymdash.backend.core.simulation.early_stop import make_policy
+from gymdash.backend.core.simulation.scheduler import ScheduleOptions
+
+logger = logging.getLogger(__name__)
+
+# Default cap on the configurations one sweep may expand to
+DEFAULT_MAX_CONFIGS = 10000
+
+def _from_unit(parameter: SweepParameter, u: float) -> Any:
+    """Maps u in [0, 1) onto the parameter's values or range."""
+    if parameter.values is not None:
+        return parameter.values[min(int(u*len(parameter.values)), len(parameter.values)-1)]
+    if parameter.scale == "log":
+        value = math.exp(math.log(parameter.low) + u*(math.log(parameter.high) - math.log(parameter.low)))
+    else:
+        value = parameter.low + u*(parameter.high - parameter.low)
+    return int(round(value)) if parameter.integer else value
+
+def _grid_values(path: str, parameter: SweepParameter) -> List[Any]:
+    if parameter.values is not None:
+        return list(parameter.values)
+    if parameter.grid_points == 1:
+        return [_from_unit(parameter, 0)]
+    # Both ends of the range are included
+    return [_from_unit(parameter, i/(parameter.grid_points-1)) for i in range(parameter.grid_points)]
+
+def _check_parameter(path: str, parameter: SweepParameter) -> None:
+    if parameter.values is not None:
+        if len(parameter.values) < 1:
+            raise ValueError(f"Sweep parameter '{path}' has no values")
+        return
+    if parameter.low is None or parameter.high is None:
+        raise ValueError(f"Sweep parameter '{path}' needs values or a low and high")
+    if parameter.scale == "log" and (parameter.low <= 0 or parameter.high <= 0):
+        raise ValueError(f"Sweep parameter '{path}' needs a positive range for log scale")
+
+def _axis_length(path: str, parameter: SweepParameter) -> int:
+    if parameter.values is not None:
+        return len(parameter.values)
+    if parameter.grid_points < 1:
+        raise ValueError(f"Sweep parameter '{path}' needs values or grid_points for grid search")
+    return parameter.grid_points
+
+def search_space_size(sweep: SweepConfig) -> int:
+    """Returns the number of configurations a sweep expands to, without expanding it."""
+    if sweep.strategy == "grid":
+        return math.prod(_axis_length(path, parameter) for path, parameter in sweep.parameters.items())
+    return sweep.num_samples
+
+def expand_search_space(sweep: SweepConfig, max_configs: int = DEFAULT_MAX_CONFIGS) -> List[Dict[str, Any]]:
+    """
+    Expands a sweep's search space into one assignment per run.
+
+    Grid search takes every combination of the parameters' values.
+    Random search draws num_samples independent points. Latin hypercube
+    search also draws num_samples points, but splits each parameter into
+    num_samples equal strata and uses each stratum once, so every
+    parameter is covered evenly even with few samples.
+
+    Args:
+        sweep: The sweep to expand.
+        max_configs: Most configurations allowed. 0 disables the limit.
+    Returns:
+        List of dicts from kwargs path to value.
+    Raises:
+        ValueError: If the search space is invalid or too large.
+    """
+    paths = list(sweep.parameters.keys())
+    for path in paths:
+        _check_parameter(path, sweep.parameters[path])
+    # Checked before anything is built, since a grid grows exponentially
+    size = search_space_size(sweep)
+    if max_configs > 0 and size > max_configs:
+        raise ValueError(f"Sweep '{sweep.name}' expands to {size} configurations, more than the limit of {max_configs}")
+    if sweep.strategy == "grid":
+        axes = [_grid_values(path, sweep.parameters[path]) for path in paths]
+        return [dict(zip(paths, combination)) for combination in itertools.product(*axes)]
+    rng = random.Random(sweep.seed)
+    n = sweep.num_samples
+    if sweep.strategy == "random":
+        return [
+            { path: _from_unit(sweep.parameters[path], rng.random()) for path in paths }
+            for _ in range(n)
+        ]
+    if sweep.strategy == "latin_hypercube":
+        columns = {}
+        for path in paths:
+            strata = list(range(n))
+            rng.shuffle(strata)
+            columns[path] = [_from_unit(sweep.parameters[path], (stratum + rng.random())/n) for stratum in strata]
+        return [{ path: columns[path][i] for path in paths } for i in range(n)]
+    raise ValueError(f"Unknown sweep strategy '{sweep.strategy}'")
+
+def apply_assignment(base_config: SimulationStartConfig, assignment: Dict[str, Any], name: str) -> SimulationStartConfig:
+    """Returns a copy of base_config with each dotted kwargs path set to its value."""
+    kwargs = copy.deepcopy(base_config.kwargs)
+    for path, value in assignment.items():
+        keys = path.split(".")
+        target = kwargs
+        for key in keys[:-1]:
+            if not isinstance(target.get(key, None), dict):
+                target[key] = {}
+            target = target[key]
+        target[keys[-1]] = value
+    return base_config.model_copy(update={ "name": name, "kwargs": kwargs })
+
+class Sweep:
+    """
+    A search over a base config's kwargs, run as a group of simulations.
+
+    The expanded configurations are handed to the tracker's scheduler by
+    fill(), at most max_parallel at a time, and the rest wait here until
+    earlier runs of the sweep finish. With an early stopping policy,
+    check_early_stopping() stops running runs that fall behind, which
+    frees their capacity for the remaining configurations.
+    """
+    def __init__(self, config: SweepConfig, max_configs: int = DEFAULT_MAX_CONFIGS) -> None:
+        self.id:        UUID                        = uuid4()
+        self.config:    SweepConfig                 = config
+        self.options:   ScheduleOptions             = ScheduleOptions(
+            priority=config.priority,
+            cpu_threads=config.cpu_threads,
+            memory_mb=config.memory_mb,
+        )
+        self._pending:  List[Dict[str, Any]]        = expand_search_space(config, max_configs)
+        self.total:     int                         = len(self._pending)
+        self.ids:       List[UUID]                  = []
+        self.sims:      Dict[UUID, Any]             = {}
+        self.assignments: Dict[UUID, Dict[str, Any]] = {}
+        self.num_invalid: int                       = 0
+        self.num_dropped: int                       = 0
+        self.policy = make_policy(config.early_stopping)
+        self.stopped: Set[UUID]                     = set()
+        self._lock = Lock()
+
+    @property
+    def num_pending(self) -> int:
+        return len(self._pending)
+
+    def _is_active(self, tracker: Any, sim_id: UUID) -> bool:
+        return tracker.scheduler.holds(sim_id) or sim_id in tracker.running_sim_map
+
+    def fill(self, tracker: Any) -> int:
+        """
+        Hands pending configurations to the tracker's scheduler while the
+        sweep has fewer than max_parallel runs queued or running.
+
+        Returns:
+            Number of simulations queued.
+        """
+        with self._lock:
+            if len(self._pending) < 1:
+                return 0
+            limit = self.config.max_parallel
+            active = sum(1 for sim_id in self.ids if self._is_active(tracker, sim_id)) if limit > 0 else 0
+            queued = 0
+            while len(self._pending) > 0 and (limit <= 0 or active < limit):
+                assignment = self._pending.pop(0)
+                index = self.total - len(self._pending) - 1
+                try:
+                    sim_config = apply_assignment(self.config.base_config, assignment, f"{self.config.name} [{index}]")
+                    sim_id, sim = tracker.create_simulation(sim_config)
+                except Exception:
+                    # A configuration the simulation rejects must not stop the rest
+                    logger.exception(f"Sweep '{self.config.name}' could not create simulation {index}")
+                    sim = None
+                if sim is None:
+                    self.num_invalid += 1
+                    continue
+                if self.policy is not None:
+                    # Every logged point, so rung values are taken at their own step
+                    sim.add_metric_listener(self.policy.config.metric, functools.partial(self.policy.observe, sim_id))
+                tracker.scheduler.push(sim_id, sim, {}, self.options)
+                self.ids.append(sim_id)
+                self.sims[sim_id] = sim
+                self.assignments[sim_id] = assignment
+                active += 1
+                queued += 1
+            if queued > 0:
+                logger.info(f"Sweep '{self.config.name}' queued {queued} simulations ({len(self._pending)} left)")
+            return queued
+
+    def cancel_pending(self) -> int:
+        """Drops the configurations not yet handed to the scheduler."""
+        with self._lock:
+            dropped = len(self._pending)
+            self._pending.clear()
+            self.num_dropped += dropped
+            return dropped
+
+    def check_early_stopping(self, tracker: Any) -> List[UUID]:
+        """
+        Asks the policy about each run, and sends a stop request to
+        running runs it rejects. The policy is fed every logged value of
+        the target metric as it is logged, not only what is newest here.
+
+        Returns:
+            IDs of the simulations asked to stop.
+        """
+        if self.policy is None:
+            return []
+        with self._lock:
+            ids = list(self.ids)
+        to_stop = []
+        for sim_id in ids:
+            if sim_id in self.stopped:
+                continue
+            # Finished runs are still judged, so their rung
+            # values are recorded for the runs after them
+            if self.policy.should_stop(sim_id) and sim_id in tracker.running_sim_map:
+                to_stop.append(sim_id)
+        for sim_id in to_stop:
+            self.stopped.add(sim_id)
+            # Same channel as a user stopping the run, but nobody waits on the reply
+            self.sims[sim_id].interactor.submit(InteractorRequest("stop_simulation", True))
+        return to_stop
+
+    def is_done(self, tracker: Any) -> bool:
+        with self._lock:
+            ids = list(self.ids)
+            num_pending = len(self._pending)
+        return num_pending < 1 and not any(self._is_active(tracker, sim_id) for sim_id in ids)
+
+    def progress(self, tracker: Any) -> SweepProgress:
+        with self._lock:
+            ids = list(self.ids)
+            num_pending = len(self._pending)
+        queued = running = finished = failed = cancelled = stopped_early = 0
+        queued_ids = set(tracker.scheduler.queued_ids())
+        for sim_id in ids:
+            sim = self.sims[sim_id]
+            if sim_id in queued_ids:
+                queued += 1
+            elif self._is_active(tracker, sim_id):
+                running += 1
+            elif sim_id in self.stopped:
+                stopped_early += 1
+            elif sim._meta_cancelled:
+                cancelled += 1
+            elif sim._meta_failed:
+                failed += 1
+            else:
+                finished += 1
+        total = max(self.total, 1)
+        return SweepProgress(
+            sweep_id        = self.id,
+            name            = self.config.name,
+            total           = self.total,
+            pending         = num_pending,
+            queued          = queued,
+            running         = running,
+            finished        = finished,
+            failed          = failed + self.num_invalid,
+            cancelled       = cancelled + self.num_dropped,
+            stopped_early   = stopped_early,
+            fraction_done   = (finished + failed + cancelled + stopped_early + self.num_invalid + self.num_dropped) / total,
+            sim_ids         = ids,
+            assignments     = { sim_id: self.assignments[sim_id] for sim_id in ids },
+        )
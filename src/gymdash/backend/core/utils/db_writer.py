@@ -0,0 +1,213 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Union
+
+logger = logging.getLogger(__name__)
+
+class _WriteTask:
+    __slots__ = ("func", "args", "kwargs", "future", "urgent", "coalesce_key")
+    def __init__(self, func, args, kwargs, urgent, coalesce_key) -> None:
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.urgent: bool = urgent
+        self.coalesce_key: Union[Hashable, None] = coalesce_key
+
+class DatabaseWriter:
+    """
+    Single thread that owns the only writing connection to an SQLite
+    database. Writes are queued from any thread and applied in batches,
+    one transaction per batch, with the database in WAL mode so that
+    readers on other connections never wait on the writer.
+
+    A batch is committed once max_batch writes are queued, max_latency
+    seconds after its first write arrived, or as soon as an urgent
+    write arrives. Each write runs inside its own savepoint, so one
+    failing write does not roll back the rest of its batch.
+    """
+    _STOP = object()
+
+    def __init__(
+        self,
+        db_path: str,
+        max_latency: float = 1.0,
+        max_batch: int = 256,
+        on_connect: Union[Callable[[sqlite3.Connection], None], None] = None
+    ) -> None:
+        """
+        Args:
+            db_path: Path of the database file.
+            max_latency: Longest time in seconds a non-urgent write waits
+                for other writes to share its transaction.
+            max_batch: Most writes committed in a single transaction.
+            on_connect: Optional setup run on the writer connection when
+                the thread starts.
+        """
+        self.db_path = db_path
+        self.max_latency = max_latency
+        self.max_batch = max(1, max_batch)
+        self.on_connect = on_connect
+        self.con: Union[sqlite3.Connection, None] = None
+        self.cur: Union[sqlite3.Cursor, None] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Union[threading.Thread, None] = None
+        self._ready = threading.Event()
+
+    @property
+    def thread(self) -> Union[threading.Thread, None]:
+        return self._thread
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+    @property
+    def on_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def connect(self) -> sqlite3.Connection:
+        """Creates the writer connection. Only called from the writer thread."""
+        # Transactions are managed by the writer, so open in autocommit mode
+        con = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL;")
+        # Safe with WAL: a crash can only lose the most recent commits
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute("PRAGMA foreign_keys=ON;")
+        return con
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="gymdash-db-writer", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout: Union[float, None] = None) -> None:
+        """Commits every queued write, then stops the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(DatabaseWriter._STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(
+        self,
+        func: Callable[..., Any],
+        *args,
+        urgent: bool = False,
+        coalesce_key: Union[Hashable, None] = None,
+        **kwargs
+    ) -> Future:
+        """
+        Queues a write.
+
+        Args:
+            func: Function doing the write through the writer connection.
+            urgent: If True, the batch containing this write is committed
+                immediately instead of waiting out max_latency.
+            coalesce_key: Writes in the same batch with the same key are
+                only run once, using the latest one. Use for idempotent
+                writes like saving the current state of a simulation.
+        Returns:
+            Future resolving to the function's return value once the
+            transaction containing it has been committed.
+        """
+        task = _WriteTask(func, args, kwargs, urgent, coalesce_key)
+        if self.on_writer_thread:
+            # Nested write from inside another write. Run it now
+            # as part of the current transaction.
+            task.future.set_result(func(*args, **kwargs))
+            return task.future
+        self._queue.put(task)
+        return task.future
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Queues an urgent write and waits for it to be committed."""
+        return self.submit(func, *args, urgent=True, **kwargs).result()
+
+    def flush(self) -> None:
+        """Waits until every write queued so far has been committed."""
+        if self._thread is None or self.on_writer_thread:
+            return
+        self.run(lambda: None)
+
+    def _run(self) -> None:
+        try:
+            self.con = self.connect()
+            self.cur = self.con.cursor()
+            if self.on_connect is not None:
+                self.on_connect(self.con)
+        except Exception as e:
+            logger.exception(f"DatabaseWriter could not open '{self.db_path}'")
+            self._ready.set()
+            return
+        self._ready.set()
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect_batch()
+            if len(batch) > 0:
+                self._write_batch(batch)
+        self.con.close()
+        self.con = None
+        self.cur = None
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is DatabaseWriter._STOP:
+            return ([], True)
+        batch: List[_WriteTask] = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch and not batch[-1].urgent:
+            remaining = deadline - time.monotonic()
+            try:
+                task = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if task is DatabaseWriter._STOP:
+                return (batch, True)
+            batch.append(task)
+        return (batch, False)
+
+    def _write_batch(self, batch: List[_WriteTask]) -> None:
+        # Only run the newest write for each coalesce key
+        latest: Dict[Hashable, _WriteTask] = {}
+        for task in batch:
+            if task.coalesce_key is not None:
+                latest[task.coalesce_key] = task
+        results: Dict[int, Any] = {}
+        errors: Dict[int, BaseException] = {}
+        start = time.perf_counter()
+        try:
+            self.cur.execute("BEGIN")
+            for i, task in enumerate(batch):
+                if task.coalesce_key is not None and latest[task.coalesce_key] is not task:
+                    continue
+                self.cur.execute("SAVEPOINT write_task")
+                try:
+                    results[i] = task.func(*task.args, **task.kwargs)
+                    self.cur.execute("RELEASE write_task")
+                except Exception as e:
+                    self.cur.execute("ROLLBACK TO write_task")
+                    self.cur.execute("RELEASE write_task")
+                    errors[i] = e
+                    logger.error(f"DatabaseWriter write {task.func} failed: {e}")
+            self.cur.execute("COMMIT")
+        except Exception as e:
+            logger.exception(f"DatabaseWriter failed to commit batch of {len(batch)} writes")
+            if self.con.in_transaction:
+                self.con.rollback()
+            for task in batch:
+                task.future.set_exception(e)
+            return
+        logger.debug(f"DatabaseWriter committed {len(batch)} writes in {time.perf_counter()-start:.4f}s")
+        for i, task in enumerate(batch):
+            if i in errors:
+                task.future.set_exception(errors[i])
+            elif task.coalesce_key is not None and latest[task.coalesce_key] is not task:
+                task.future.set_result(None)
+            else:
+                task.future.set_result(results.get(i, None))
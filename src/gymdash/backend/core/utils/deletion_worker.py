@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+class DeletionWorker:
+    """
+    Background thread that reclaims the files of deleted simulations.
+
+    Deletions are recorded durably elsewhere (see ProjectManager's
+    pending_deletions table) and handed to the worker through
+    fetch_pending, so a restart simply resumes where the last run
+    stopped. Files are removed one at a time and the worker sleeps as
+    needed to stay under a byte and file rate, so reclaiming a large
+    run does not starve the disk for simulations that are training.
+    """
+    def __init__(
+        self,
+        root_folder: str,
+        fetch_pending: Callable[[int], List[Tuple[Any, str]]],
+        complete: Callable[[Any], None],
+        bytes_per_sec: float = 50*1024*1024,
+        files_per_sec: float = 500,
+        batch_size: int = 8,
+        idle_poll: float = 30,
+    ) -> None:
+        """
+        Args:
+            root_folder: Only paths inside this folder are ever deleted.
+            fetch_pending: Returns up to n (key, path) pairs still to delete.
+            complete: Called with a key once its path is fully removed.
+            bytes_per_sec: Maximum rate of file bytes deleted.
+            files_per_sec: Maximum rate of files deleted.
+            batch_size: Pending entries fetched at a time.
+            idle_poll: Seconds between checks for new work when idle.
+        """
+        self.root_folder = os.path.realpath(root_folder)
+        self.fetch_pending = fetch_pending
+        self.complete = complete
+        self.bytes_per_sec = bytes_per_sec
+        self.files_per_sec = files_per_sec
+        self.batch_size = batch_size
+        self.idle_poll = idle_poll
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+        # Throttle state
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_files = 0
+        # Metrics
+        self.files_deleted = 0
+        self.bytes_deleted = 0
+        self.completed = 0
+        self.current: Union[str, None] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gymdash-deletion", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Union[float, None] = 5) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self) -> None:
+        """Wakes the worker after new deletions have been recorded."""
+        self._wake.set()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "running":          self._thread is not None and self._thread.is_alive(),
+            "current":          self.current,
+            "completed":        self.completed,
+            "files_deleted":    self.files_deleted,
+            "bytes_deleted":    self.bytes_deleted,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                pending = self.fetch_pending(self.batch_size)
+            except Exception as e:
+                logger.error(f"DeletionWorker could not fetch pending deletions: {e}")
+                pending = []
+            if len(pending) == 0:
+                self._wake.wait(self.idle_poll)
+                continue
+            for key, path in pending:
+                if self._stop.is_set():
+                    return
+                self.current = str(key)
+                try:
+                    if self._delete_tree(path):
+                        self.complete(key)
+                        self.completed += 1
+                except Exception as e:
+                    logger.error(f"DeletionWorker failed to delete '{path}': {e}")
+                    # Back off instead of spinning on a failing entry
+                    self._stop.wait(self.idle_poll)
+                finally:
+                    self.current = None
+
+    def _is_safe(self, path: str) -> bool:
+        real = os.path.realpath(path)
+        return real != self.root_folder and os.path.commonpath([real, self.root_folder]) == self.root_folder
+
+    def _delete_tree(self, path: str) -> bool:
+        """
+        Removes path file by file. Returns False if stopped early,
+        in which case the rest is removed on the next run.
+        """
+        if not os.path.lexists(path):
+            return True
+        if not self._is_safe(path):
+            logger.error(f"DeletionWorker refusing to delete '{path}' outside of '{self.root_folder}'")
+            return True
+        if os.path.islink(path) or not os.path.isdir(path):
+            try:
+                size = os.lstat(path).st_size
+                os.unlink(path)
+            except FileNotFoundError:
+                return True
+            self.files_deleted += 1
+            self.bytes_deleted += size
+            self._throttle(size)
+            return True
+        for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+            for filename in filenames:
+                if self._stop.is_set():
+                    return False
+                filepath = os.path.join(dirpath, filename)
+                try:
+                    size = os.lstat(filepath).st_size
+                    os.unlink(filepath)
+                except FileNotFoundError:
+                    continue
+                self.files_deleted += 1
+                self.bytes_deleted += size
+                self._throttle(size)
+            for dirname in dirnames:
+                dir_path = os.path.join(dirpath, dirname)
+                if os.path.islink(dir_path):
+                    os.unlink(dir_path)
+                else:
+                    try:
+                        os.rmdir(dir_path)
+                    except FileNotFoundError:
+                        pass
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def _throttle(self, size: int) -> None:
+        self._window_bytes += size
+        self._window_files += 1
+        elapsed = time.monotonic() - self._window_start
+        needed = max(
+            self._window_bytes / self.bytes_per_sec if self.bytes_per_sec > 0 else 0,
+            self._window_files / self.files_per_sec if self.files_per_sec > 0 else 0,
+        )
+        if needed > elapsed:
+            self._stop.wait(needed - elapsed)
+        # Start a new window every second so idle
+        # time is not banked as a burst allowance.
+        if time.monotonic() - self._window_start >= 1:
+            self._window_start = time.monotonic()
+            self._window_bytes = 0
+            self._window_files = 0
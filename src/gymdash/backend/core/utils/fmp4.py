@@ -0,0 +1,137 @@
+import logging
+import os
+import struct
+from typing import BinaryIO, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Suffix for fragmented MP4 files that are still being written.
+# Renamed to a plain .mp4 once the recording is finished.
+PARTIAL_SUFFIX = ".partial.mp4"
+# ffmpeg flags that write an empty moov up front followed by
+# self-contained moof+mdat fragments, one per keyframe.
+FRAGMENTED_MOVFLAGS = ["-movflags", "frag_keyframe+empty_moov+default_base_moof"]
+
+def partial_path(final_path: str) -> str:
+    """Returns the in-progress path used while writing final_path."""
+    return os.path.splitext(final_path)[0] + PARTIAL_SUFFIX
+def final_path(partial: str) -> str:
+    """Returns the finished path for an in-progress file."""
+    return partial[:-len(PARTIAL_SUFFIX)] + ".mp4"
+
+def _read_box_header(f: BinaryIO, offset: int, file_size: int) -> Union[Tuple[str, int, int], None]:
+    """
+    Reads a top-level box header at offset.
+
+    Returns:
+        Tuple of (box type, box size, header size), or None if the
+        header itself has not been fully written yet.
+    """
+    if offset + 8 > file_size:
+        return None
+    f.seek(offset)
+    size, box_type = struct.unpack(">I4s", f.read(8))
+    header_size = 8
+    if size == 1:
+        if offset + 16 > file_size:
+            return None
+        size = struct.unpack(">Q", f.read(8))[0]
+        header_size = 16
+    elif size == 0:
+        # Box extends to the end of the file. Its length is unknown
+        # while the file is still being written.
+        size = -1
+    return (box_type.decode("latin-1"), size, header_size)
+
+def completed_fragment_length(path: str) -> int:
+    """
+    Returns the number of leading bytes of a fragmented MP4 file that
+    form a playable stream: the initialization segment (ftyp+moov)
+    followed by every moof+mdat fragment that has been completely
+    written. Bytes past this point belong to a fragment still in
+    progress and should not be served.
+
+    Returns 0 if the initialization segment is not complete yet.
+    """
+    try:
+        file_size = os.path.getsize(path)
+    except OSError:
+        return 0
+    safe_end = 0
+    has_moov = False
+    in_fragment = False
+    offset = 0
+    with open(path, "rb") as f:
+        while offset < file_size:
+            header = _read_box_header(f, offset, file_size)
+            if header is None:
+                break
+            box_type, size, header_size = header
+            if size < header_size or offset + size > file_size:
+                # Unknown size or box still being written
+                break
+            offset += size
+            if box_type == "moov":
+                has_moov = True
+                safe_end = offset
+            elif box_type == "moof":
+                # Only safe once the matching mdat is complete
+                in_fragment = True
+            elif box_type == "mdat":
+                if has_moov:
+                    safe_end = offset
+                in_fragment = False
+            elif has_moov and not in_fragment:
+                # Other complete boxes between fragments (styp, sidx, free, mfra)
+                safe_end = offset
+    return safe_end if has_moov else 0
+
+def read_completed_fragments(path: str, start: int = 0) -> Tuple[bytes, int]:
+    """
+    Reads the completed bytes of a fragmented MP4 file starting at
+    the given byte offset.
+
+    Args:
+        path: Path of the fragmented MP4 file.
+        start: Byte offset the caller has already received.
+    Returns:
+        Tuple of (bytes from start up to the end of the last complete
+        fragment, total completed length).
+    """
+    ready = completed_fragment_length(path)
+    if start >= ready:
+        return (b"", ready)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return (f.read(ready - start), ready)
+
+def find_in_progress(folder: str) -> List[str]:
+    """
+    Returns paths of all in-progress fragmented MP4 files in a folder
+    tree, newest first.
+    """
+    found = []
+    if not os.path.isdir(folder):
+        return found
+    for root, _, filenames in os.walk(folder):
+        for filename in filenames:
+            if filename.endswith(PARTIAL_SUFFIX):
+                found.append(os.path.join(root, filename))
+    return sorted(found, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0, reverse=True)
+
+def find_recording(folder: str, name: str) -> Tuple[Union[str, None], bool]:
+    """
+    Finds a recording by name (without extension) in a folder tree,
+    preferring the in-progress file.
+
+    Returns:
+        Tuple of (path or None if not found, whether the recording is finished).
+    """
+    name = os.path.basename(name)
+    finished = None
+    for root, _, filenames in os.walk(folder):
+        if name + PARTIAL_SUFFIX in filenames:
+            return (os.path.join(root, name + PARTIAL_SUFFIX), False)
+        if finished is None and name + ".mp4" in filenames:
+            finished = os.path.join(root, name + ".mp4")
+    return (finished, finished is not None)
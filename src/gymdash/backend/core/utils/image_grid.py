@@ -0,0 +1,113 @@
+import math
+from typing import List, Sequence, Union
+
+try:
+    import numpy as np
+    _has_np = True
+except ImportError:
+    _has_np = False
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    _has_pil = True
+except ImportError:
+    _has_pil = False
+
+def _check_dependencies():
+    if not _has_np or not _has_pil:
+        raise ImportError("Install numpy and pillow to use gymdash image grids.")
+
+def to_uint8_batch(images: "np.ndarray", channels_first: bool = False) -> "np.ndarray":
+    """
+    Converts a batch of images to an N x H x W x 3 uint8 array.
+
+    Args:
+        images: Array of shape (N, H, W), (N, H, W, C), or (N, C, H, W)
+            if channels_first. Floating point images are assumed to be
+            in [0, 1] and are scaled to [0, 255].
+        channels_first: Whether the channel axis comes before height and width.
+    Returns:
+        Batch of RGB uint8 images.
+    """
+    _check_dependencies()
+    images = np.asarray(images)
+    if images.ndim == 3:
+        images = images[..., np.newaxis]
+    elif channels_first:
+        images = np.moveaxis(images, 1, -1)
+    if images.dtype != np.uint8:
+        if np.issubdtype(images.dtype, np.floating):
+            images = images * 255
+        images = np.clip(images, 0, 255).astype(np.uint8)
+    channels = images.shape[-1]
+    if channels == 1:
+        images = np.repeat(images, 3, axis=-1)
+    elif channels == 4:
+        images = images[..., :3]
+    return images
+
+def tile_images(
+    images: "np.ndarray",
+    labels: Union[Sequence[str], None] = None,
+    ncols: Union[int, None] = None,
+    channels_first: bool = False,
+    scale: Union[int, None] = None,
+    padding: int = 2,
+    label_height: int = 12,
+    background: int = 255,
+) -> "np.ndarray":
+    """
+    Tiles a batch of images into a single grid image, optionally with a
+    text label above each tile. All tiling is done in one vectorized
+    pass, and nothing touches matplotlib, so this is safe to call from
+    any thread.
+
+    Args:
+        images: Batch of images. See to_uint8_batch for accepted shapes.
+        labels: Optional label for each image.
+        ncols: Number of grid columns. Defaults to a near-square grid.
+        channels_first: Whether the channel axis comes before height and width.
+        scale: Integer upscaling factor for each tile. Defaults to a factor
+            that makes small images (like MNIST digits) at least 64 pixels.
+        padding: Pixels of background around each tile.
+        label_height: Pixels reserved above each tile for its label.
+        background: Grayscale background value.
+    Returns:
+        H x W x 3 uint8 grid image.
+    """
+    batch = to_uint8_batch(images, channels_first)
+    num_images, height, width, channels = batch.shape
+    if scale is None:
+        scale = max(1, 64 // max(height, width, 1))
+    if scale > 1:
+        batch = batch.repeat(scale, axis=1).repeat(scale, axis=2)
+        height, width = height*scale, width*scale
+    if ncols is None:
+        ncols = max(1, math.ceil(math.sqrt(num_images)))
+    nrows = max(1, math.ceil(num_images / ncols))
+    top = padding + (label_height if labels is not None else 0)
+    cell_h = height + top + padding
+    cell_w = width + 2*padding
+    # Every cell, including empty trailing ones, is laid out in a
+    # single (rows, cols, cell_h, cell_w, C) block then flattened.
+    cells = np.full((nrows*ncols, cell_h, cell_w, channels), background, dtype=np.uint8)
+    cells[:num_images, top:top+height, padding:padding+width] = batch
+    grid = cells.reshape(nrows, ncols, cell_h, cell_w, channels) \
+                .transpose(0, 2, 1, 3, 4) \
+                .reshape(nrows*cell_h, ncols*cell_w, channels)
+    if labels is not None:
+        grid = _draw_labels(grid, labels, ncols, cell_h, cell_w, padding)
+    return grid
+
+def _draw_labels(grid: "np.ndarray", labels: Sequence[str], ncols: int, cell_h: int, cell_w: int, padding: int) -> "np.ndarray":
+    image = Image.fromarray(grid)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    for i, label in enumerate(labels):
+        r, c = divmod(i, ncols)
+        draw.text((c*cell_w + padding, r*cell_h + padding), str(label), fill=(0, 0, 0), font=font)
+    return np.asarray(image)
+
+def save_image(image: "np.ndarray", path: str) -> None:
+    """Saves an H x W x C uint8 image, picking the format from the file extension."""
+    _check_dependencies()
+    Image.fromarray(image).save(path)
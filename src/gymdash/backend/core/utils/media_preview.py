@@ -0,0 +1,211 @@
+import logging
+import os
+import queue
+import re
+import threading
+from typing import Any, List, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+    _has_np = True
+except ImportError:
+    _has_np = False
+try:
+    from PIL import Image
+    _has_pil = True
+except ImportError:
+    _has_pil = False
+
+logger = logging.getLogger(__name__)
+
+POSTER_SUFFIX = "_poster.png"
+PREVIEW_SUFFIX = "_preview.gif"
+
+def poster_path(src_path: str) -> str:
+    """Returns the path of the poster image cached beside a media file."""
+    return os.path.splitext(src_path)[0] + POSTER_SUFFIX
+def preview_path(src_path: str) -> str:
+    """Returns the path of the animated preview cached beside a media file."""
+    return os.path.splitext(src_path)[0] + PREVIEW_SUFFIX
+
+def preview_step_extractor(fname: str) -> int:
+    """
+    Step extractor for poster/preview files named after sources
+    like 'rl-video-episode-3_120.mp4' -> 'rl-video-episode-3_120_poster.png'.
+    """
+    return int(fname.split("_")[-2])
+
+def _is_cached(src_path: str) -> bool:
+    """True if both outputs exist and are at least as new as the source."""
+    try:
+        src_time = os.path.getmtime(src_path)
+        return  os.path.getmtime(poster_path(src_path)) >= src_time and \
+                os.path.getmtime(preview_path(src_path)) >= src_time
+    except OSError:
+        return False
+
+def _to_small_image(frame: Any, max_size: int) -> "Image.Image":
+    image = Image.fromarray(np.asarray(frame, dtype=np.uint8))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_size, max_size))
+    return image
+
+def _save_atomic(image: "Image.Image", path: str, **save_kwargs) -> None:
+    # Write to a temporary name first so that MediaLinkStreamableStat
+    # never picks up a half-written file.
+    tmp_path = path + ".tmp"
+    image.save(tmp_path, **save_kwargs)
+    os.replace(tmp_path, path)
+
+def write_poster(frames: Sequence[Any], out_path: str, max_size: int = 320) -> None:
+    """
+    Writes a single PNG poster frame taken from the middle of the frames.
+    The first frame of a rollout is often a blank reset state.
+    """
+    image = _to_small_image(frames[len(frames)//2], max_size)
+    _save_atomic(image, out_path, format="PNG", optimize=True)
+
+def write_preview(
+    frames: Sequence[Any],
+    out_path: str,
+    fps: float = 30,
+    max_size: int = 160,
+    max_frames: int = 24
+) -> None:
+    """
+    Writes a short, low resolution animated GIF of the frames.
+    At most max_frames evenly spaced frames are kept, and each
+    is shown long enough that the preview spans the same time
+    as the original clip.
+    """
+    num_frames = min(len(frames), max_frames)
+    indices = np.linspace(0, len(frames)-1, num_frames).round().astype(int)
+    images = [_to_small_image(frames[i], max_size) for i in indices]
+    clip_seconds = len(frames) / fps if fps and fps > 0 else num_frames / 10
+    duration_ms = max(20, int(1000 * clip_seconds / num_frames))
+    _save_atomic(
+        images[0],
+        out_path,
+        format="GIF",
+        save_all=True,
+        append_images=images[1:],
+        duration=duration_ms,
+        loop=0,
+        optimize=True
+    )
+
+def read_video_frames(src_path: str, max_frames: int = 24) -> Tuple[List[Any], float]:
+    """
+    Decodes up to max_frames evenly spaced frames of a video file.
+
+    Returns:
+        The decoded frames and the video's fps.
+    """
+    try:
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+    except ImportError as e:
+        raise ImportError("Install moviepy to generate previews from existing video files.") from e
+    with VideoFileClip(src_path, audio=False) as clip:
+        fps = clip.fps
+        times = np.linspace(0, max(0, clip.duration - 1.0/fps), max_frames)
+        frames = [clip.get_frame(t) for t in times]
+    return frames, fps
+
+class MediaPreviewWorker:
+    """
+    Background thread that generates a poster image and a short animated
+    preview for new media files. Outputs are cached beside the source
+    file (see poster_path and preview_path) so the frontend can show a
+    gallery without downloading every full video.
+
+    Producers that already hold the decoded frames, like RecordVideoCustom,
+    should pass them to submit() to skip decoding the file again.
+    """
+    def __init__(
+        self,
+        poster_size: int = 320,
+        preview_size: int = 160,
+        preview_frames: int = 24
+    ) -> None:
+        self.poster_size = poster_size
+        self.preview_size = preview_size
+        self.preview_frames = preview_frames
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Union[threading.Thread, None] = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, src_path: str, frames: Union[Sequence[Any], None] = None, fps: float = 30) -> None:
+        """
+        Queues preview generation for a media file.
+
+        Args:
+            src_path: Path of the source media file.
+            frames: Optional decoded frames of the source. If None, the
+                file is decoded on the worker thread.
+            fps: Frame rate of the provided frames.
+        """
+        if not _has_pil or not _has_np:
+            logger.warning("Install pillow and numpy to generate media previews.")
+            return
+        self._ensure_started()
+        self._queue.put((src_path, frames, fps))
+
+    def submit_missing(self, folder: str, media_regex: str) -> int:
+        """
+        Queues every file in the folder matching media_regex that does
+        not already have up-to-date previews. Useful for media recorded
+        before previews existed.
+
+        Returns:
+            Number of files queued.
+        """
+        if not os.path.isdir(folder):
+            return 0
+        pattern = re.compile(media_regex)
+        count = 0
+        for filename in os.listdir(folder):
+            if not pattern.search(filename):
+                continue
+            src_path = os.path.join(folder, filename)
+            if not _is_cached(src_path):
+                self.submit(src_path)
+                count += 1
+        return count
+
+    def join(self) -> None:
+        """Blocks until all queued files have been processed."""
+        self._queue.join()
+
+    def _ensure_started(self) -> None:
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work_loop, daemon=True)
+                self._thread.start()
+
+    def _work_loop(self) -> None:
+        while True:
+            src_path, frames, fps = self._queue.get()
+            try:
+                self._generate(src_path, frames, fps)
+            except Exception as e:
+                logger.error(f"Failed to generate preview for '{src_path}': {e}")
+            finally:
+                self._queue.task_done()
+
+    def _generate(self, src_path: str, frames: Union[Sequence[Any], None], fps: float) -> None:
+        if _is_cached(src_path):
+            return
+        if frames is None:
+            frames, fps = read_video_frames(src_path, self.preview_frames)
+        if len(frames) == 0:
+            return
+        write_poster(frames, poster_path(src_path), self.poster_size)
+        write_preview(frames, preview_path(src_path), fps, self.preview_size, self.preview_frames)
+        logger.debug(f"Generated previews for '{src_path}'")
+
+preview_worker = MediaPreviewWorker()
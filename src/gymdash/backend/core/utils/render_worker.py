@@ -0,0 +1,188 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+def _init_render_process():
+    # Worker processes never show windows, so pin the
+    # non-interactive backend before anything imports pyplot.
+    import matplotlib
+    matplotlib.use("agg")
+
+def _run_render_task(render_function: Callable[[Any, str], None], payload: Any, out_path: str) -> float:
+    """Runs inside the worker process. Returns the time spent rendering."""
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    render_function(payload, out_path)
+    return time.perf_counter() - start
+
+def render_sample_figure(payload: Dict[str, Any], out_path: str) -> None:
+    """
+    Renders a matplotlib grid of sample images with titles.
+
+    Args:
+        payload: Dict with "images", a sequence of H x W (x C) arrays, and
+            optionally "titles", a sequence of strings of the same length.
+        out_path: Path of the output image file.
+    """
+    import math
+    import matplotlib.pyplot as plt
+
+    images = payload["images"]
+    titles = payload.get("titles", None)
+    num_plots = len(images)
+    ncols = max(1, math.ceil(math.sqrt(num_plots)))
+    nrows = max(1, math.ceil(num_plots / ncols))
+    fig, axs = plt.subplots(nrows, ncols, squeeze=False)
+    for idx, image in enumerate(images):
+        ax = axs[idx // ncols, idx % ncols]
+        if titles is not None:
+            ax.set_title(titles[idx])
+        ax.imshow(image)
+    for ax in axs.flat:
+        ax.set_axis_off()
+    # Write to a temporary name first so that MediaLinkStreamableStat
+    # never picks up a half-written file.
+    root, ext = os.path.splitext(out_path)
+    tmp_path = root + ".tmp" + ext
+    fig.savefig(tmp_path)
+    plt.close(fig)
+    os.replace(tmp_path, out_path)
+
+class RenderWorkerPool:
+    """
+    Process pool that owns all matplotlib rendering. Render tasks are
+    a module-level function plus a picklable payload and an output path,
+    so they can run without the simulation thread, the API event loop,
+    or the main-thread queue in thread_utils.
+
+    The pool is started on first use. Queue depth and latency are
+    tracked for get_metrics().
+    """
+    LATENCY_WINDOW = 100
+
+    def __init__(self, max_workers: int = 1) -> None:
+        self.max_workers = max_workers
+        self._executor: Union[ProcessPoolExecutor, None] = None
+        self._lock = threading.Lock()
+        self._pending: int = 0
+        self._completed: int = 0
+        self._failed: int = 0
+        self._last_error: Union[str, None] = None
+        # (total latency, render time) of the most recent tasks
+        self._latencies: Deque[tuple] = deque(maxlen=RenderWorkerPool.LATENCY_WINDOW)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawn instead of fork so workers do not inherit
+                # the server's threads and held locks.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_render_process
+                )
+            return self._executor
+
+    def submit(self, render_function: Callable[[Any, str], None], payload: Any, out_path: str) -> Future:
+        """
+        Queues a render task.
+
+        Args:
+            render_function: Module-level function taking (payload, out_path)
+                that writes its output to out_path. Must be picklable.
+            payload: Picklable data passed to render_function.
+            out_path: Path the output is written to.
+        Returns:
+            Future resolving to the render time in seconds.
+        """
+        submit_time = time.perf_counter()
+        # Counted before submitting, the task may finish before submit returns
+        with self._lock:
+            self._pending += 1
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_run_render_task, render_function, payload, out_path)
+            except BrokenProcessPool:
+                # Pool broke before the done callbacks of its tasks
+                # reset it. Start a fresh one and try once more.
+                self._discard_executor(executor)
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(_run_render_task, render_function, payload, out_path)
+                except BrokenProcessPool as e:
+                    # Recorded as a failed task instead of raising
+                    # on the caller's (training) thread
+                    future = Future()
+                    future.set_exception(e)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(lambda f: self._on_done(f, submit_time, out_path, executor))
+        return future
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Drops a broken executor so the next submit starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # Releases the broken pool's pipes and manager thread
+        executor.shutdown(wait=False)
+
+    def _on_done(self, future: Future, submit_time: float, out_path: str, executor: ProcessPoolExecutor) -> None:
+        latency = time.perf_counter() - submit_time
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                self._completed += 1
+                self._latencies.append((latency, future.result()))
+            else:
+                self._failed += 1
+                self._last_error = f"{type(error).__name__}: {error}"
+        if error is not None:
+            logger.error(f"Render task for '{out_path}' failed: {error}")
+            # A crashed worker breaks the whole pool
+            if isinstance(error, BrokenProcessPool):
+                self._discard_executor(executor)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns queue depth and latency statistics. Latency is measured
+        from submission to completion, render time only inside the worker.
+        """
+        with self._lock:
+            latencies = sorted(l[0] for l in self._latencies)
+            render_times = [l[1] for l in self._latencies]
+            return {
+                "workers":          self.max_workers,
+                "running":          self._executor is not None,
+                "queue_depth":      self._pending,
+                "completed":        self._completed,
+                "failed":           self._failed,
+                "last_error":       self._last_error,
+                "latency_avg":      sum(latencies) / len(latencies) if latencies else None,
+                "latency_p95":      latencies[min(len(latencies)-1, int(0.95*len(latencies)))] if latencies else None,
+                "latency_max":      latencies[-1] if latencies else None,
+                "render_time_avg":  sum(render_times) / len(render_times) if render_times else None,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+render_pool = RenderWorkerPool()
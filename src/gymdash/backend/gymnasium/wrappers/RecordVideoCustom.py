@@ -5,6 +5,11 @@ from typing import Any, Callable, List, SupportsFloat, Union
 
 import numpy as np
 
+from gymdash.backend.core.simulation.live_view import LiveFrameBuffer
+from gymdash.backend.core.utils.fmp4 import FRAGMENTED_MOVFLAGS, partial_path
+from gymdash.backend.core.utils.media_preview import (MediaPreviewWorker,
+                                                      preview_worker)
+
 try:
     import gymnasium as gym
     from gymnasium import Env, error, logger
@@ -52,6 +57,9 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
         name_prefix: str = "rl-video",
         fps: Union[int, None] = None,
         disable_logger: bool = True,
+        live_view: Union[LiveFrameBuffer, None] = None,
+        previews: Union[MediaPreviewWorker, None] = preview_worker,
+        progressive: bool = False,
     ):
         """Wrapper records videos of rollouts.
 
@@ -66,6 +74,13 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
             fps (int): The frame per second in the video. Provides a custom video fps for environment, if ``None`` then
                 the environment metadata ``render_fps`` key is used if it exists, otherwise a default value of 30 is used.
             disable_logger (bool): Whether to disable moviepy logger or not, default it is disabled
+            live_view (LiveFrameBuffer): Optional buffer that receives the newest rendered frame
+                whenever a live viewer is connected, whether or not a recording is active.
+            previews (MediaPreviewWorker): Worker that generates a poster image and a short
+                animated preview beside each saved video. If ``None``, no previews are made.
+            progressive (bool): If ``True``, frames are encoded as they arrive into a fragmented
+                MP4 named ``<name>.partial.mp4`` that can be watched while the episode runs.
+                The file is renamed to ``<name>.mp4`` when the recording stops.
         """
         gym.utils.RecordConstructorArgs.__init__(
             self,
@@ -109,7 +124,12 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
         self.video_length: int = video_length if video_length != 0 else float("inf")
         self.recording: bool = False
         self.recorded_frames: list[Any] = []
+        self.num_recorded_frames: int = 0
+        self.progressive: bool = progressive
+        self._progressive_writer = None
         self.render_history: list[Any] = []
+        self.live_view: Union[LiveFrameBuffer, None] = live_view
+        self.previews: Union[MediaPreviewWorker, None] = previews
 
         self.step_id = -1
         self.episode_id = -1
@@ -121,24 +141,62 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
                 'MoviePy is not installed, run `pip install "gymnasium[other]"`'
             ) from e
 
-    def _capture_frame(self):
-        assert self.recording, "Cannot capture a frame, recording wasn't started."
-
+    def _render_frame(self):
+        """Renders the environment and returns the newest frame, or None if render was called."""
         frame = self.env.render()
         if isinstance(frame, List):
             if len(frame) == 0:  # render was called
-                return
+                return None
             self.render_history += frame
             frame = frame[-1]
+        return frame
+
+    def _capture_frame(self):
+        assert self.recording, "Cannot capture a frame, recording wasn't started."
+
+        frame = self._render_frame()
+        if frame is None:
+            return
 
         if isinstance(frame, np.ndarray):
-            self.recorded_frames.append(frame)
+            self._record_frame(frame)
+            if self.live_view is not None and self.live_view.wants_frame():
+                self.live_view.put(frame)
         else:
             self.stop_recording()
             logger.warn(
                 f"Recording stopped: expected type of frame returned by render to be a numpy array, got instead {type(frame)}."
             )
 
+    def _record_frame(self, frame):
+        """Adds a frame to the current recording, encoding it immediately in progressive mode."""
+        self.num_recorded_frames += 1
+        if not self.progressive:
+            self.recorded_frames.append(frame)
+            return
+        if self._progressive_writer is None:
+            from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+            path = partial_path(os.path.join(self.video_folder, f"{self._video_name}.mp4"))
+            height, width = frame.shape[:2]
+            # One keyframe per second so that a new fragment
+            # becomes available about every second.
+            self._progressive_writer = FFMPEG_VideoWriter(
+                path,
+                (width, height),
+                self.frames_per_sec,
+                ffmpeg_params=FRAGMENTED_MOVFLAGS + ["-g", str(max(1, int(self.frames_per_sec)))],
+            )
+        self._progressive_writer.write_frame(frame)
+
+    def _capture_live_frame(self):
+        """Renders a frame only for the live view. Does nothing unless a viewer wants one."""
+        if self.live_view is None or not self.live_view.wants_frame():
+            return
+        frame = self._render_frame()
+        if isinstance(frame, np.ndarray):
+            self.live_view.put(frame)
+
     def reset(
         self, *, seed: Union[int, None] = None, options: Union[dict[str, Any], None] = None
     ) -> tuple[Any, dict[str, Any]]:
@@ -153,8 +211,10 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
             self.start_recording(f"{self.name_prefix}-episode-{self.episode_id}_{self.step_id}")
         if self.recording:
             self._capture_frame()
-            if len(self.recorded_frames) > self.video_length:
+            if self.num_recorded_frames > self.video_length:
                 self.stop_recording()
+        else:
+            self._capture_live_frame()
 
         return obs, info
 
@@ -170,8 +230,10 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
         if self.recording:
             self._capture_frame()
 
-            if len(self.recorded_frames) > self.video_length:
+            if self.num_recorded_frames > self.video_length:
                 self.stop_recording()
+        else:
+            self._capture_live_frame()
 
         return obs, rew, terminated, truncated, info
 
@@ -179,7 +241,8 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
         """Compute the render frames as specified by render_mode attribute during initialization of the environment."""
         render_out = super().render()
         if self.recording and isinstance(render_out, List):
-            self.recorded_frames += render_out
+            for frame in render_out:
+                self._record_frame(frame)
 
         if len(self.render_history) > 0:
             tmp_history = self.render_history
@@ -206,7 +269,14 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
         """Stop current recording and saves the video."""
         assert self.recording, "stop_recording was called, but no recording was started"
 
-        if len(self.recorded_frames) == 0:
+        if self._progressive_writer is not None:
+            self._progressive_writer.close()
+            self._progressive_writer = None
+            path = os.path.join(self.video_folder, f"{self._video_name}.mp4")
+            os.replace(partial_path(path), path)
+            if self.previews is not None:
+                self.previews.submit(path, fps=self.frames_per_sec)
+        elif len(self.recorded_frames) == 0:
             logger.warn("Ignored saving a video as there were zero frames to save.")
         else:
             try:
@@ -221,12 +291,16 @@ class RecordVideoCustom(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.uti
             moviepy_logger = None if self.disable_logger else "bar"
             path = os.path.join(self.video_folder, f"{self._video_name}.mp4")
             clip.write_videofile(path, logger=moviepy_logger)
+            # Reuse the in-memory frames so the worker does not decode the video again
+            if self.previews is not None:
+                self.previews.submit(path, self.recorded_frames, self.frames_per_sec)
 
         self.recorded_frames = []
+        self.num_recorded_frames = 0
         self.recording = False
         self._video_name = None
 
     def __del__(self):
         """Warn the user in case last video wasn't saved."""
-        if len(self.recorded_frames) > 0:
+        if len(self.recorded_frames) > 0 or self._progressive_writer is not None:
             logger.warn("Unable to save last video! Did you call close()?")
\ No newline at end of file
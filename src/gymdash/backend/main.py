@@ -1,13 +1,16 @@
 import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from random import randint
 from threading import Thread
-from typing import Union, List
+from typing import Dict, Union, List, Literal
+from uuid import UUID
 from gymdash.backend.core.utils.thread_utils import execute_queued
 
 import numpy as np
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import (FileResponse, JSONResponse, Response,
@@ -15,22 +18,35 @@ from fastapi.responses import (FileResponse, JSONResponse, Response,
 import matplotlib.pyplot as plt
 import gymdash
 from gymdash.backend.core.api.config.config import tags
-from gymdash.backend.core.api.models import (SimulationIDModel,
+from gymdash.backend.core.api.models import (MetricQuery, MetricSeries,
+                                             ParamQuery,
+                                             SimulationIDModel,
                                              SimulationIDsModel,
+                                             SimulationHistoryPage,
                                              SimulationInteractionModel,
                                              SimulationStartConfig,
-                                             StoredSimulationInfo, StatQuery)
+                                             StoredSimulationInfo, StatQuery,
+                                             SweepConfig, SweepProgress)
 from gymdash.backend.core.patch.patcher import apply_extension_patches
 from gymdash.backend.core.simulation.examples import \
     register_example_simulations
 from gymdash.backend.core.simulation.export import SimulationExporter
+from gymdash.backend.core.utils.fmp4 import (find_in_progress,
+                                             find_recording, final_path,
+                                             read_completed_fragments)
+from gymdash.backend.core.simulation.live_view import (LIVE_VIEW_MAX_FPS,
+                                                       LIVE_VIEW_MEDIA_TYPE,
+                                                       effective_fps,
+                                                       live_view_generator)
 from gymdash.backend.core.simulation.manage import (SimulationRegistry,
                                                     SimulationTracker)
+from gymdash.backend.core.simulation.scheduler import ScheduleOptions
+from gymdash.backend.core.utils.render_worker import render_pool
 from gymdash.backend.core.utils.usage import *
 # from gymdash.backend.core.utils.zip import get_recent_media_generator_from_keys
 from gymdash.backend.core.utils.zip import \
     get_recent_media_from_simulation_generator, get_recent_from_simulation_generator, get_all_from_simulation_generator
-from gymdash.backend.project import ProjectManager
+from gymdash.backend.project import AsyncProjectManager, ProjectManager
 
 logger = logging.getLogger(__name__)
 # logging.basicConfig(level = logging.DEBUG, format = '[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(message)s')
@@ -48,6 +64,10 @@ register_example_simulations()
 SimulationExporter.import_and_register()
 # Set up project structure and database
 ProjectManager.import_args_from_file()
+simulation_tracker.scheduler.configure(*ProjectManager.scheduler_limits())
+simulation_tracker.max_sweep_configs = ProjectManager.sweep_max_configs()
+if ProjectManager.admission_thresholds() is not None:
+    simulation_tracker.enable_admission_control(*ProjectManager.admission_thresholds())
 # Load old streamers from disk
 # ProjectManager.get_filtered_simulations_where("is_done=? OR force_stopped=?", (int(True), int(True)))
 finished_sim_info = ProjectManager.get_filtered_simulations(
@@ -59,14 +79,38 @@ simulation_tracker.load_old_simulations_from_info(finished_sim_info)
 
 async def side_loop():
     while True:
-        execute_queued()
+        # One failed iteration must not stop the loop for good
+        try:
+            execute_queued()
+            # Stopped runs free capacity for the queue below
+            simulation_tracker.update_sweeps()
+            # Machine load changes without any simulation finishing,
+            # so give held back queued simulations another chance.
+            simulation_tracker.start_queued_sims()
+        except Exception:
+            logger.exception("Side loop iteration failed")
         await asyncio.sleep(2)
 
+async def archive_loop():
+    """Archives finished simulations once they are older than --archive-after-days."""
+    while True:
+        days = ProjectManager.archive_after_days()
+        if days > 0 and not simulation_tracker.is_clearing:
+            try:
+                candidates = await AsyncProjectManager.get_archive_candidates(datetime.now() - timedelta(days=days))
+                if len(candidates) > 0:
+                    await asyncio.to_thread(simulation_tracker.archive_simulations, candidates)
+            except Exception as e:
+                logger.error(f"Automatic archiving failed: {e}")
+        await asyncio.sleep(ProjectManager.ARCHIVE_POLL_INTERVAL)
+
 # App main
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Executed right before we handle requests
     asyncio.create_task(side_loop())
+    if ProjectManager.archive_after_days() > 0:
+        asyncio.create_task(archive_loop())
     yield
     # Executed right before app shutdown
     # Clearing the simulation tracker also
@@ -81,7 +125,10 @@ async def lifespan(app: FastAPI):
         for id, sim in simulation_tracker.running_sim_map.items():
             sim.force_stopped = True
             sim._meta_cancelled = True
-            ProjectManager._add_or_update_simulation(id, sim)
+            ProjectManager.add_or_update_simulation_immediate(id, sim)
+        ProjectManager.shutdown()
+        AsyncProjectManager.shutdown()
+        render_pool.shutdown(wait=False)
 
 # Setup our API
 app = FastAPI(
@@ -130,6 +177,10 @@ async def get_resource_usage_detailed():
 async def get_resource_usage_gpu():
     return get_usage_gpu()
 
+@app.get("/render-metrics")
+async def get_render_metrics():
+    return render_pool.get_metrics()
+
 @app.get("/all-recent-images")
 async def get_all_recent_images():
     raise HTTPException(status_code=404, detail="all-recent-images endpoint is not implemented")
@@ -159,6 +210,90 @@ async def get_sim_recent_media(sim_id: SimulationIDModel):
         ),
         media_type="application/zip"
     )
+
+@app.post("/sim-recent-previews")
+async def get_sim_recent_previews(sim_id: SimulationIDModel):
+    sim = simulation_tracker.get_sim(sim_id.id)
+    if sim is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"sim-recent-previews endpoint found no simulation with id '{sim_id.id}'"
+        )
+    return StreamingResponse(
+        content=get_recent_media_from_simulation_generator(
+            sim,
+            media_tags=[],
+            stat_keys=["episode_video_poster", "episode_video_preview"]
+        ),
+        media_type="application/zip"
+    )
+
+@app.get("/sim-progressive-media")
+async def get_sim_progressive_media(id: UUID, name: Union[str, None] = None, offset: int = 0):
+    """
+    Returns the completed fragments of an in-progress recording,
+    starting at the byte offset the client already has. Without a
+    name, the newest in-progress recording is used. Once the recording
+    is finished the remainder of the final file is returned and the
+    X-Media-Complete header is 'true'.
+    """
+    sim = simulation_tracker.get_sim(id)
+    if sim is None or sim.sim_path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"sim-progressive-media endpoint found no simulation with id '{id}'"
+        )
+    media_folder = os.path.join(sim.sim_path, "media")
+    if name is None:
+        in_progress = await asyncio.to_thread(find_in_progress, media_folder)
+        path, complete = (in_progress[0], False) if len(in_progress) > 0 else (None, False)
+    else:
+        path, complete = await asyncio.to_thread(find_recording, media_folder, name)
+    if path is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"sim-progressive-media endpoint found no recording for simulation '{id}'"
+        )
+    try:
+        data, ready = await asyncio.to_thread(read_completed_fragments, path, offset)
+    except FileNotFoundError:
+        # Recording finished between finding and reading the file
+        path, complete = final_path(path), True
+        data, ready = await asyncio.to_thread(read_completed_fragments, path, offset)
+    media_name = os.path.splitext(os.path.basename(path if complete else final_path(path)))[0]
+    return Response(
+        content=data,
+        media_type="video/mp4",
+        headers={
+            "X-Media-Name": media_name,
+            "X-Ready-Length": str(ready),
+            "X-Media-Complete": "true" if complete else "false",
+        }
+    )
+
+@app.get("/sim-live-view")
+async def get_sim_live_view(
+    id: UUID,
+    fps: float = Query(10, gt=0, le=LIVE_VIEW_MAX_FPS),
+    format: Literal["mjpeg", "webp"] = "mjpeg"
+):
+    sim = simulation_tracker.get_sim(id)
+    if sim is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"sim-live-view endpoint found no simulation with id '{id}'"
+        )
+    return StreamingResponse(
+        content=live_view_generator(
+            sim.live_view,
+            fps=fps,
+            fmt=format,
+            should_stop=lambda: simulation_tracker._is_stopping or sim.is_done
+        ),
+        media_type=LIVE_VIEW_MEDIA_TYPE,
+        # fps is capped by the rate the simulation captures frames at
+        headers={"X-Live-View-FPS": str(effective_fps(sim.live_view, fps))}
+    )
     
 @app.post("/start-new-test")
 async def start_new_simulation_call(config: SimulationStartConfig):
@@ -176,7 +311,12 @@ async def start_new_simulation_call(config: SimulationStartConfig):
         config = config
     )
 @app.post("/queue-new-sim")
-async def queue_new_simulation_call(config: SimulationStartConfig):
+async def queue_new_simulation_call(
+    config: SimulationStartConfig,
+    priority: int = 0,
+    cpu_threads: int = Query(1, ge=0),
+    memory_mb: float = Query(0, ge=0),
+):
     logger.debug(f"API called queue-new-sim with config: {config}")
     if simulation_tracker.is_clearing:
         return StoredSimulationInfo(
@@ -184,13 +324,44 @@ async def queue_new_simulation_call(config: SimulationStartConfig):
             sim_id = str(simulation_tracker.no_id),
             config = config
         )
-    id, _ = simulation_tracker.queue_sim(config)
+    id, _ = simulation_tracker.queue_sim(
+        config,
+        schedule_options=ScheduleOptions(priority=priority, cpu_threads=cpu_threads, memory_mb=memory_mb)
+    )
     return StoredSimulationInfo(
         name = config.name,
         sim_id = id,
         config = config
     )
 
+@app.post("/start-sweep")
+async def start_sweep_call(config: SweepConfig) -> SweepProgress:
+    logger.debug(f"API called start-sweep with config: {config}")
+    if simulation_tracker.is_clearing:
+        raise HTTPException(status_code=409, detail="Cannot start a sweep while simulations are being cleared")
+    try:
+        sweep = simulation_tracker.start_sweep(config)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return sweep.progress(simulation_tracker)
+
+@app.get("/sweep-progress")
+async def get_sweep_progress(id: UUID) -> SweepProgress:
+    sweep = simulation_tracker.get_sweep(id)
+    if sweep is None:
+        raise HTTPException(status_code=404, detail=f"sweep-progress endpoint found no sweep with id '{id}'")
+    return sweep.progress(simulation_tracker)
+
+@app.get("/sweeps")
+async def get_sweeps() -> List[SweepProgress]:
+    return [sweep.progress(simulation_tracker) for sweep in list(simulation_tracker.sweeps.values())]
+
+@app.post("/cancel-sweep")
+async def cancel_sweep(id: UUID) -> Dict[str, bool]:
+    if simulation_tracker.is_clearing:
+        return {}
+    return { "cancelled": await simulation_tracker.cancel_sweep(id) }
+
 @app.post("/cancel-sim")
 async def cancel_sim(sim_query: Union[SimulationInteractionModel, SimulationIDModel]):
     if simulation_tracker.is_clearing:
@@ -206,9 +377,50 @@ async def get_sim_progress(sim_query: SimulationInteractionModel):
 
 @app.get("/get-sims-history")
 async def get_stored_simulations() -> List[StoredSimulationInfo]:
-    sim_infos = ProjectManager.get_filtered_simulations()
+    sim_infos = await AsyncProjectManager.get_filtered_simulations()
     return sim_infos
 
+# Fields left out of a projection are left out of the response too
+@app.get("/get-sims-history-page", response_model_exclude_unset=True)
+async def get_stored_simulations_page(
+    limit: int = Query(default=50, ge=1, le=1000),
+    cursor: Union[str, None] = None,
+    sort_by: Literal["created", "ended", "name", "summary"] = "created",
+    order: Literal["asc", "desc"] = "desc",
+    is_done: Union[bool, None] = None,
+    cancelled: Union[bool, None] = None,
+    failed: Union[bool, None] = None,
+    force_stopped: Union[bool, None] = None,
+    sim_key: Union[str, None] = None,
+    created_after: Union[datetime, None] = None,
+    created_before: Union[datetime, None] = None,
+    fields: Union[List[str], None] = Query(default=None),
+    summary_key: Union[str, None] = None,
+    summary_stat: Literal[ProjectManager.SUMMARY_STATS] = "final",
+    include_summaries: bool = False,
+) -> SimulationHistoryPage:
+    try:
+        sim_infos, next_cursor = await AsyncProjectManager.get_simulation_history(
+            limit=limit,
+            cursor=cursor,
+            sort_by=sort_by,
+            descending=(order == "desc"),
+            is_done=is_done,
+            cancelled=cancelled,
+            failed=failed,
+            force_stopped=force_stopped,
+            sim_key=sim_key,
+            created_after=created_after,
+            created_before=created_before,
+            fields=fields,
+            summary_key=summary_key,
+            summary_stat=summary_stat,
+            include_summaries=include_summaries,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return SimulationHistoryPage(items=sim_infos, next_cursor=next_cursor)
+
 @app.get("/delete-all-sims")
 async def get_delete_all_simulations():
     if simulation_tracker.is_clearing:
@@ -216,7 +428,7 @@ async def get_delete_all_simulations():
     # Stop all current simulations and clear tracker
     responses = await simulation_tracker.clear()
     # Clear backend DB of simulations
-    ProjectManager.delete_all_simulations_immediate()
+    await AsyncProjectManager.delete_all_simulations()
     return responses
 
 @app.post("/delete-sims")
@@ -226,15 +438,56 @@ async def get_delete_simulations(sim_ids: SimulationIDsModel):
     # Stop specific current simulations
     responses = await simulation_tracker.clear_specific(sim_ids.ids)
     # Remove from backend DB of simulations
-    ProjectManager.delete_specific_simulations_immediate(sim_ids.ids)
-    # ProjectManager.delete_all_simulations_immediate()
+    await AsyncProjectManager.delete_specific_simulations(sim_ids.ids)
     return responses
 
+@app.post("/query-sim-params")
+async def query_simulation_params(query: ParamQuery) -> List[StoredSimulationInfo]:
+    try:
+        return await AsyncProjectManager.get_simulations_by_params(
+            query.filters,
+            sim_key=query.sim_key,
+            limit=query.limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/query-metrics")
+async def query_metrics(query: MetricQuery) -> Dict[str, List[MetricSeries]]:
+    return await AsyncProjectManager.get_metrics(
+        query.keys,
+        sim_ids=query.sim_ids,
+        sim_key=query.sim_key,
+        step_min=query.step_min,
+        step_max=query.step_max,
+        last_only=query.last_only,
+        align=query.align,
+        max_points=query.max_points,
+    )
+
+@app.get("/metric-keys")
+async def get_metric_keys(sim_key: Union[str, None] = None) -> List[str]:
+    return await AsyncProjectManager.get_metric_keys(sim_key)
+
+@app.post("/archive-sims")
+async def archive_simulations(sim_ids: SimulationIDsModel) -> Dict[str, bool]:
+    if simulation_tracker.is_clearing:
+        return {}
+    return await asyncio.to_thread(simulation_tracker.archive_simulations, sim_ids.ids)
+
+@app.get("/deletion-status")
+async def get_deletion_status():
+    return await AsyncProjectManager.get_deletion_status()
+
+@app.post("/get-sim-configs")
+async def get_simulation_configs(sim_ids: SimulationIDsModel):
+    return await AsyncProjectManager.get_simulation_configs(sim_ids.ids)
+
 @app.post("/get-sim-status")
 async def get_simulation_status(sim_ids: SimulationIDsModel):
     if simulation_tracker.is_clearing:
         return []
-    return ProjectManager.get_latest_statuses(sim_ids.ids)
+    return await AsyncProjectManager.get_latest_statuses(sim_ids.ids)
 
     
 @app.get("/all-recent-scalars")
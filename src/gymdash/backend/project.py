@@ -1,5 +1,6 @@
 import argparse
 import asyncio
+import base64
 import functools
 import json
 import logging
@@ -7,19 +8,27 @@ import os
 import pickle
 import sqlite3
 import uuid
-import shutil
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from types import SimpleNamespace
 from datetime import date, datetime
 from pathlib import Path
-from threading import Lock
+import threading
 from typing import Any, List, Tuple, Dict, Union, Literal, Iterable
 
 from typing_extensions import Self
 
-from gymdash.backend.core.api.models import (SimulationStartConfig,
+from gymdash.backend.core.api.models import (MetricSeries, ParamFilter,
+                                             SimulationStartConfig,
                                              StoredSimulationInfo,
                                              SimStatus)
+from gymdash.backend.core.simulation.admission import ResourceFootprint
+from gymdash.backend.core.simulation.archive import archive_path
 from gymdash.backend.core.simulation.base import Simulation
+from gymdash.backend.core.simulation.sweep import DEFAULT_MAX_CONFIGS
+from gymdash.backend.core.utils.db_writer import DatabaseWriter
+from gymdash.backend.core.utils.deletion_worker import DeletionWorker
 from gymdash.backend.enums import SimStatusCode
 
 logger = logging.getLogger(__name__)
@@ -28,41 +37,127 @@ class KwargWrapper:
     def __init__(self, kwargs):
         self._kwargs = kwargs if kwargs is not None else {}
 
+# Storage format for the config and start_kwargs columns.
+# "json" stores plain JSON text. "compact" stores zlib-compressed,
+# whitespace-free JSON as a BLOB behind COMPACT_COLUMN_MAGIC.
+# Both formats are always readable regardless of this setting.
+COLUMN_FORMATS = ("json", "compact")
+COMPACT_COLUMN_MAGIC = b"GDZ1"
+_column_format = "json"
+
+def set_column_format(column_format: str):
+    global _column_format
+    if column_format not in COLUMN_FORMATS:
+        raise ValueError(f"Unknown column format '{column_format}'. Choose from {COLUMN_FORMATS}")
+    _column_format = column_format
+def _encode_column(obj, **dumps_kwargs) -> Union[str, bytes]:
+    if _column_format == "compact":
+        text = json.dumps(obj, separators=(",", ":"), **dumps_kwargs)
+        return COMPACT_COLUMN_MAGIC + zlib.compress(text.encode("utf-8"))
+    return json.dumps(obj, **dumps_kwargs)
+def _column_text(raw: Union[bytes, str]) -> str:
+    if isinstance(raw, str):
+        return raw
+    if raw.startswith(COMPACT_COLUMN_MAGIC):
+        return zlib.decompress(raw[len(COMPACT_COLUMN_MAGIC):]).decode("utf-8")
+    return raw.decode("utf-8")
+
 def uuid2text(id: uuid.UUID):
     return str(id)
 def config2text(config: SimulationStartConfig):
-    return json.dumps(config, cls=SimulationStartConfig.Encoder)
+    return _encode_column(config, cls=SimulationStartConfig.Encoder)
 def kwargs2text(kwargs: KwargWrapper):
-    return json.dumps(kwargs._kwargs)
+    return _encode_column(kwargs._kwargs)
 sqlite3.register_adapter(uuid.UUID, uuid2text)
 sqlite3.register_adapter(SimulationStartConfig, config2text)
 sqlite3.register_adapter(KwargWrapper, kwargs2text)
 sqlite3.register_adapter(bool, int)
+def flatten_params(obj: Any, prefix: str = "") -> List[Tuple[str, Union[str, None], Union[float, None]]]:
+    """
+    Flattens nested dicts and lists into (dotted path, text value,
+    numeric value) rows. Numbers and bools only set the numeric value,
+    everything else is stored as text.
+    """
+    rows = []
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            rows.extend(flatten_params(value, f"{prefix}{key}."))
+    elif isinstance(obj, (list, tuple)):
+        for i, value in enumerate(obj):
+            rows.extend(flatten_params(value, f"{prefix}{i}."))
+    elif obj is None:
+        rows.append((prefix[:-1], None, None))
+    elif isinstance(obj, (bool, int, float)):
+        rows.append((prefix[:-1], None, float(obj)))
+    else:
+        rows.append((prefix[:-1], str(obj), None))
+    return rows
+
 # Converter objects are always passed a bytes object, so handle that
 def text2uuid(byte_text):
     text = byte_text.decode("utf-8")
     return uuid.UUID(text)
 def text2config(byte_text):
-    text = byte_text.decode("utf-8")
+    text = _column_text(byte_text)
     return json.loads(text, object_hook=SimulationStartConfig.custom_decoder)
 def text2kwargs(byte_text):
-    text = byte_text.decode("utf-8")
+    text = _column_text(byte_text)
     return json.loads(text)
 sqlite3.register_converter("UUID", text2uuid)
 sqlite3.register_converter("SIMULATIONCONFIG", text2config)
 sqlite3.register_converter("KWARGS", text2kwargs)
 sqlite3.register_converter("BOOL", lambda i: bool(int(i)))
 
+class DecodedColumnCache:
+    """
+    LRU cache of decoded config and start_kwargs values keyed by
+    (sim id, column). Queries select these columns raw and decode
+    through the cache, so each stored value is parsed once instead
+    of on every fetch. An entry is only reused while its raw bytes
+    are unchanged.
+
+    Cached values are shared between callers and must not be mutated.
+    """
+    def __init__(self, max_size: int = 4096) -> None:
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, sim_id: Any, column: str, raw: Union[bytes, None], decoder) -> Any:
+        if raw is None:
+            return None
+        key = (str(sim_id), column)
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None and entry[0] == raw:
+                self._entries.move_to_end(key)
+                return entry[1]
+        value = decoder(raw)
+        with self._lock:
+            self._entries[key] = (raw, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, sim_ids: Union[Iterable[Any], None] = None) -> None:
+        """Drops entries for the given sim ids, or every entry if None."""
+        with self._lock:
+            if sim_ids is None:
+                self._entries.clear()
+                return
+            ids = set(str(sim_id) for sim_id in sim_ids)
+            for key in [key for key in self._entries if key[0] in ids]:
+                del self._entries[key]
+
 class ProjectManager:
     def immediate(func):
         def wrapper(*args, **kwargs):
-            # Run cached executions early so we don't
-            # immediately repopulate with old stuff
-            ProjectManager.run_cached_executions()
-            ProjectManager._execution_mutex.acquire()
-            result = func(*args, **kwargs)
-            ProjectManager._execution_mutex.release()
-            return result
+            # Run on the writer thread ahead of any batching
+            # delay and wait for the commit.
+            if ProjectManager._writer is None:
+                return func(*args, **kwargs)
+            return ProjectManager._writer.run(func, *args, **kwargs)
         return wrapper
 
     ARGS_FILENAME   = "args.pickle"
@@ -71,26 +166,103 @@ class ProjectManager:
     RES_FOLDER      = "resources"
     DB_NAME         = "simulations.db"
 
-    _execution_mutex = Lock()
-    _cached_executions: List[Tuple[str, Any]] = []
+    DEFAULT_WRITE_LATENCY   = 1.0
+    DEFAULT_WRITE_BATCH     = 256
+    DEFAULT_DELETE_RATE     = 50.0
+    # Seconds between checks for finished runs old enough to archive
+    ARCHIVE_POLL_INTERVAL   = 600
+    HISTORY_SORT_COLUMNS    = ("created", "ended", "name")
+    # Per-key statistics stored in sim_summaries when a run ends
+    SUMMARY_STATS           = ("final", "minimum", "maximum", "mean_last_n", "points", "duration", "steps_per_sec")
+    SUMMARY_LAST_N          = 10
+    HISTORY_FIELDS          = (
+        "sim_id", "name", "created", "started", "ended", "is_done", "cancelled", "failed",
+        "force_stopped", "config", "start_kwargs", "sim_type_name", "sim_module_name", "sim_key",
+        "archived"
+    )
+
+    # Columns whose stored JSON is selected raw and decoded lazily
+    LAZY_COLUMNS            = {
+        "config":       text2config,
+        "start_kwargs": text2kwargs,
+    }
+    # Selecting an expression instead of the column drops its declared
+    # type, so sqlite3 returns the raw bytes without running a converter.
+    SIM_SELECT_COLUMNS      = "sim_id, name, created, started, ended, is_done, cancelled, failed, force_stopped, " \
+                              "CAST(config AS BLOB), CAST(start_kwargs AS BLOB), sim_type_name, sim_module_name, sim_key, archived"
+
+    decoded_cache = DecodedColumnCache()
+    _writer: Union[DatabaseWriter, None] = None
+    _deleter: Union[DeletionWorker, None] = None
+    _read_local = threading.local()
+    dbcon: sqlite3.Connection = None
+    dbcur: sqlite3.Cursor = None
 
     @staticmethod
     def get_con() -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
-        return ProjectManager.dbcon, ProjectManager.dbcur
+        """
+        Returns the writer connection when called from the writer thread
+        (inside a queued write), otherwise a read connection owned by
+        the calling thread.
+        """
+        writer = ProjectManager._writer
+        if writer is not None and writer.on_writer_thread:
+            return writer.con, writer.cur
+        return ProjectManager._get_read_con()
+
+    @staticmethod
+    def _get_read_con() -> Tuple[sqlite3.Connection, sqlite3.Cursor]:
+        if ProjectManager._writer is None:
+            return ProjectManager.dbcon, ProjectManager.dbcur
+        local = ProjectManager._read_local
+        # Reconnect if the project database changed since this
+        # thread last read from it.
+        if getattr(local, "db_path", None) != ProjectManager.db_path():
+            if getattr(local, "con", None) is not None:
+                local.con.close()
+            local.con = sqlite3.connect(ProjectManager.db_path(), detect_types=sqlite3.PARSE_DECLTYPES)
+            local.con.execute("PRAGMA query_only=ON;")
+            local.cur = local.con.cursor()
+            local.db_path = ProjectManager.db_path()
+        return local.con, local.cur
+
+    @staticmethod
+    def _write(func, *args, coalesce_key=None, **kwargs):
+        """Queues a write to be committed in the writer's next batch."""
+        if ProjectManager._writer is None:
+            return None
+        return ProjectManager._writer.submit(func, *args, coalesce_key=coalesce_key, **kwargs)
+
+    @staticmethod
+    def flush():
+        """Blocks until all queued writes have been committed."""
+        if ProjectManager._writer is not None:
+            ProjectManager._writer.flush()
+
+    @staticmethod
+    def shutdown():
+        """Stops the deletion worker, commits all queued writes and stops the writer thread."""
+        if ProjectManager._deleter is not None:
+            ProjectManager._deleter.stop()
+            ProjectManager._deleter = None
+        if ProjectManager._writer is not None:
+            ProjectManager._writer.stop()
+            ProjectManager._writer = None
 
     @staticmethod
     def setup_from_args(args):
         if args is None:
             args = SimpleNamespace(no_project=True)
+        ProjectManager.shutdown()
+        ProjectManager.decoded_cache.invalidate()
         ProjectManager.args = args
-        ProjectManager.dbcon: sqlite3.Connection = None
-        ProjectManager.dbcur: sqlite3.Cursor = None
+        ProjectManager.dbcon = None
+        ProjectManager.dbcur = None
         # Do not setup project if the argument is not there, or
         # if the argument value is False
         if "no_project" in vars(args) and not args.no_project:
             ProjectManager._setup_project_structure()
             ProjectManager._setup_database()
-            ProjectManager._setup_loop()
 
     @staticmethod
     def _get_export_folder() -> Path:
@@ -166,19 +338,113 @@ class ProjectManager:
             logger.error(f"Problem setting up project structure at base directory '{ProjectManager.args.project_dir}'")
             raise e
         
+    @staticmethod
+    def write_latency() -> float:
+        if "db_write_latency" in vars(ProjectManager.args):
+            return ProjectManager.args.db_write_latency
+        return ProjectManager.DEFAULT_WRITE_LATENCY
+    @staticmethod
+    def write_batch_size() -> int:
+        if "db_write_batch" in vars(ProjectManager.args):
+            return ProjectManager.args.db_write_batch
+        return ProjectManager.DEFAULT_WRITE_BATCH
+
+    @staticmethod
+    def delete_rate() -> float:
+        """Megabytes per second the deletion worker may remove."""
+        if "delete_rate" in vars(ProjectManager.args):
+            return ProjectManager.args.delete_rate
+        return ProjectManager.DEFAULT_DELETE_RATE
+
+    @staticmethod
+    def scheduler_limits() -> Tuple[int, int, float]:
+        """
+        Returns (slots, cpu threads, memory megabytes) available to
+        queued simulations. 0 slots or threads means the CPU count,
+        0 memory means unlimited.
+        """
+        args = vars(ProjectManager.args)
+        return (
+            args.get("max_concurrent_sims", 1),
+            args.get("sim_cpu_budget", 0),
+            args.get("sim_memory_budget", 0),
+        )
+
+    @staticmethod
+    def admission_thresholds() -> Union[Tuple[float, float], None]:
+        """
+        Returns the (CPU idle percent, available memory mb) that must remain
+        after launching a queued simulation, or None if admission control
+        is turned off. It is only used in process mode, because thread-mode
+        runs share the server process and their footprints cannot be told
+        apart.
+        """
+        args = vars(ProjectManager.args)
+        if args.get("no_admission_control", False) or ProjectManager.execution_mode() != "process":
+            return None
+        return (args.get("admit_cpu_idle", 10.0), args.get("admit_memory_mb", 1024.0))
+
+    @staticmethod
+    def execution_mode() -> str:
+        """Whether new simulations run on a thread or in their own process."""
+        if "sim_execution" in vars(ProjectManager.args):
+            return ProjectManager.args.sim_execution
+        return "thread"
+
+    @staticmethod
+    def sweep_max_configs() -> int:
+        """Most configurations a single sweep may expand to. 0 disables the limit."""
+        if "sweep_max_configs" in vars(ProjectManager.args):
+            return ProjectManager.args.sweep_max_configs
+        return DEFAULT_MAX_CONFIGS
+
+    @staticmethod
+    def archive_after_days() -> float:
+        """Days after ending that runs are archived. 0 disables archiving."""
+        if "archive_after_days" in vars(ProjectManager.args):
+            return ProjectManager.args.archive_after_days
+        return 0
+
+    @staticmethod
+    def column_format() -> str:
+        if "db_column_format" in vars(ProjectManager.args):
+            return ProjectManager.args.db_column_format
+        return "json"
+
     @staticmethod
     def _setup_database():
-        ProjectManager.dbcon = sqlite3.connect(ProjectManager.db_path(), detect_types=sqlite3.PARSE_DECLTYPES)
-        ProjectManager.dbcon.execute("PRAGMA foreign_keys = ON;")
-        ProjectManager.dbcur = ProjectManager.dbcon.cursor()
+        set_column_format(ProjectManager.column_format())
+        ProjectManager._writer = DatabaseWriter(
+            ProjectManager.db_path(),
+            max_latency=ProjectManager.write_latency(),
+            max_batch=ProjectManager.write_batch_size()
+        )
+        ProjectManager._writer.start()
+        ProjectManager._writer.run(ProjectManager._create_tables)
+        # Picks up deletions left unfinished by a previous run
+        ProjectManager._deleter = DeletionWorker(
+            ProjectManager.sims_folder(),
+            ProjectManager._get_pending_deletions,
+            ProjectManager._complete_deletion,
+            bytes_per_sec=ProjectManager.delete_rate()*1024*1024
+        )
+        ProjectManager._deleter.start()
+
+    @staticmethod
+    def _create_tables():
         ProjectManager._create_simulations_table()
         ProjectManager._create_status_table()
+        ProjectManager._create_latest_status_table()
         ProjectManager._create_api_call_table()
+        ProjectManager._create_pending_deletions_table()
+        ProjectManager._create_metrics_table()
+        ProjectManager._create_config_params_table()
+        ProjectManager._create_summaries_table()
+        ProjectManager._create_footprints_table()
 
     @staticmethod
     def _create_simulations_table():
         con, cur = ProjectManager.get_con()
-        cur = ProjectManager.dbcur
         cur.execute("""CREATE TABLE IF NOT EXISTS simulations (
                         sim_id UUID PRIMARY KEY,
                         name TEXT,
@@ -192,13 +458,31 @@ class ProjectManager:
                         config SIMULATIONCONFIG,
                         start_kwargs KWARGS,
                         sim_type_name TEXT,
-                        sim_module_name TEXT
+                        sim_module_name TEXT,
+                        sim_key TEXT,
+                        deleted BOOL NOT NULL DEFAULT 0,
+                        archived BOOL NOT NULL DEFAULT 0
                         )""")
-        con.commit()
+        # Projects created before sim_key was stored in its own column
+        columns = [info[1] for info in cur.execute("PRAGMA table_info(simulations)").fetchall()]
+        if "sim_key" not in columns:
+            cur.execute("ALTER TABLE simulations ADD COLUMN sim_key TEXT")
+            cur.execute("UPDATE simulations SET sim_key=json_extract(config, '$.sim_key')")
+        # Projects created before deletions were done in the background
+        if "deleted" not in columns:
+            cur.execute("ALTER TABLE simulations ADD COLUMN deleted BOOL NOT NULL DEFAULT 0")
+        # Projects created before finished runs could be archived
+        if "archived" not in columns:
+            cur.execute("ALTER TABLE simulations ADD COLUMN archived BOOL NOT NULL DEFAULT 0")
+        # Indexes used by history sorting and keyset pagination
+        for column in ProjectManager.HISTORY_SORT_COLUMNS:
+            cur.execute(f"""CREATE INDEX IF NOT EXISTS idx_simulations_{column}
+                        ON simulations (IFNULL({column}, ''), sim_id)""")
+        cur.execute("""CREATE INDEX IF NOT EXISTS idx_simulations_sim_key
+                    ON simulations (sim_key)""")
     @staticmethod
     def _create_status_table():
         con, cur = ProjectManager.get_con()
-        cur = ProjectManager.dbcur
         cur.execute("""CREATE TABLE IF NOT EXISTS sim_status (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     sim_id INTEGER NOT NULL,
@@ -210,11 +494,45 @@ class ProjectManager:
                     FOREIGN KEY (sim_id)
                         REFERENCES simulations (sim_id)
                     )""")
-        con.commit()
+        cur.execute("""CREATE INDEX IF NOT EXISTS idx_sim_status_sim_time
+                    ON sim_status (sim_id, time)""")
+    @staticmethod
+    def _create_latest_status_table():
+        """
+        Creates sim_latest_status, which holds only the newest row of
+        sim_status for each simulation. It is kept up to date by
+        _add_simulation_statuses so status polls never scan sim_status.
+        """
+        con, cur = ProjectManager.get_con()
+        cur.execute("""CREATE TABLE IF NOT EXISTS sim_latest_status (
+                    sim_id UUID PRIMARY KEY,
+                    time TIMESTAMP,
+                    code INTEGER,
+                    subcode INTEGER,
+                    details TEXT,
+                    error_trace TEXT,
+                    FOREIGN KEY (sim_id)
+                        REFERENCES simulations (sim_id)
+                    )""")
+        # Backfill from projects created before the table existed.
+        # Deleted simulations waiting on the deletion worker are skipped,
+        # so the table stays empty after a delete-all and restart.
+        if cur.execute("SELECT 1 FROM sim_latest_status LIMIT 1").fetchone() is None:
+            cur.execute("""
+            INSERT INTO sim_latest_status
+                (sim_id, time, code, subcode, details, error_trace)
+            SELECT
+                sim_id, MAX(time), code, subcode, details, error_trace
+            FROM
+                sim_status
+            WHERE
+                sim_id IN (SELECT sim_id FROM simulations WHERE deleted=0)
+            GROUP BY
+                sim_id
+            """)
     @staticmethod
     def _create_api_call_table():
         con, cur = ProjectManager.get_con()
-        cur = ProjectManager.dbcur
         cur.execute("""CREATE TABLE IF NOT EXISTS api_calls (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL,
@@ -222,51 +540,147 @@ class ProjectManager:
                     code INTEGER,
                     details TEXT
                     )""")
-        con.commit()
 
     @staticmethod
-    async def _setup_loop_standalone():
-        asyncio.create_task(ProjectManager.run_cached_executions_loop())
+    def _create_pending_deletions_table():
+        """
+        Creates pending_deletions, the durable queue of simulation
+        folders still to be removed by the deletion worker.
+        """
+        con, cur = ProjectManager.get_con()
+        cur.execute("""CREATE TABLE IF NOT EXISTS pending_deletions (
+                    sim_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    requested TIMESTAMP
+                    )""")
+
+    @staticmethod
+    def _create_metrics_table():
+        """
+        Creates sim_metrics, the project-wide store of logged scalars.
+        Rows are clustered by (key, sim_id, step) so a query for one
+        key across many runs reads a single contiguous range.
+        """
+        con, cur = ProjectManager.get_con()
+        cur.execute("""CREATE TABLE IF NOT EXISTS sim_metrics (
+                    key TEXT NOT NULL,
+                    sim_id TEXT NOT NULL,
+                    step INTEGER NOT NULL,
+                    wall_time REAL,
+                    value REAL,
+                    PRIMARY KEY (key, sim_id, step)
+                    ) WITHOUT ROWID""")
+        # Used when purging a deleted simulation's metrics
+        cur.execute("""CREATE INDEX IF NOT EXISTS idx_sim_metrics_sim_id
+                    ON sim_metrics (sim_id)""")
+
     @staticmethod
-    def _setup_loop():
-        try:
-            asyncio.create_task(ProjectManager.run_cached_executions_loop())
-        except RuntimeError:
-            asyncio.run(ProjectManager._setup_loop_standalone())
+    def _create_summaries_table():
+        """
+        Creates sim_summaries, statistics of each metric key of a run
+        computed when the run ends. Every statistic has an index led by
+        the key, so ranking runs by one of them is a single index scan.
+        """
+        con, cur = ProjectManager.get_con()
+        cur.execute("""CREATE TABLE IF NOT EXISTS sim_summaries (
+                    sim_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    final REAL,
+                    minimum REAL,
+                    maximum REAL,
+                    mean_last_n REAL,
+                    points INTEGER,
+                    first_step INTEGER,
+                    last_step INTEGER,
+                    duration REAL,
+                    steps_per_sec REAL,
+                    PRIMARY KEY (sim_id, key)
+                    ) WITHOUT ROWID""")
+        for stat in ProjectManager.SUMMARY_STATS:
+            cur.execute(f"""CREATE INDEX IF NOT EXISTS idx_sim_summaries_{stat}
+                        ON sim_summaries (key, IFNULL({stat}, ''), sim_id)""")
 
     @staticmethod
-    async def run_cached_executions_loop():
-        while True:
-            await asyncio.sleep(1)
-            ProjectManager.run_cached_executions()
-            
+    def _create_footprints_table():
+        """
+        Creates sim_footprints, the resources each simulation
+        type was learned to use, for admission control.
+        """
+        con, cur = ProjectManager.get_con()
+        cur.execute("""CREATE TABLE IF NOT EXISTS sim_footprints (
+                    sim_key TEXT PRIMARY KEY,
+                    memory_mb REAL NOT NULL,
+                    cpu_percent REAL NOT NULL,
+                    runs INTEGER NOT NULL
+                    )""")
+
     @staticmethod
-    def run_cached_executions():
+    def _create_config_params_table():
+        """
+        Creates sim_config_params, every config and start kwargs value
+        of each simulation flattened to one row per dotted path, so runs
+        can be searched by hyperparameter through an index.
+        """
         con, cur = ProjectManager.get_con()
-        try:
-            ProjectManager._execution_mutex.acquire()
-            if len(ProjectManager._cached_executions) > 0:
-                logger.info(f"ProjectManager running {len(ProjectManager._cached_executions)} cached executions")
-            for exec_info in ProjectManager._cached_executions:
-                exec_info()
-            ProjectManager._cached_executions.clear()
-            ProjectManager._execution_mutex.release()
-        except Exception as e:
-            logger.error(f"Error running cached executions: {ProjectManager._cached_executions}")
-            ProjectManager._execution_mutex.release()
-            raise e
-        con.commit()
+        cur.execute("""CREATE TABLE IF NOT EXISTS sim_config_params (
+                    sim_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    value_text TEXT,
+                    value_num REAL,
+                    PRIMARY KEY (sim_id, path)
+                    ) WITHOUT ROWID""")
+        cur.execute("""CREATE INDEX IF NOT EXISTS idx_sim_config_params_num
+                    ON sim_config_params (path, value_num)""")
+        cur.execute("""CREATE INDEX IF NOT EXISTS idx_sim_config_params_text
+                    ON sim_config_params (path, value_text)""")
+        # Backfill from projects created before the table existed
+        if cur.execute("SELECT 1 FROM sim_config_params LIMIT 1").fetchone() is None:
+            rows = cur.execute("SELECT sim_id, CAST(config AS BLOB), CAST(start_kwargs AS BLOB) FROM simulations").fetchall()
+            for sim_id, config, start_kwargs in rows:
+                try:
+                    ProjectManager._set_config_params(
+                        str(sim_id),
+                        text2config(config) if config is not None else None,
+                        text2kwargs(start_kwargs) if start_kwargs is not None else None
+                    )
+                except Exception as e:
+                    logger.error(f"Could not index config of simulation '{sim_id}': {e}")
 
+    @staticmethod
+    def _set_config_params(sim_id: str, config: Union[SimulationStartConfig, Dict[str, Any], None], start_kwargs: Union[Dict[str, Any], None]):
+        con, cur = ProjectManager.get_con()
+        if isinstance(config, SimulationStartConfig):
+            config = dict(config.__dict__)
+        params = {}
+        if isinstance(config, dict):
+            params.update(config)
+        if start_kwargs:
+            params["start_kwargs"] = start_kwargs
+        cur.execute("DELETE FROM sim_config_params WHERE sim_id=?", (sim_id,))
+        cur.executemany(
+            "INSERT OR REPLACE INTO sim_config_params (sim_id, path, value_text, value_num) VALUES (?, ?, ?, ?)",
+            [(sim_id, path, value_text, value_num) for path, value_text, value_num in flatten_params(params)]
+        )
 
     @staticmethod
     def _add_or_update_simulation(sim_id: uuid.UUID, sim: Simulation):
         if sim is None: return
         con, cur = ProjectManager.get_con()
 
-        check_text = "SELECT COUNT(sim_id) FROM simulations WHERE sim_id=?"
-        existing = cur.execute(check_text, (sim_id,)).fetchone()
-        
-        if (existing[0] < 1):
+        # Encode once to both compare with the stored values and save
+        config_text = config2text(sim.config)
+        kwargs_text = kwargs2text(KwargWrapper(sim.start_kwargs))
+        check_text = "SELECT deleted, config IS ? AND start_kwargs IS ? FROM simulations WHERE sim_id=?"
+        existing = cur.execute(check_text, (config_text, kwargs_text, sim_id)).fetchone()
+        # Never bring a deleted simulation back
+        if existing is not None and existing[0]:
+            return
+        if existing is None and cur.execute(
+            "SELECT 1 FROM pending_deletions WHERE sim_id=?", (str(sim_id),)
+        ).fetchone() is not None:
+            return
+
+        if existing is None:
             sim_update_text = """
             INSERT INTO simulations
             (
@@ -282,9 +696,10 @@ class ProjectManager:
                 config,
                 start_kwargs,
                 sim_type_name,
-                sim_module_name
+                sim_module_name,
+                sim_key
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """
             params = (
                 sim_id,
@@ -296,10 +711,11 @@ class ProjectManager:
                 sim._meta_cancelled,
                 sim._meta_failed,
                 sim.force_stopped,
-                sim.config,
-                KwargWrapper(sim.start_kwargs),
+                config_text,
+                kwargs_text,
                 type(sim).__name__,
-                type(sim).__module__
+                type(sim).__module__,
+                sim.config.sim_key
             )
         else:
             sim_update_text = """
@@ -316,7 +732,8 @@ class ProjectManager:
                 config=?,
                 start_kwargs=?,
                 sim_type_name=?,
-                sim_module_name=?
+                sim_module_name=?,
+                sim_key=?
             WHERE sim_id=?
             """
             params = (
@@ -328,20 +745,29 @@ class ProjectManager:
                 sim._meta_cancelled,
                 sim._meta_failed,
                 sim.force_stopped,
-                sim.config,
-                KwargWrapper(sim.start_kwargs),
+                config_text,
+                kwargs_text,
                 type(sim).__name__,
                 type(sim).__module__,
+                sim.config.sim_key,
                 sim_id
             )
         cur.execute(sim_update_text, params)
+        # Status saves rarely change the config, so only
+        # reindex its params when it is new or changed.
+        if existing is None or not existing[1]:
+            ProjectManager._set_config_params(str(sim_id), sim.config, sim.start_kwargs)
         # Also add any statuses that it contains to the status table
         ProjectManager._add_simulation_statuses(sim_id, sim)
+        ProjectManager._add_simulation_metrics(sim_id, sim)
 
     @staticmethod
     def add_or_update_simulation(sim_id: uuid.UUID, sim: Simulation):
-        ProjectManager._cached_executions.append(
-            functools.partial(ProjectManager._add_or_update_simulation, sim_id=sim_id, sim=sim)
+        # Saving reads the simulation's current state, so repeated
+        # saves of one simulation in the same batch only run once.
+        ProjectManager._write(
+            ProjectManager._add_or_update_simulation, sim_id=sim_id, sim=sim,
+            coalesce_key=("simulation", sim_id)
         )
     @staticmethod
     @immediate
@@ -350,9 +776,7 @@ class ProjectManager:
 
     @staticmethod
     def add_simulation_statuses(sim_id: uuid.UUID, sim: Simulation):
-        ProjectManager._cached_executions.append(
-            functools.partial(ProjectManager._add_simulation_statuses, sim_id=sim_id, sim=sim)
-        )
+        ProjectManager._write(ProjectManager._add_simulation_statuses, sim_id=sim_id, sim=sim)
     @staticmethod
     def _add_simulation_statuses(sim_id: uuid.UUID, sim: Simulation):
         if sim is None: return
@@ -379,7 +803,155 @@ class ProjectManager:
                 status.details,
                 status.error_trace
             ))
+        if len(params) < 1:
+            return
         cur.executemany(update_text, params)
+        # Statuses are retrieved oldest first, so the last
+        # one replaces the simulation's latest status.
+        latest_text = """
+            INSERT INTO sim_latest_status
+            (
+                sim_id,
+                time,
+                code,
+                subcode,
+                details,
+                error_trace
+            )
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (sim_id) DO UPDATE SET
+                time=excluded.time,
+                code=excluded.code,
+                subcode=excluded.subcode,
+                details=excluded.details,
+                error_trace=excluded.error_trace
+            WHERE
+                sim_latest_status.time IS NULL OR
+                excluded.time >= sim_latest_status.time
+            """
+        cur.execute(latest_text, params[-1])
+
+    @staticmethod
+    def add_simulation_metrics(sim_id: uuid.UUID, sim: Simulation):
+        # Saving drains everything the simulation has logged so far,
+        # so only the newest queued save per batch needs to run.
+        ProjectManager._write(
+            ProjectManager._add_simulation_metrics, sim_id=sim_id, sim=sim,
+            coalesce_key=("metrics", sim_id)
+        )
+    @staticmethod
+    def _add_simulation_metrics(sim_id: uuid.UUID, sim: Simulation):
+        if sim is None: return
+        con, cur = ProjectManager.get_con()
+        rows = sim.retrieve_new_metrics()
+        if len(rows) < 1:
+            return
+        deleted = cur.execute("SELECT deleted FROM simulations WHERE sim_id=?", (sim_id,)).fetchone()
+        if deleted is not None and deleted[0]:
+            return
+        cur.executemany("""
+            INSERT OR REPLACE INTO sim_metrics
+                (key, sim_id, step, wall_time, value)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [(key, str(sim_id), step, wall_time, value) for key, step, wall_time, value in rows]
+        )
+
+    @staticmethod
+    def add_simulation_summaries(sim_id: uuid.UUID, sim: Simulation):
+        ProjectManager._write(
+            ProjectManager._add_simulation_summaries, sim_id=sim_id, sim=sim,
+            coalesce_key=("summaries", sim_id)
+        )
+    @staticmethod
+    def _add_simulation_summaries(sim_id: uuid.UUID, sim: Simulation):
+        """
+        Saves the run's remaining metrics, then replaces its summaries
+        with statistics over everything in sim_metrics.
+        """
+        if sim is None: return
+        ProjectManager._add_simulation_metrics(sim_id, sim)
+        con, cur = ProjectManager.get_con()
+        sim_key = str(sim_id)
+        duration = None
+        if sim._meta_start_time is not None and sim._meta_end_time is not None:
+            duration = (sim._meta_end_time - sim._meta_start_time).total_seconds()
+        aggregates = cur.execute("""
+            SELECT
+                key, MIN(value), MAX(value), COUNT(*), MIN(step), MAX(step), MIN(wall_time), MAX(wall_time)
+            FROM
+                sim_metrics
+            WHERE
+                sim_id=?
+            GROUP BY
+                key
+            """, (sim_key,)).fetchall()
+        rows = []
+        for key, minimum, maximum, points, first_step, last_step, first_time, last_time in aggregates:
+            last_values = [row[0] for row in cur.execute(
+                "SELECT value FROM sim_metrics WHERE key=? AND sim_id=? ORDER BY step DESC LIMIT ?",
+                (key, sim_key, ProjectManager.SUMMARY_LAST_N)
+            )]
+            elapsed = (last_time - first_time) if first_time is not None and last_time is not None else 0
+            rows.append((
+                sim_key, key,
+                last_values[0], minimum, maximum,
+                sum(last_values) / len(last_values),
+                points, first_step, last_step,
+                duration if duration is not None else (elapsed or None),
+                (last_step - first_step) / elapsed if elapsed > 0 else None,
+            ))
+        cur.execute("DELETE FROM sim_summaries WHERE sim_id=?", (sim_key,))
+        cur.executemany("""
+            INSERT INTO sim_summaries
+                (sim_id, key, final, minimum, maximum, mean_last_n, points, first_step, last_step, duration, steps_per_sec)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    @staticmethod
+    def set_sim_footprint(sim_key: str, footprint: ResourceFootprint):
+        ProjectManager._write(
+            ProjectManager._set_sim_footprint, sim_key, footprint,
+            coalesce_key=("footprint", sim_key)
+        )
+    @staticmethod
+    def _set_sim_footprint(sim_key: str, footprint: ResourceFootprint):
+        con, cur = ProjectManager.get_con()
+        cur.execute(
+            "INSERT OR REPLACE INTO sim_footprints (sim_key, memory_mb, cpu_percent, runs) VALUES (?, ?, ?, ?)",
+            (sim_key, footprint.memory_mb, footprint.cpu_percent, footprint.runs)
+        )
+
+    @staticmethod
+    def get_sim_footprints() -> Dict[str, ResourceFootprint]:
+        """Returns the learned resource footprint of each simulation type."""
+        con, cur = ProjectManager.get_con()
+        return {
+            sim_key: ResourceFootprint(memory_mb=memory_mb, cpu_percent=cpu_percent, runs=runs)
+            for sim_key, memory_mb, cpu_percent, runs
+            in cur.execute("SELECT sim_key, memory_mb, cpu_percent, runs FROM sim_footprints").fetchall()
+        }
+
+    @staticmethod
+    def get_simulation_summaries(sim_ids: Iterable[Union[str, uuid.UUID]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Returns the summaries of each requested simulation, by metric key."""
+        con, cur = ProjectManager.get_con()
+        id_strings = list(dict.fromkeys(str(simID) for simID in sim_ids))
+        columns = ("first_step", "last_step") + ProjectManager.SUMMARY_STATS
+        results = { simID: {} for simID in id_strings }
+        for i in range(0, len(id_strings), ProjectManager.MAX_QUERY_PARAMS):
+            chunk = id_strings[i:i+ProjectManager.MAX_QUERY_PARAMS]
+            query_text = f"""
+            SELECT
+                sim_id, key, {", ".join(columns)}
+            FROM
+                sim_summaries
+            WHERE
+                sim_id IN ({", ".join("?" for _ in chunk)})
+            """
+            for row in cur.execute(query_text, chunk).fetchall():
+                results[row[0]][row[1]] = dict(zip(columns, row[2:]))
+        return results
 
     @staticmethod
     def retrieval_to_sim_status(info) -> SimStatus:
@@ -397,8 +969,40 @@ class ProjectManager:
     # details:    str             = ""
     # error_trace:str             = ""
 
+    @staticmethod
+    def decode_column(sim_id: Any, column: str, raw: Union[bytes, None]) -> Any:
+        """Decodes a raw config or start_kwargs value through the shared cache."""
+        return ProjectManager.decoded_cache.get(sim_id, column, raw, ProjectManager.LAZY_COLUMNS[column])
+
+    @staticmethod
+    def get_simulation_configs(sim_ids: Iterable[Union[str, uuid.UUID]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the config and start_kwargs of each requested simulation,
+        for callers that listed simulations without them.
+        """
+        con, cur = ProjectManager.get_con()
+        id_strings = list(dict.fromkeys(str(simID) for simID in sim_ids))
+        results = {}
+        for i in range(0, len(id_strings), ProjectManager.MAX_QUERY_PARAMS):
+            chunk = id_strings[i:i+ProjectManager.MAX_QUERY_PARAMS]
+            query_text = f"""
+            SELECT
+                sim_id, CAST(config AS BLOB), CAST(start_kwargs AS BLOB)
+            FROM
+                simulations
+            WHERE
+                deleted=0 AND sim_id IN ({", ".join("?" for _ in chunk)})
+            """
+            for info in cur.execute(query_text, chunk).fetchall():
+                results[str(info[0])] = {
+                    "config":       ProjectManager.decode_column(info[0], "config", info[1]),
+                    "start_kwargs": ProjectManager.decode_column(info[0], "start_kwargs", info[2]),
+                }
+        return results
+
     @staticmethod
     def retrieval_to_stored_info(info) -> StoredSimulationInfo:
+        """Builds stored info from a row selected with SIM_SELECT_COLUMNS."""
         return StoredSimulationInfo(
             sim_id      = info[0],
             name        = info[1],
@@ -409,10 +1013,12 @@ class ProjectManager:
             cancelled   = info[6],
             failed      = info[7],
             force_stopped = info[8],
-            config      = info[9],
-            start_kwargs = info[10],    # should be a KwargWrapper after conversion. Fetch just the dict
+            config      = ProjectManager.decode_column(info[0], "config", info[9]),
+            start_kwargs = ProjectManager.decode_column(info[0], "start_kwargs", info[10]) or {},
             sim_type_name = info[11],
             sim_module_name = info[12],
+            sim_key     = info[13],
+            archived    = bool(info[14]),
         )
 
     @staticmethod
@@ -421,11 +1027,11 @@ class ProjectManager:
 
         query_text = f"""
         SELECT
-            sim_id, name, created, started, ended, is_done, cancelled, failed, force_stopped, config, start_kwargs, sim_type_name, sim_module_name
+            {ProjectManager.SIM_SELECT_COLUMNS}
         FROM
             simulations
         WHERE
-            {where_query}
+            ({where_query}) AND deleted=0
         ORDER BY
             created ASC
         """
@@ -440,31 +1046,41 @@ class ProjectManager:
         logger.debug(f"Got {len(results)} db results")
         return results
     
+    # SQLite limits the number of bound parameters per statement
+    MAX_QUERY_PARAMS = 500
+
     @staticmethod
-    def get_latest_statuses(sim_ids: Iterable[Union[str, uuid.UUID]]):
-        statuses = ProjectManager.get_all_latest_statuses()
-        filtered_statuses = {}
-        for simID in sim_ids:
-            if str(simID) in statuses:
-                filtered_statuses[str(simID)] = statuses[str(simID)]
-            else:
-                filtered_statuses[str(simID)] = None
+    def get_latest_statuses(sim_ids: Iterable[Union[str, uuid.UUID]]) -> Dict[str, Union[SimStatus, None]]:
+        """
+        Returns the latest status of each requested simulation, or None
+        for simulations with no recorded status. Only the requested rows
+        of sim_latest_status are read.
+        """
+        con, cur = ProjectManager.get_con()
+        id_strings = list(dict.fromkeys(str(simID) for simID in sim_ids))
+        filtered_statuses = { simID: None for simID in id_strings }
+        for i in range(0, len(id_strings), ProjectManager.MAX_QUERY_PARAMS):
+            chunk = id_strings[i:i+ProjectManager.MAX_QUERY_PARAMS]
+            query_text = f"""
+            SELECT
+                sim_id, time, code, subcode, details, error_trace
+            FROM
+                sim_latest_status
+            WHERE
+                sim_id IN ({", ".join("?" for _ in chunk)})
+            """
+            for info in cur.execute(query_text, chunk).fetchall():
+                filtered_statuses[str(info[0])] = ProjectManager.retrieval_to_sim_status(info)
         return filtered_statuses
     
+    @staticmethod
     def get_all_latest_statuses() -> Dict[str, SimStatus]:
         con, cur = ProjectManager.get_con()
         query_text = f"""
         SELECT
-            sim_id,
-            MAX(time),
-            code,
-            subcode,
-            details,
-            error_trace
+            sim_id, time, code, subcode, details, error_trace
         FROM
-            sim_status
-        GROUP BY
-            sim_id
+            sim_latest_status
         """
         cur.execute(query_text)
         res = cur.fetchall()
@@ -515,11 +1131,11 @@ class ProjectManager:
         filter_string = (" " + set_mode + " ").join(filters)
         query_text = f"""
         SELECT
-            sim_id, name, created, started, ended, is_done, cancelled, failed, force_stopped, config, start_kwargs, sim_type_name, sim_module_name
+            {ProjectManager.SIM_SELECT_COLUMNS}
         FROM
             simulations
-        {'WHERE' if has_filter else ''}
-            {filter_string}
+        WHERE
+            deleted=0 {f'AND ({filter_string})' if has_filter else ''}
         ORDER BY
             created ASC;
         """
@@ -534,71 +1150,602 @@ class ProjectManager:
         logger.error(f"Got {len(results)} db results")
         return results
     
+    PARAM_FILTER_OPS = {"eq": "=", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+
+    @staticmethod
+    def _param_filter_query(param_filter: ParamFilter) -> Tuple[str, List[Any]]:
+        """Builds a query selecting the sim_id of every simulation matching one filter."""
+        values = param_filter.value if param_filter.op == "in" else [param_filter.value]
+        if not isinstance(values, (list, tuple)) or len(values) < 1:
+            raise ValueError(f"Filter on '{param_filter.path}' needs a list of values for 'in'")
+        if any(value is None for value in values):
+            if param_filter.op not in ("eq", "in") or len(values) > 1:
+                raise ValueError(f"Filter on '{param_filter.path}' can only compare null values for equality")
+            return ("SELECT sim_id FROM sim_config_params WHERE path=? AND value_num IS NULL AND value_text IS NULL",
+                    [param_filter.path])
+        numeric = [isinstance(value, (bool, int, float)) for value in values]
+        if any(numeric) and not all(numeric):
+            raise ValueError(f"Filter on '{param_filter.path}' mixes numeric and text values")
+        column = "value_num" if numeric[0] else "value_text"
+        values = [float(value) if numeric[0] else str(value) for value in values]
+        if param_filter.op == "in":
+            condition = f"{column} IN ({', '.join('?' for _ in values)})"
+        else:
+            condition = f"{column} {ProjectManager.PARAM_FILTER_OPS[param_filter.op]} ?"
+        return (f"SELECT sim_id FROM sim_config_params WHERE path=? AND {condition}", [param_filter.path] + values)
+
+    @staticmethod
+    def get_simulations_by_params(
+        filters: Iterable[ParamFilter],
+        sim_key: Union[str, None] = None,
+        limit: Union[int, None] = None,
+    ) -> List[StoredSimulationInfo]:
+        """
+        Returns the stored simulations whose config matches every filter,
+        oldest first. Each filter is answered from an index on
+        sim_config_params.
+
+        Args:
+            filters: Conditions on flattened config paths. Numeric values
+                compare numerically, anything else compares as text.
+            sim_key: Only return simulations registered under this key.
+            limit: Maximum number of simulations to return.
+        """
+        filters = list(filters)
+        if len(filters) < 1:
+            raise ValueError("At least one parameter filter is required")
+        subqueries = []
+        exec_args = []
+        for param_filter in filters:
+            subquery, args = ProjectManager._param_filter_query(param_filter)
+            subqueries.append(subquery)
+            exec_args.extend(args)
+        query_text = f"""
+        SELECT
+            {ProjectManager.SIM_SELECT_COLUMNS}
+        FROM
+            simulations
+        WHERE
+            deleted=0 AND sim_id IN ({" INTERSECT ".join(subqueries)})
+            {'AND sim_key=?' if sim_key is not None else ''}
+        ORDER BY
+            created ASC
+        {'LIMIT ?' if limit is not None else ''}
+        """
+        if sim_key is not None:
+            exec_args.append(sim_key)
+        if limit is not None:
+            exec_args.append(limit)
+        con, cur = ProjectManager.get_con()
+        return [ProjectManager.retrieval_to_stored_info(info) for info in cur.execute(query_text, exec_args).fetchall()]
+
+    @staticmethod
+    def get_metric_keys(sim_key: Union[str, None] = None) -> List[str]:
+        """Returns every metric key logged by a simulation that is not deleted."""
+        con, cur = ProjectManager.get_con()
+        query_text = """
+        SELECT DISTINCT
+            m.key
+        FROM
+            sim_metrics m
+            JOIN simulations s ON s.sim_id = m.sim_id
+        WHERE
+            s.deleted=0
+        """
+        exec_args = []
+        if sim_key is not None:
+            query_text += " AND s.sim_key=?"
+            exec_args.append(sim_key)
+        return [row[0] for row in cur.execute(query_text + " ORDER BY m.key", exec_args).fetchall()]
+
+    @staticmethod
+    def get_metrics(
+        keys: Iterable[str],
+        sim_ids: Union[Iterable[Union[str, uuid.UUID]], None] = None,
+        sim_key: Union[str, None] = None,
+        step_min: Union[int, None] = None,
+        step_max: Union[int, None] = None,
+        last_only: bool = False,
+        align: bool = False,
+        max_points: Union[int, None] = None,
+    ) -> Dict[str, List[MetricSeries]]:
+        """
+        Returns the logged series of each metric key for many simulations
+        at once, read only from the metric store.
+
+        Args:
+            keys: Metric keys to return.
+            sim_ids: Only include these simulations. None includes all.
+            sim_key: Only include simulations registered under this key.
+            step_min: Only include steps at or after this step.
+            step_max: Only include steps at or before this step.
+            last_only: Only return the last value each simulation logged
+                (at or before step_max).
+            align: Give every series of a key the same steps, the union
+                of all their steps, with None where a run has no value.
+            max_points: Evenly thin each series down to about this many
+                points. The last point is always kept.
+        Returns:
+            Dict of metric key to one series per simulation that logged it.
+        """
+        con, cur = ProjectManager.get_con()
+        filters = ["m.key=?", "s.deleted=0"]
+        exec_args = []
+        if sim_key is not None:
+            filters.append("s.sim_key=?")
+            exec_args.append(sim_key)
+        if step_min is not None:
+            filters.append("m.step>=?")
+            exec_args.append(step_min)
+        if step_max is not None:
+            filters.append("m.step<=?")
+            exec_args.append(step_max)
+        if sim_ids is None:
+            id_chunks = [None]
+        else:
+            id_strings = list(dict.fromkeys(str(simID) for simID in sim_ids))
+            id_chunks = [
+                id_strings[i:i+ProjectManager.MAX_QUERY_PARAMS]
+                for i in range(0, len(id_strings), ProjectManager.MAX_QUERY_PARAMS)
+            ]
+        # SQLite returns the other columns from the row holding MAX(step)
+        selected = "m.sim_id, MAX(m.step), m.wall_time, m.value" if last_only \
+            else "m.sim_id, m.step, m.wall_time, m.value"
+
+        results = {}
+        for key in dict.fromkeys(keys):
+            series: Dict[str, List[Tuple[int, float, float]]] = {}
+            for chunk in id_chunks:
+                chunk_filters = list(filters)
+                chunk_args = [key] + exec_args
+                if chunk is not None:
+                    chunk_filters.append(f"m.sim_id IN ({', '.join('?' for _ in chunk)})")
+                    chunk_args.extend(chunk)
+                query_text = f"""
+                SELECT
+                    {selected}
+                FROM
+                    sim_metrics m
+                    JOIN simulations s ON s.sim_id = m.sim_id
+                WHERE
+                    {" AND ".join(chunk_filters)}
+                {'GROUP BY m.sim_id' if last_only else ''}
+                ORDER BY
+                    m.sim_id, m.step
+                """
+                for simID, step, wall_time, value in cur.execute(query_text, chunk_args):
+                    series.setdefault(simID, []).append((step, wall_time, value))
+            results[key] = ProjectManager._build_metric_series(series, align, max_points)
+        return results
+
+    @staticmethod
+    def _build_metric_series(
+        series: Dict[str, List[Tuple[int, float, float]]],
+        align: bool,
+        max_points: Union[int, None]
+    ) -> List[MetricSeries]:
+        def thin(count: int) -> List[int]:
+            if max_points is None or max_points < 1 or count <= max_points:
+                return list(range(count))
+            stride = -(-count // max_points)
+            kept = list(range(0, count, stride))
+            if kept[-1] != count - 1:
+                kept.append(count - 1)
+            return kept
+        if align:
+            steps = sorted({point[0] for points in series.values() for point in points})
+            steps = [steps[i] for i in thin(len(steps))]
+            built = []
+            for simID, points in series.items():
+                by_step = { point[0]: point for point in points }
+                built.append(MetricSeries(
+                    sim_id=simID,
+                    steps=steps,
+                    values=[by_step[step][2] if step in by_step else None for step in steps],
+                    wall_times=[by_step[step][1] if step in by_step else None for step in steps],
+                ))
+            return built
+        built = []
+        for simID, points in series.items():
+            points = [points[i] for i in thin(len(points))]
+            built.append(MetricSeries(
+                sim_id=simID,
+                steps=[point[0] for point in points],
+                values=[point[2] for point in points],
+                wall_times=[point[1] for point in points],
+            ))
+        return built
+
+    @staticmethod
+    def _encode_history_cursor(sort_key: Any, sim_id: Any) -> str:
+        data = json.dumps([sort_key, str(sim_id)]).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii")
+    @staticmethod
+    def _decode_history_cursor(cursor: str) -> Tuple[Any, str]:
+        try:
+            sort_key, sim_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return (sort_key, str(sim_id))
+        except Exception as e:
+            raise ValueError(f"Invalid history cursor '{cursor}'") from e
+
+    @staticmethod
+    def get_simulation_history(
+        limit: Union[int, None] = None,
+        cursor: Union[str, None] = None,
+        sort_by: Literal["created", "ended", "name", "summary"] = "created",
+        descending: bool = False,
+        is_done: bool = None,
+        cancelled: bool = None,
+        failed: bool = None,
+        force_stopped: bool = None,
+        sim_key: Union[str, None] = None,
+        created_after: Union[datetime, None] = None,
+        created_before: Union[datetime, None] = None,
+        fields: Union[Iterable[str], None] = None,
+        summary_key: Union[str, None] = None,
+        summary_stat: str = "final",
+        include_summaries: bool = False,
+    ) -> Tuple[List[StoredSimulationInfo], Union[str, None]]:
+        """
+        Returns one page of stored simulations using keyset pagination,
+        so each page costs the same no matter how deep it is.
+
+        Args:
+            limit: Maximum number of simulations to return. None returns all.
+            cursor: next_cursor returned with the previous page.
+            sort_by: Column to sort by. Ties are broken by sim_id.
+            descending: Whether to sort newest/largest first.
+            is_done, cancelled, failed, force_stopped: Optional status flag
+                filters. All given filters must match.
+            sim_key: Only return simulations registered under this key.
+            created_after: Only return simulations created at or after this time.
+            created_before: Only return simulations created before this time.
+            fields: Optional subset of StoredSimulationInfo fields to load.
+                Leaving out config and start_kwargs skips decoding them.
+            summary_key: Metric key whose summary is sorted by when sort_by
+                is "summary". Runs without a summary for it are left out.
+            summary_stat: Summary statistic to sort by. One of SUMMARY_STATS.
+            include_summaries: Whether to also return each run's summaries.
+        Returns:
+            Tuple of (simulations, cursor for the next page or None if
+            this is the last page).
+        """
+        if sort_by == "summary":
+            if summary_key is None:
+                raise ValueError("Sorting simulation history by summary needs a summary_key")
+            if summary_stat not in ProjectManager.SUMMARY_STATS:
+                raise ValueError(f"Unknown summary statistic '{summary_stat}'")
+        elif sort_by not in ProjectManager.HISTORY_SORT_COLUMNS:
+            raise ValueError(f"Cannot sort simulation history by '{sort_by}'")
+        if fields is None:
+            columns = list(ProjectManager.HISTORY_FIELDS)
+        else:
+            unknown = set(fields).difference(ProjectManager.HISTORY_FIELDS)
+            if len(unknown) > 0:
+                raise ValueError(f"Unknown simulation history fields: {sorted(unknown)}")
+            columns = ["sim_id"] + [f for f in ProjectManager.HISTORY_FIELDS if f in fields and f != "sim_id"]
+        con, cur = ProjectManager.get_con()
+
+        if sort_by == "summary":
+            # Driven by the summary index on (key, stat, sim_id)
+            sort_expr = f"IFNULL(ss.{summary_stat}, '')"
+            sort_id = "ss.sim_id"
+            source = "sim_summaries ss JOIN simulations s ON s.sim_id = ss.sim_id"
+            filters = ["ss.key=?", "s.deleted=0"]
+            exec_args = [summary_key]
+        else:
+            sort_expr = f"IFNULL(s.{sort_by}, '')"
+            sort_id = "s.sim_id"
+            source = "simulations s"
+            filters = ["s.deleted=0"]
+            exec_args = []
+        for column, value in (
+            ("is_done", is_done),
+            ("cancelled", cancelled),
+            ("failed", failed),
+            ("force_stopped", force_stopped),
+        ):
+            if value is not None:
+                filters.append(f"s.{column}=?")
+                exec_args.append(int(value))
+        if sim_key is not None:
+            filters.append("s.sim_key=?")
+            exec_args.append(sim_key)
+        if created_after is not None:
+            filters.append("s.created>=?")
+            exec_args.append(created_after)
+        if created_before is not None:
+            filters.append("s.created<?")
+            exec_args.append(created_before)
+        if cursor is not None:
+            # Same as (sort_expr, sim_id) > (key, id), but written so
+            # SQLite seeks straight to the cursor in the sort index.
+            key, last_id = ProjectManager._decode_history_cursor(cursor)
+            op = "<" if descending else ">"
+            filters.append(f"{sort_expr} {op}= ? AND ({sort_expr} {op} ? OR {sort_id} {op} ?)")
+            exec_args.extend((key, key, last_id))
+        direction = "DESC" if descending else "ASC"
+        selected = [f"CAST(s.{c} AS BLOB)" if c in ProjectManager.LAZY_COLUMNS else f"s.{c}" for c in columns]
+        query_text = f"""
+        SELECT
+            {", ".join(selected)}, {sort_expr}
+        FROM
+            {source}
+        WHERE
+            {" AND ".join(filters)}
+        ORDER BY
+            {sort_expr} {direction}, {sort_id} {direction}
+        {'LIMIT ?' if limit is not None else ''}
+        """
+        if limit is not None:
+            # One extra row tells us whether there is another page
+            exec_args.append(limit + 1)
+        rows = cur.execute(query_text, exec_args).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = ProjectManager._encode_history_cursor(rows[-1][-1], rows[-1][0])
+        results = []
+        for row in rows:
+            values = {}
+            for column, value in zip(columns, row):
+                if column in ProjectManager.LAZY_COLUMNS:
+                    value = ProjectManager.decode_column(row[0], column, value)
+                if value is not None:
+                    values[column] = value
+            results.append(StoredSimulationInfo(**values))
+        if include_summaries and len(results) > 0:
+            summaries = ProjectManager.get_simulation_summaries([row[0] for row in rows])
+            for info, row in zip(results, rows):
+                info.summaries = summaries[str(row[0])]
+        return (results, next_cursor)
+
     @staticmethod
-    @immediate
     def delete_all_simulations_immediate():
-        ProjectManager._delete_all_simulations()
+        ProjectManager._write_deletions(ProjectManager._delete_all_simulations, urgent=True).result()
     @staticmethod
     def _delete_all_simulations():
-        # Clear simulation table
+        """
+        Marks every simulation as deleted and queues every simulation
+        folder for the deletion worker. Returns without touching files.
+        """
         con, cur = ProjectManager.get_con()
-        # Must drop sim_status first because it has FKs
-        # that refer to simulation table entries.
-        cur.execute("DROP TABLE sim_status")
-        cur.execute("DROP TABLE simulations")
-        ProjectManager._create_simulations_table()
-        ProjectManager._create_status_table()
-        con.commit()
-        logger.info("Cleared table 'simulations'")
-        logger.info("Cleared table 'sim_status'")
-        # Delete all simulation subfolders if possible
-        shutil.rmtree(ProjectManager.sims_folder(), ignore_errors=True)
-        ProjectManager._setup_project_structure()
-        logger.info(f"Cleared simulation subfolder at '{ProjectManager.sims_folder()}'")
+        now = datetime.now()
+        sims_folder = ProjectManager.sims_folder()
+        cur.execute("""
+        INSERT OR IGNORE INTO pending_deletions
+            (sim_id, path, requested)
+        SELECT
+            sim_id, ? || sim_id, ?
+        FROM
+            simulations
+        WHERE
+            deleted=0
+        """, (os.path.join(sims_folder, ""), now))
+        # Folders of simulations that never made it into the database
+        if os.path.isdir(sims_folder):
+            cur.executemany(
+                "INSERT OR IGNORE INTO pending_deletions (sim_id, path, requested) VALUES (?, ?, ?)",
+                [(entry.name, entry.path, now) for entry in os.scandir(sims_folder) if entry.is_dir()]
+            )
+        cur.execute("UPDATE simulations SET deleted=1 WHERE deleted=0")
+        cur.execute("DELETE FROM sim_latest_status")
+        ProjectManager.decoded_cache.invalidate()
+        logger.info("Marked all simulations as deleted")
     @staticmethod
     def delete_all_simulations():
-        ProjectManager._cached_executions.append(
-            functools.partial(ProjectManager._delete_all_simulations)
-        )
+        ProjectManager._write_deletions(ProjectManager._delete_all_simulations)
     
     @staticmethod
-    @immediate
     def delete_specific_simulations_immediate(sim_ids):
-        ProjectManager._delete_specific_simulations(sim_ids)
+        ProjectManager._write_deletions(ProjectManager._delete_specific_simulations, sim_ids, urgent=True).result()
     @staticmethod
     def _delete_specific_simulations(sim_ids: Iterable[str]):
-        # Clear simulation table
+        """
+        Marks the simulations as deleted and queues their folders for
+        the deletion worker. Returns without touching files.
+        """
         con, cur = ProjectManager.get_con()
-        if (len(sim_ids) < 1):
+        id_strings = list(dict.fromkeys(str(simID) for simID in sim_ids))
+        if (len(id_strings) < 1):
             return
-        ids = set(sim_ids)
-        sim_selection_text = " OR ".join(["sim_id=?" for _ in sim_ids])
+        now = datetime.now()
+        cur.executemany(
+            "INSERT OR IGNORE INTO pending_deletions (sim_id, path, requested) VALUES (?, ?, ?)",
+            [(simID, os.path.join(ProjectManager.sims_folder(), simID), now) for simID in id_strings]
+        )
+        for i in range(0, len(id_strings), ProjectManager.MAX_QUERY_PARAMS):
+            chunk = id_strings[i:i+ProjectManager.MAX_QUERY_PARAMS]
+            selection_text = ", ".join("?" for _ in chunk)
+            cur.execute(f"UPDATE simulations SET deleted=1 WHERE sim_id IN ({selection_text})", chunk)
+            cur.execute(f"DELETE FROM sim_latest_status WHERE sim_id IN ({selection_text})", chunk)
+        ProjectManager.decoded_cache.invalidate(id_strings)
+        logger.info(f"Marked simulations '{id_strings}' as deleted")
 
-        # Delete all statuses for each simulation first
-        status_delete_text = f"""
-        DELETE FROM
-            sim_status
-        WHERE
-            {sim_selection_text}
+    @staticmethod
+    def _notify_deleter():
+        if ProjectManager._deleter is not None:
+            ProjectManager._deleter.notify()
+    @staticmethod
+    def _write_deletions(func, *args, urgent: bool = False) -> Future:
         """
-        cur.execute(status_delete_text, sim_ids)
-        logger.info(f"Cleared simulation status from sim_status table")
+        Queues a write that records pending deletions and wakes the
+        deletion worker once it has committed. Waking it any earlier
+        lets the worker read pending_deletions before the new rows are
+        visible and then sleep out a whole idle_poll.
+        """
+        if ProjectManager._writer is None:
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = ProjectManager._writer.submit(func, *args, urgent=urgent)
+        future.add_done_callback(lambda _: ProjectManager._notify_deleter())
+        return future
 
-        # Then delete the simulation information itself
-        query_text = f"""
-        DELETE FROM
+    @staticmethod
+    def _get_pending_deletions(limit: int) -> List[Tuple[str, str]]:
+        """Returns the oldest (sim_id, path) pairs still waiting to be deleted."""
+        con, cur = ProjectManager.get_con()
+        return cur.execute("""
+        SELECT
+            sim_id, path
+        FROM
+            pending_deletions
+        ORDER BY
+            requested ASC
+        LIMIT ?
+        """, (limit,)).fetchall()
+
+    @staticmethod
+    def _complete_deletion(sim_id: str):
+        """Called by the deletion worker once a simulation's folder is gone."""
+        # Archived runs leave a bundle next to where their folder was
+        archive = archive_path(os.path.join(ProjectManager.sims_folder(), sim_id))
+        if os.path.isfile(archive):
+            os.remove(archive)
+        ProjectManager._writer.run(ProjectManager._purge_simulation, sim_id)
+        logger.info(f"Cleared simulation '{sim_id}'")
+    @staticmethod
+    def _purge_simulation(sim_id: str):
+        # Statuses first because they have FKs
+        # that refer to simulation table entries.
+        con, cur = ProjectManager.get_con()
+        cur.execute("DELETE FROM sim_status WHERE sim_id=?", (sim_id,))
+        cur.execute("DELETE FROM sim_latest_status WHERE sim_id=?", (sim_id,))
+        cur.execute("DELETE FROM sim_metrics WHERE sim_id=?", (sim_id,))
+        cur.execute("DELETE FROM sim_config_params WHERE sim_id=?", (sim_id,))
+        cur.execute("DELETE FROM sim_summaries WHERE sim_id=?", (sim_id,))
+        cur.execute("DELETE FROM simulations WHERE sim_id=? AND deleted=1", (sim_id,))
+        cur.execute("DELETE FROM pending_deletions WHERE sim_id=?", (sim_id,))
+
+    @staticmethod
+    @immediate
+    def set_simulation_archived(sim_id):
+        """Records that a simulation's folder was replaced by its archive."""
+        con, cur = ProjectManager.get_con()
+        cur.execute("UPDATE simulations SET archived=1 WHERE sim_id=?", (str(sim_id),))
+
+    @staticmethod
+    def get_archive_candidates(ended_before: datetime, limit: int = 100) -> List[str]:
+        """
+        Returns the ids of finished, unarchived simulations
+        that ended before ended_before, oldest first.
+        """
+        con, cur = ProjectManager.get_con()
+        return [row[0] for row in cur.execute("""
+        SELECT
+            sim_id
+        FROM
             simulations
         WHERE
-            {sim_selection_text}
-        """
-        cur.execute(query_text, sim_ids)
-        con.commit()
-        logger.info(f"Cleared simulations '{sim_ids}' from simulations table")
-
-        # Delete all simulation subfolders if possible
-        sim_dir_names = [str(id) for id in sim_ids]
-        for path in os.listdir(ProjectManager.sims_folder()):
-            final_path = os.path.join(ProjectManager.sims_folder(), path)
-            if (os.path.isdir(final_path) and os.path.basename(final_path) in sim_dir_names):
-                shutil.rmtree(final_path, ignore_errors=True)
-                logger.info(f"Cleared simulation subfolder at '{final_path}'")
\ No newline at end of file
+            is_done=1 AND archived=0 AND deleted=0 AND ended IS NOT NULL AND ended < ?
+        ORDER BY
+            ended ASC
+        LIMIT ?
+        """, (ended_before, limit)).fetchall()]
+
+    @staticmethod
+    def get_deletion_status() -> Dict[str, Any]:
+        """Returns how many deletions are pending and what the worker has done."""
+        con, cur = ProjectManager.get_con()
+        pending = cur.execute("SELECT COUNT(*) FROM pending_deletions").fetchone()[0]
+        status = { "pending": pending }
+        if ProjectManager._deleter is not None:
+            status.update(ProjectManager._deleter.get_metrics())
+        return status
+
+class AsyncProjectManager:
+    """
+    Async facade over ProjectManager for API handlers. Reads run on a
+    small thread pool, and each pool thread holds its own read
+    connection. Writes are sent to the writer thread and awaited. A
+    slow query never blocks the event loop.
+    """
+    DEFAULT_READ_WORKERS = 4
+
+    _executor: Union[ThreadPoolExecutor, None] = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def read_workers() -> int:
+        args = getattr(ProjectManager, "args", None)
+        if args is not None and "db_read_workers" in vars(args):
+            return args.db_read_workers
+        return AsyncProjectManager.DEFAULT_READ_WORKERS
+
+    @staticmethod
+    def _get_executor() -> ThreadPoolExecutor:
+        with AsyncProjectManager._executor_lock:
+            if AsyncProjectManager._executor is None:
+                AsyncProjectManager._executor = ThreadPoolExecutor(
+                    max_workers=AsyncProjectManager.read_workers(),
+                    thread_name_prefix="gymdash-db-read"
+                )
+            return AsyncProjectManager._executor
+
+    @staticmethod
+    async def _read(func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            AsyncProjectManager._get_executor(),
+            functools.partial(func, *args, **kwargs)
+        )
+
+    @staticmethod
+    async def _write(func, *args, **kwargs):
+        writer = ProjectManager._writer
+        if writer is None:
+            return await AsyncProjectManager._read(func, *args, **kwargs)
+        return await asyncio.wrap_future(writer.submit(func, *args, urgent=True, **kwargs))
+
+    @staticmethod
+    def shutdown():
+        with AsyncProjectManager._executor_lock:
+            executor = AsyncProjectManager._executor
+            AsyncProjectManager._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    # Reads
+    @staticmethod
+    async def get_filtered_simulations(*args, **kwargs) -> List[StoredSimulationInfo]:
+        return await AsyncProjectManager._read(ProjectManager.get_filtered_simulations, *args, **kwargs)
+    @staticmethod
+    async def get_simulation_history(*args, **kwargs) -> Tuple[List[StoredSimulationInfo], Union[str, None]]:
+        return await AsyncProjectManager._read(ProjectManager.get_simulation_history, *args, **kwargs)
+    @staticmethod
+    async def get_latest_statuses(sim_ids: Iterable[Union[str, uuid.UUID]]) -> Dict[str, Union[SimStatus, None]]:
+        return await AsyncProjectManager._read(ProjectManager.get_latest_statuses, sim_ids)
+    @staticmethod
+    async def get_simulation_configs(sim_ids: Iterable[Union[str, uuid.UUID]]) -> Dict[str, Dict[str, Any]]:
+        return await AsyncProjectManager._read(ProjectManager.get_simulation_configs, sim_ids)
+    @staticmethod
+    async def get_simulations_by_params(*args, **kwargs) -> List[StoredSimulationInfo]:
+        return await AsyncProjectManager._read(ProjectManager.get_simulations_by_params, *args, **kwargs)
+    @staticmethod
+    async def get_metrics(*args, **kwargs) -> Dict[str, List[MetricSeries]]:
+        return await AsyncProjectManager._read(ProjectManager.get_metrics, *args, **kwargs)
+    @staticmethod
+    async def get_metric_keys(sim_key: Union[str, None] = None) -> List[str]:
+        return await AsyncProjectManager._read(ProjectManager.get_metric_keys, sim_key)
+    @staticmethod
+    async def get_deletion_status() -> Dict[str, Any]:
+        return await AsyncProjectManager._read(ProjectManager.get_deletion_status)
+    @staticmethod
+    async def get_archive_candidates(*args, **kwargs) -> List[str]:
+        return await AsyncProjectManager._read(ProjectManager.get_archive_candidates, *args, **kwargs)
+
+    # Writes
+    @staticmethod
+    async def add_or_update_simulation(sim_id: uuid.UUID, sim: Simulation):
+        await AsyncProjectManager._write(ProjectManager._add_or_update_simulation, sim_id, sim)
+    @staticmethod
+    async def delete_all_simulations():
+        await asyncio.wrap_future(ProjectManager._write_deletions(ProjectManager._delete_all_simulations, urgent=True))
+    @staticmethod
+    async def delete_specific_simulations(sim_ids: Iterable[str]):
+        await asyncio.wrap_future(ProjectManager._write_deletions(ProjectManager._delete_specific_simulations, sim_ids, urgent=True))
@@ -1,5 +1,9 @@
+import time
+from typing import Any, Dict, Tuple
+
 try:
     from stable_baselines3.common.callbacks import BaseCallback
+    from stable_baselines3.common.logger import KVWriter
     _has_sb = True
 except ImportError:
     _has_sb = False
@@ -30,12 +34,37 @@ class TensorboardPathCorrectionCallback(BaseCallback):
 
 
 class SimulationInteractionCallback(BaseCallback):
-    def __init__(self, simulation: Simulation, verbose: int = 0):
+    """
+    Answers progress queries and stop requests while a model trains.
+
+    Steps where nobody is querying the simulation cost one lock-free
+    check. Checks can be spread out further with check_every_steps and
+    check_every_seconds, at the cost of answering a little later.
+    """
+    def __init__(
+        self,
+        simulation: Simulation,
+        verbose: int = 0,
+        check_every_steps: int = 1,
+        check_every_seconds: float = 0,
+    ):
+        """
+        Args:
+            simulation: Simulation whose interactor is answered.
+            verbose: Verbosity passed to BaseCallback.
+            check_every_steps: Calls to _on_step between checks.
+            check_every_seconds: Least seconds between checks.
+                0 checks on every step allowed by check_every_steps.
+        """
         super().__init__(verbose)
         self.simulation = simulation
+        self.check_every_steps = max(1, check_every_steps)
+        self.check_every_seconds = check_every_seconds
         
         self.curr_timesteps = 0
         self.total_timesteps = 0
+        self._steps_since_check = 0
+        self._last_check_time = 0
 
     @property
     def interactor(self):
@@ -52,6 +81,18 @@ class SimulationInteractionCallback(BaseCallback):
         # HANDLE OUTGOING INFORMATION
         # Return progress value equivalent to the one used in ProgressBarCallback
         self.curr_timesteps += self.training_env.num_envs
+        self._steps_since_check += 1
+        if self._steps_since_check < self.check_every_steps:
+            return True
+        if self.check_every_seconds > 0:
+            now = time.monotonic()
+            if now - self._last_check_time < self.check_every_seconds:
+                return True
+            self._last_check_time = now
+        self._steps_since_check = 0
+        # Nobody is waiting on an answer
+        if not self.interactor.has_input:
+            return True
         self.interactor.set_out_if_in("progress", (self.curr_timesteps, self.total_timesteps))
         # HANDLE INCOMING INFORMATION
         if self.interactor.set_out_if_in("stop_simulation", True):
@@ -63,4 +104,30 @@ class SimulationInteractionCallback(BaseCallback):
         pass
 
     def _on_training_end(self) -> None:
-        pass
\ No newline at end of file
+        pass
+
+
+class SimulationMetricWriter(KVWriter):
+    """
+    Logger output format that copies every scalar the model logs into
+    the simulation's metrics, and from there into the project metric
+    store. Append it to a logger's output_formats.
+    """
+    def __init__(self, simulation: Simulation):
+        self.simulation = simulation
+
+    def write(self, key_values: Dict[str, Any], key_excluded: Dict[str, Tuple[str, ...]], step: int = 0) -> None:
+        metrics = {}
+        for key, value in key_values.items():
+            # Skip non-scalars like videos and figures
+            if isinstance(value, bool) or (not isinstance(value, (int, float)) and not hasattr(value, "item")):
+                continue
+            try:
+                metrics[key] = float(value)
+            except (TypeError, ValueError):
+                continue
+        if len(metrics) > 0:
+            self.simulation.log_metrics(metrics, step)
+
+    def close(self) -> None:
+        pass
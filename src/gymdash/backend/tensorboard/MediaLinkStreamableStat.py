@@ -1,9 +1,8 @@
 import os
 import re
-import dataclasses
 import logging
 from pathlib import Path
-from gymdash.backend.core.api.stream import StreamableStat
+from gymdash.backend.core.api.stream import FileEvent, StreamableStat
 from typing import Union, Callable, Dict, Set
 from gymdash.backend.core.api.config.stat_tags import ANY_TAG, MEDIA_TAG_SET
 try:
@@ -18,24 +17,6 @@ if not _has_tensorboard:
 
 logger = logging.getLogger(__name__)
 
-@dataclasses.dataclass(frozen=True)
-class FileEvent:
-    """Takes after tensorboard ImageEvent and AudioEvent, but
-    reads from a source file
-
-    Attributes:
-      wall_time: Timestamp of the event in seconds.
-      step: Global step of the event.
-      encoded_string: Image content encoded in bytes.
-      tag: The file type.
-      src_name: The name of the source file.
-    """
-    wall_time: float
-    step: int
-    encoded_string: bytes
-    tag: str
-    src_name: str
-
 class MediaLinkStreamableStat(StreamableStat):
 
     @staticmethod
@@ -2,7 +2,7 @@ import os
 import pathlib
 from abc import abstractmethod, ABC
 from collections import OrderedDict
-from typing import Any, Dict, Union
+from typing import Any, Callable, Dict, Union
 
 from torch.nn.modules import Module
 
@@ -130,6 +130,7 @@ class SimpleClassifierMLModel(SimulationMLModel, InferenceModel):
         dataloader: DataLoader,
         epochs:     int                             = 1,
         tb_logger:  Union[SummaryWriter, str, None] = None,
+        metric_logger: Union[Callable[[str, float, int], None], None] = None,
         log_step:   int                             = -1,
         loss_fn:    _Loss                           = None,
         optimizer:  Optimizer                       = None,
@@ -188,6 +189,8 @@ class SimpleClassifierMLModel(SimulationMLModel, InferenceModel):
                     train_loss = loss.item()
                     if tb_logger is not None:
                         tb_logger.add_scalar("loss/train", train_loss, curr_samples)
+                    if metric_logger is not None:
+                        metric_logger("loss/train", train_loss, curr_samples)
                 # Validate every val_per_steps steps
                 if do_val and val_per_steps > 0 and (curr_steps % val_per_steps  == 0):
                     val_results = self.validate(
@@ -202,6 +205,9 @@ class SimpleClassifierMLModel(SimulationMLModel, InferenceModel):
                             / val_results["total_samples"]
                         tb_logger.add_scalar("loss/val", val_loss, curr_samples)
                         tb_logger.add_scalar("acc/val", accuracy, curr_samples)
+                    if metric_logger is not None and val_results is not None:
+                        metric_logger("loss/val", val_results["loss"], curr_samples)
+                        metric_logger("acc/val", val_results["correct_samples"] / val_results["total_samples"], curr_samples)
                 # Perform callback
                 step_callback.update_locals(locals())
                 if not step_callback.on_invoke():
@@ -220,6 +226,9 @@ class SimpleClassifierMLModel(SimulationMLModel, InferenceModel):
                         / val_results["total_samples"]
                     tb_logger.add_scalar("loss/val", val_loss, curr_samples)
                     tb_logger.add_scalar("acc/val", accuracy, curr_samples)
+                if metric_logger is not None and val_results is not None:
+                    metric_logger("loss/val", val_results["loss"], curr_samples)
+                    metric_logger("acc/val", val_results["correct_samples"] / val_results["total_samples"], curr_samples)
             # Perform callback
             epoch_callback.update_locals(locals())
             if not epoch_callback.on_invoke():
@@ -148,6 +148,20 @@ def add_gymdash_arguments(parser: argparse.ArgumentParser) -> argparse.ArgumentP
     parser.add_argument("--apiserver-ip",       default="127.0.0.1", type=str, help="The custom IP address through which the API should be accessible.")
     parser.add_argument("--no-frontend",        action="store_true", help="Run without the frontend display")
     parser.add_argument("--no-backend",         action="store_true", help="Run without the backend API server")
+    parser.add_argument("--db-write-latency",   default=1.0, type=float, help="Longest time in seconds a database write waits to be batched with others before it is committed")
+    parser.add_argument("--db-write-batch",     default=256, type=int, help="Most database writes committed in a single transaction")
+    parser.add_argument("--db-read-workers",    default=4, type=int, help="Number of threads serving database reads for the API")
+    parser.add_argument("--delete-rate",        default=50.0, type=float, help="Megabytes per second the background deletion of simulation files may remove")
+    parser.add_argument("--sim-execution",      default="thread", choices=["thread", "process"], help="How simulations run. thread=on a thread of the API server. process=each in its own process, so training does not compete with the API for the GIL and a crash only takes down its own run.")
+    parser.add_argument("--max-concurrent-sims", default=1, type=int, help="Most queued simulations that run at the same time. 0 uses the number of CPUs.")
+    parser.add_argument("--sim-cpu-budget",     default=0, type=int, help="Most CPU threads reserved by running queued simulations. 0 uses the number of CPUs.")
+    parser.add_argument("--sim-memory-budget",  default=0.0, type=float, help="Most estimated memory in megabytes reserved by running queued simulations. 0 disables the limit.")
+    parser.add_argument("--admit-cpu-idle",     default=10.0, type=float, help="Percent of machine CPU that must stay idle after launching a queued simulation. Only used with --sim-execution process")
+    parser.add_argument("--admit-memory-mb",    default=1024.0, type=float, help="Megabytes of memory that must stay available after launching a queued simulation. Only used with --sim-execution process")
+    parser.add_argument("--no-admission-control", action="store_true", help="Launch queued simulations based only on slots and budgets, ignoring live machine load. Admission control is always off with --sim-execution thread, since per-run footprints cannot be measured there")
+    parser.add_argument("--sweep-max-configs",  default=10000, type=int, help="Most configurations a single sweep may expand to. Larger sweeps are rejected. 0 disables the limit.")
+    parser.add_argument("--archive-after-days", default=0.0, type=float, help="Days after a simulation ends before its folder is packed into a single archive file. 0 disables automatic archiving.")
+    parser.add_argument("--db-column-format",   default="json", choices=["json", "compact"], help="How new simulation configs and kwargs are stored. json=plain JSON text. compact=zlib-compressed JSON. Either format can always be read.")
     parser.add_argument("--no-project",         action="store_true", help="Run without building a backend project. Only used for testing.")
     return parser
 
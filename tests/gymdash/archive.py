@@ -0,0 +1,109 @@
+import unittest
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+from types import SimpleNamespace
+import gymdash.backend.core.api.config.stat_tags as tags
+from gymdash.backend.core.api.stream import FileEvent
+from gymdash.backend.core.simulation.archive import (ArchiveStreamer,
+                                                     ScalarRecord,
+                                                     archive_path,
+                                                     write_archive)
+
+logger = logging.getLogger(__name__)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00"*32
+
+class FolderStreamer:
+    """Minimal streamer serving one scalar key and one image folder."""
+    def __init__(self, sim_path: str) -> None:
+        self.image_folder = os.path.join(sim_path, "images")
+        self.stats = [SimpleNamespace(key="frames", folder=self.image_folder)]
+        self.read = False
+
+    @property
+    def streamer_name(self):
+        return "folder"
+
+    def get_stat_keys(self):
+        return [("loss", tags.TB_SCALARS), ("frames", tags.TB_IMAGES)]
+
+    def Reload(self):
+        pass
+
+    def reset_streamer(self):
+        self.read = False
+
+    def get_recent_from_key(self, key):
+        if key == "loss":
+            return [ScalarRecord(wall_time=100.0+i, step=i, value=i*0.5) for i in range(5)]
+        return [
+            FileEvent(wall_time=100.0+i, step=i, encoded_string=PNG_BYTES, tag=tags.TB_IMAGES, src_name=f"{i}.png")
+            for i in range(2)
+        ]
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sim_path = os.path.join(self.tmp.name, "sim")
+        os.makedirs(os.path.join(self.sim_path, "images"))
+        for i in range(2):
+            with open(os.path.join(self.sim_path, "images", f"{i}.png"), "wb") as f:
+                f.write(PNG_BYTES)
+        with open(os.path.join(self.sim_path, "events.out.tfevents.1"), "wb") as f:
+            f.write(b"raw event data")
+        self.path = archive_path(self.sim_path)
+        self.toc = write_archive(self.sim_path, [FolderStreamer(self.sim_path)], self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_bundle_keeps_files(self):
+        self.assertEqual(self.toc["files"], ["events.out.tfevents.1", "images/0.png", "images/1.png"])
+        with zipfile.ZipFile(self.path) as zf:
+            self.assertEqual(zf.read("events.out.tfevents.1"), b"raw event data")
+            # Media already in the folder is referenced, not copied
+            self.assertFalse(any(name.startswith("_media/") for name in zf.namelist()))
+            self.assertEqual(zf.getinfo("images/0.png").compress_type, zipfile.ZIP_STORED)
+
+    def test_streamer_reads_bundle(self):
+        streamer = ArchiveStreamer(self.path)
+        self.assertEqual(sorted(streamer.get_stat_keys()), [("frames", tags.TB_IMAGES), ("loss", tags.TB_SCALARS)])
+        loss = streamer.get_recent_from_key("loss")
+        self.assertEqual([(e.step, e.wall_time, e.value) for e in loss], [(i, 100.0+i, i*0.5) for i in range(5)])
+        frames = streamer.get_recent_from_key("frames")
+        self.assertEqual([e.src_name for e in frames], ["0.png", "1.png"])
+        self.assertEqual(frames[1].encoded_string, PNG_BYTES)
+        # Everything was already read
+        self.assertEqual(streamer.get_recent_from_key("loss"), [])
+        self.assertEqual(len(streamer.get_all_from_tag(tags.TB_SCALARS)["loss"]), 5)
+        streamer.reset_streamer()
+        self.assertEqual(len(streamer.get_recent_from_tag(tags.TB_IMAGES)["frames"]), 2)
+
+    def test_concurrent_passes(self):
+        out_path = os.path.join(self.tmp.name, "concurrent" + os.path.splitext(self.path)[1])
+        errors = []
+        def archive():
+            try:
+                write_archive(self.sim_path, [FolderStreamer(self.sim_path)], out_path)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=archive) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(ArchiveStreamer(out_path).toc, self.toc)
+        self.assertFalse(any(name.endswith(".tmp") for name in os.listdir(self.tmp.name)))
+
+    def test_failed_pass_leaves_no_temp_file(self):
+        class BrokenStreamer(FolderStreamer):
+            def get_stat_keys(self):
+                raise RuntimeError("broken")
+        with self.assertRaises(RuntimeError):
+            write_archive(self.sim_path, [BrokenStreamer(self.sim_path)], self.path + ".2")
+        self.assertFalse(any(name.endswith(".tmp") for name in os.listdir(self.tmp.name)))
@@ -0,0 +1,107 @@
+import unittest
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from gymdash.backend.core.utils.image_grid import tile_images, to_uint8_batch
+from gymdash.backend.core.utils.render_worker import (RenderWorkerPool,
+                                                      render_sample_figure)
+
+logger = logging.getLogger(__name__)
+
+class TestImageGrid(unittest.TestCase):
+
+    def test_uint8_conversion(self):
+        gray = np.ones((4, 1, 5, 6), dtype=np.float32)
+        batch = to_uint8_batch(gray, channels_first=True)
+        self.assertEqual(batch.shape, (4, 5, 6, 3))
+        self.assertEqual(batch.dtype, np.uint8)
+        self.assertTrue(np.all(batch == 255))
+        rgba = np.zeros((2, 5, 6, 4), dtype=np.uint8)
+        self.assertEqual(to_uint8_batch(rgba).shape, (2, 5, 6, 3))
+
+    def test_grid_layout(self):
+        images = np.zeros((5, 10, 8, 3), dtype=np.uint8)
+        grid = tile_images(images, ncols=3, scale=1, padding=1)
+        # 2 rows of 3 cells, each cell padded by 1 on every side
+        self.assertEqual(grid.shape, (2*12, 3*10, 3))
+        # First tile content is copied, last empty cell is background
+        self.assertTrue(np.all(grid[1:11, 1:9] == 0))
+        self.assertTrue(np.all(grid[12:24, 20:30] == 255))
+
+    def test_default_square_grid_and_scale(self):
+        images = np.random.rand(10, 1, 28, 28)
+        grid = tile_images(images, channels_first=True, padding=0)
+        # 10 images -> 4 columns, 3 rows; 28px images upscale by 2
+        self.assertEqual(grid.shape, (3*56, 4*56, 3))
+
+    def test_labels(self):
+        images = np.full((4, 1, 28, 28), 1.0)
+        labelled = tile_images(images, labels=["a", "b", "c", "d"], channels_first=True, label_height=12)
+        unlabelled = tile_images(images, channels_first=True)
+        self.assertEqual(labelled.shape[0], unlabelled.shape[0] + 2*12)
+        self.assertEqual(labelled.shape[1], unlabelled.shape[1])
+        # Label text should darken part of the label strip
+        self.assertTrue(np.any(labelled[2:14] < 255))
+
+def crash_render(payload, out_path):
+    os._exit(1)
+
+class TestRenderWorkerPool(unittest.TestCase):
+
+    def test_render_through_pool(self):
+        pool = RenderWorkerPool(max_workers=1)
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                out_path = os.path.join(folder, "samples", "sample_1.png")
+                payload = {
+                    "images": np.zeros((3, 8, 8, 3), dtype=np.uint8),
+                    "titles": ["a", "b", "c"]
+                }
+                render_time = pool.submit(render_sample_figure, payload, out_path).result(timeout=120)
+                self.assertGreater(render_time, 0)
+                with open(out_path, "rb") as f:
+                    self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+                # Missing "images" fails in the worker without breaking the pool
+                with self.assertRaises(KeyError):
+                    pool.submit(render_sample_figure, {}, out_path).result(timeout=120)
+                # Done callbacks can run just after result() returns
+                deadline = time.monotonic() + 5
+                while pool.get_metrics()["queue_depth"] > 0 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                metrics = pool.get_metrics()
+                self.assertEqual((metrics["completed"], metrics["failed"], metrics["queue_depth"]), (1, 1, 0))
+                self.assertTrue(metrics["running"])
+        finally:
+            pool.shutdown()
+        self.assertFalse(pool.get_metrics()["running"])
+
+    def test_recover_from_broken_pool(self):
+        pool = RenderWorkerPool(max_workers=1)
+        payload = {"images": np.zeros((1, 8, 8, 3), dtype=np.uint8)}
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                out_path = os.path.join(folder, "sample_1.png")
+                with self.assertRaises(BrokenProcessPool):
+                    pool.submit(crash_render, payload, out_path).result(timeout=120)
+                deadline = time.monotonic() + 5
+                while pool.get_metrics()["running"] and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                self.assertFalse(pool.get_metrics()["running"])
+                # Next submit starts a fresh pool
+                self.assertGreater(pool.submit(render_sample_figure, payload, out_path).result(timeout=120), 0)
+                # Broken before its done callbacks ran, submit itself raises
+                pool._get_executor()._broken = "broken for test"
+                self.assertGreater(pool.submit(render_sample_figure, payload, out_path).result(timeout=120), 0)
+                deadline = time.monotonic() + 5
+                while pool.get_metrics()["queue_depth"] > 0 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                metrics = pool.get_metrics()
+                self.assertEqual((metrics["completed"], metrics["failed"], metrics["queue_depth"]), (2, 1, 0))
+        finally:
+            pool.shutdown()
+
+if __name__ == "__main__":
+    unittest.main()
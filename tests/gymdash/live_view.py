@@ -0,0 +1,116 @@
+import unittest
+import logging
+import asyncio
+import io
+import time
+import numpy as np
+from PIL import Image
+from gymdash.backend.core.simulation.live_view import (LIVE_VIEW_BOUNDARY,
+                                                       LiveFrameBuffer,
+                                                       effective_fps,
+                                                       encode_frame,
+                                                       live_view_generator)
+
+logger = logging.getLogger(__name__)
+
+def make_frame(value: int = 0, channels: int = 3) -> np.ndarray:
+    return np.full((8, 12, channels), value, dtype=np.uint8)
+
+class TestLiveFrameBuffer(unittest.TestCase):
+
+    def test_viewers(self):
+        buffer = LiveFrameBuffer()
+        self.assertFalse(buffer.has_viewers)
+        buffer.add_viewer()
+        buffer.add_viewer()
+        self.assertEqual(buffer.num_viewers, 2)
+        buffer.remove_viewer()
+        buffer.remove_viewer()
+        buffer.remove_viewer()
+        self.assertEqual(buffer.num_viewers, 0)
+        buffer.set_num_viewers(-3)
+        self.assertEqual(buffer.num_viewers, 0)
+
+    def test_wants_frame_throttles(self):
+        buffer = LiveFrameBuffer(max_fps=20)
+        # Nobody watching, so nothing is captured
+        self.assertFalse(buffer.wants_frame())
+        buffer.add_viewer()
+        self.assertTrue(buffer.wants_frame())
+        buffer.put(make_frame())
+        self.assertFalse(buffer.wants_frame())
+        time.sleep(0.06)
+        self.assertTrue(buffer.wants_frame())
+        buffer.max_fps = 0
+        buffer.put(make_frame())
+        self.assertTrue(buffer.wants_frame())
+
+    def test_last_viewer_drops_frame(self):
+        buffer = LiveFrameBuffer()
+        buffer.add_viewer()
+        buffer.add_viewer()
+        buffer.put(make_frame(1))
+        buffer.put(make_frame(2))
+        frame_id, frame = buffer.get()
+        self.assertEqual((frame_id, int(frame[0, 0, 0])), (2, 2))
+        buffer.remove_viewer()
+        self.assertIsNotNone(buffer.get()[1])
+        buffer.remove_viewer()
+        self.assertEqual(buffer.get(), (2, None))
+
+    def test_effective_fps(self):
+        buffer = LiveFrameBuffer(max_fps=10)
+        self.assertEqual(effective_fps(buffer, 30), 10)
+        self.assertEqual(effective_fps(buffer, 5), 5)
+        buffer.max_fps = 0
+        self.assertEqual(effective_fps(buffer, 30), 30)
+
+class TestLiveViewStream(unittest.IsolatedAsyncioTestCase):
+
+    def test_encode_frame(self):
+        data = encode_frame(make_frame(200, channels=4), "mjpeg")
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual((image.format, image.mode, image.size), ("JPEG", "RGB", (12, 8)))
+        with Image.open(io.BytesIO(encode_frame(make_frame(), "webp"))) as image:
+            self.assertEqual(image.format, "WEBP")
+
+    async def test_part_framing(self):
+        buffer = LiveFrameBuffer(max_fps=0)
+        buffer.put(make_frame(50))
+        stream = live_view_generator(buffer, fps=50, fmt="mjpeg")
+        part = await asyncio.wait_for(stream.__anext__(), 5)
+        self.assertEqual(buffer.num_viewers, 1)
+        header, body = part.split(b"\r\n\r\n", 1)
+        lines = header.decode("utf-8").split("\r\n")
+        self.assertEqual(lines[0], f"--{LIVE_VIEW_BOUNDARY}")
+        self.assertEqual(lines[1], "Content-Type: image/jpeg")
+        length = int(lines[2].split(": ")[1])
+        self.assertTrue(body.endswith(b"\r\n"))
+        self.assertEqual(len(body), length + 2)
+        self.assertEqual(body[:2], b"\xff\xd8")
+        await stream.aclose()
+        self.assertEqual(buffer.num_viewers, 0)
+
+    async def test_fps_clamped_to_buffer(self):
+        buffer = LiveFrameBuffer(max_fps=5)
+        stop = False
+        stream = live_view_generator(buffer, fps=60, should_stop=lambda: stop)
+        async def produce():
+            for i in range(30):
+                buffer.put(make_frame(i))
+                await asyncio.sleep(0.01)
+        producer = asyncio.create_task(produce())
+        start = time.monotonic()
+        await asyncio.wait_for(stream.__anext__(), 5)
+        await asyncio.wait_for(stream.__anext__(), 5)
+        # Sent at the buffer's 5 fps, not the 60 asked for
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+        await producer
+        stop = True
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(stream.__anext__(), 5)
+        with self.assertRaises(ValueError):
+            await live_view_generator(buffer, fps=0).__anext__()
+
+if __name__ == "__main__":
+    unittest.main()
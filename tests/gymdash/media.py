@@ -0,0 +1,81 @@
+import unittest
+import logging
+import os
+import struct
+import tempfile
+import numpy as np
+from PIL import Image
+from gymdash.backend.core.utils.fmp4 import (completed_fragment_length,
+                                            read_completed_fragments)
+from gymdash.backend.core.utils.media_preview import (MediaPreviewWorker,
+                                                      poster_path,
+                                                      preview_path)
+
+logger = logging.getLogger(__name__)
+
+def box(box_type: str, payload: bytes = b"") -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type.encode("latin-1")) + payload
+
+class TestMediaPreview(unittest.TestCase):
+
+    def test_generate_preview_from_frames(self):
+        frames = [np.full((64, 96, 3), i*8, dtype=np.uint8) for i in range(30)]
+        worker = MediaPreviewWorker(poster_size=48, preview_size=32, preview_frames=6)
+        with tempfile.TemporaryDirectory() as folder:
+            src_path = os.path.join(folder, "rl-video-episode-0_10.mp4")
+            with open(src_path, "wb") as f:
+                f.write(b"not decoded when frames are given")
+            worker.submit(src_path, frames, fps=30)
+            worker.join()
+            with Image.open(poster_path(src_path)) as poster:
+                # Thumbnail keeps the aspect ratio within poster_size
+                self.assertEqual(poster.size, (48, 32))
+                # Poster is the middle frame
+                self.assertEqual(poster.convert("RGB").getpixel((0, 0)), (120, 120, 120))
+            with Image.open(preview_path(src_path)) as preview:
+                self.assertEqual(preview.n_frames, 6)
+                self.assertLessEqual(max(preview.size), 32)
+            # Up-to-date outputs are not regenerated
+            self.assertEqual(worker.submit_missing(folder, r"\.mp4$"), 0)
+            self.assertFalse(any(name.endswith(".tmp") for name in os.listdir(folder)))
+
+
+class TestFragmentedMP4(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "clip.partial.mp4")
+        self.init = box("ftyp", b"isom") + box("moov", b"\0"*16)
+        self.fragment = box("moof", b"\1"*12) + box("mdat", b"\2"*40)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, data: bytes):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_incomplete_init_segment(self):
+        self.write(box("ftyp", b"isom") + box("moov", b"\0"*16)[:10])
+        self.assertEqual(completed_fragment_length(self.path), 0)
+        self.assertEqual(completed_fragment_length(os.path.join(self.folder.name, "missing.mp4")), 0)
+
+    def test_truncated_tail(self):
+        complete = self.init + self.fragment
+        # Only moof of the next fragment written
+        self.write(complete + box("moof", b"\1"*12))
+        self.assertEqual(completed_fragment_length(self.path), len(complete))
+        # mdat cut off partway through its payload
+        self.write(complete + self.fragment[:-5])
+        self.assertEqual(completed_fragment_length(self.path), len(complete))
+        # Next box header itself cut off
+        self.write(complete + self.fragment[:4])
+        self.assertEqual(completed_fragment_length(self.path), len(complete))
+        self.write(complete + self.fragment)
+        self.assertEqual(completed_fragment_length(self.path), len(complete) + len(self.fragment))
+
+    def test_read_from_offset(self):
+        self.write(self.init + self.fragment + self.fragment[:20])
+        data, ready = read_completed_fragments(self.path, len(self.init))
+        self.assertEqual((data, ready), (self.fragment, len(self.init) + len(self.fragment)))
+        self.assertEqual(read_completed_fragments(self.path, ready), (b"", ready))
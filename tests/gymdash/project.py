@@ -0,0 +1,419 @@
+import unittest
+import logging
+import asyncio
+import functools
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from gymdash.backend.project import (AsyncProjectManager, ProjectManager,
+                                     set_column_format)
+from gymdash.backend.core.api.models import ParamFilter, SimulationStartConfig, SimStatus
+from gymdash.backend.enums import SimStatusCode
+from gymdash.backend.core.simulation.base import Simulation
+from gymdash.backend.core.utils.deletion_worker import DeletionWorker
+
+logger = logging.getLogger(__name__)
+
+class StoredSimulation(Simulation):
+    def __init__(self, config: SimulationStartConfig) -> None:
+        super().__init__(config)
+    def _setup(self):
+        pass
+    def _run(self):
+        pass
+
+def make_sim(name: str = "stored", sim_key: str = "stored") -> Simulation:
+    return StoredSimulation(SimulationStartConfig(name=name, sim_key=sim_key, sim_family="test", sim_type="stored", kwargs={"value": 1}))
+
+class TestProjectDatabase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.project_dir = tempfile.mkdtemp()
+        ProjectManager.setup_from_args(SimpleNamespace(
+            no_project=False,
+            project_dir=self.project_dir,
+            db_write_latency=0.2,
+            db_write_batch=64,
+        ))
+    def tearDown(self) -> None:
+        ProjectManager.shutdown()
+        shutil.rmtree(self.project_dir, ignore_errors=True)
+
+    def test_wal_mode(self):
+        con, cur = ProjectManager.get_con()
+        mode = cur.execute("PRAGMA journal_mode;").fetchone()[0]
+        self.assertEqual(mode.lower(), "wal")
+
+    def test_immediate_write_visible(self):
+        sim_id = uuid.uuid4()
+        ProjectManager.add_or_update_simulation_immediate(sim_id, make_sim("immediate"))
+        infos = ProjectManager.get_filtered_simulations(sim_id=sim_id)
+        self.assertEqual(len(infos), 1)
+        self.assertEqual(infos[0].name, "immediate")
+        self.assertEqual(infos[0].config.kwargs, {"value": 1})
+
+    def test_batched_writes(self):
+        sim_ids = [uuid.uuid4() for _ in range(20)]
+        for sim_id in sim_ids:
+            ProjectManager.add_or_update_simulation(sim_id, make_sim())
+        # Nothing is committed until the batch closes
+        self.assertEqual(len(ProjectManager.get_filtered_simulations()), 0)
+        ProjectManager.flush()
+        self.assertEqual(len(ProjectManager.get_filtered_simulations()), len(sim_ids))
+
+    def test_repeated_saves_coalesce(self):
+        sim_id = uuid.uuid4()
+        sim = make_sim("first")
+        ProjectManager.add_or_update_simulation(sim_id, sim)
+        sim.config.name = "second"
+        ProjectManager.add_or_update_simulation(sim_id, sim)
+        ProjectManager.flush()
+        infos = ProjectManager.get_filtered_simulations(sim_id=sim_id)
+        self.assertEqual(len(infos), 1)
+        self.assertEqual(infos[0].name, "second")
+
+    def test_failed_write_keeps_batch(self):
+        def bad_write():
+            con, cur = ProjectManager.get_con()
+            cur.execute("INSERT INTO not_a_table VALUES (1)")
+        sim_id = uuid.uuid4()
+        ProjectManager.add_or_update_simulation(sim_id, make_sim())
+        future = ProjectManager._write(bad_write)
+        ProjectManager.flush()
+        self.assertIsInstance(future.exception(), sqlite3.OperationalError)
+        self.assertEqual(len(ProjectManager.get_filtered_simulations(sim_id=sim_id)), 1)
+
+    def test_latest_status(self):
+        sim_ids = [uuid.uuid4() for _ in range(3)]
+        sims = [make_sim() for _ in sim_ids]
+        for sim_id, sim in zip(sim_ids, sims):
+            sim.add_status(SimStatus(code=SimStatusCode.INFO, details="first"))
+            ProjectManager.add_or_update_simulation(sim_id, sim)
+        ProjectManager.flush()
+        sims[0].add_status(SimStatus(code=SimStatusCode.SUCCESS, details="second"))
+        ProjectManager.add_or_update_simulation_immediate(sim_ids[0], sims[0])
+        missing_id = uuid.uuid4()
+        statuses = ProjectManager.get_latest_statuses([sim_ids[0], str(sim_ids[1]), missing_id])
+        self.assertEqual(set(statuses.keys()), set((str(sim_ids[0]), str(sim_ids[1]), str(missing_id))))
+        self.assertEqual(statuses[str(sim_ids[0])].details, "second")
+        self.assertEqual(statuses[str(sim_ids[1])].details, "first")
+        self.assertIsNone(statuses[str(missing_id)])
+        # Deleting a simulation also removes its latest status
+        ProjectManager.delete_specific_simulations_immediate([str(sim_ids[0])])
+        self.assertNotIn(str(sim_ids[0]), ProjectManager.get_all_latest_statuses())
+
+    def test_latest_status_backfill_skips_deleted(self):
+        for _ in range(2):
+            sim = make_sim()
+            sim.add_status(SimStatus(code=SimStatusCode.INFO, details="first"))
+            ProjectManager.add_or_update_simulation_immediate(uuid.uuid4(), sim)
+        # Keep the deleted simulations' rows around over the restart
+        ProjectManager._deleter.stop()
+        ProjectManager.delete_all_simulations_immediate()
+        ProjectManager.shutdown()
+        ProjectManager.setup_from_args(ProjectManager.args)
+        ProjectManager._deleter.stop()
+        self.assertEqual(ProjectManager.get_all_latest_statuses(), {})
+
+    def test_history_pagination(self):
+        sim_ids = []
+        for i in range(25):
+            sim_id = uuid.uuid4()
+            sim = make_sim(f"sim_{i:02}", "even" if i % 2 == 0 else "odd")
+            sim._meta_cancelled = i % 5 == 0
+            ProjectManager.add_or_update_simulation(sim_id, sim)
+            sim_ids.append(sim_id)
+        ProjectManager.flush()
+        # Walk every page and check the order and that nothing repeats
+        names = []
+        cursor = None
+        while True:
+            page, cursor = ProjectManager.get_simulation_history(limit=10, cursor=cursor, sort_by="name", descending=True)
+            names.extend(info.name for info in page)
+            if cursor is None:
+                break
+        self.assertEqual(names, [f"sim_{i:02}" for i in reversed(range(25))])
+        # Filters combine with AND
+        page, cursor = ProjectManager.get_simulation_history(sim_key="even", cancelled=True)
+        self.assertEqual(sorted(info.name for info in page), ["sim_00", "sim_10", "sim_20"])
+        self.assertIsNone(cursor)
+        # Projection skips the config
+        page, _ = ProjectManager.get_simulation_history(limit=1, fields=["name"])
+        self.assertIsNone(page[0].config)
+        self.assertIsNotNone(page[0].sim_id)
+        with self.assertRaises(ValueError):
+            ProjectManager.get_simulation_history(fields=["not_a_field"])
+
+    def test_compact_column_format(self):
+        json_id, compact_id = uuid.uuid4(), uuid.uuid4()
+        ProjectManager.add_or_update_simulation_immediate(json_id, make_sim("json"))
+        set_column_format("compact")
+        try:
+            ProjectManager.add_or_update_simulation_immediate(compact_id, make_sim("compact"))
+        finally:
+            set_column_format("json")
+        con, cur = ProjectManager.get_con()
+        raw = cur.execute("SELECT CAST(config AS BLOB) FROM simulations WHERE sim_id=?", (compact_id,)).fetchone()[0]
+        self.assertFalse(raw.startswith(b"{"))
+        # Both formats decode the same way
+        configs = ProjectManager.get_simulation_configs([json_id, compact_id])
+        self.assertEqual(configs[str(json_id)]["config"].name, "json")
+        self.assertEqual(configs[str(compact_id)]["config"].name, "compact")
+        self.assertEqual(configs[str(compact_id)]["config"].kwargs, {"value": 1})
+
+    def test_decoded_cache(self):
+        sim_id = uuid.uuid4()
+        sim = make_sim("cached")
+        ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+        first = ProjectManager.get_filtered_simulations(sim_id=sim_id)[0].config
+        second = ProjectManager.get_simulation_configs([sim_id])[str(sim_id)]["config"]
+        self.assertIs(first, second)
+        # Changed rows are decoded again
+        sim.config.name = "changed"
+        ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+        self.assertEqual(ProjectManager.get_filtered_simulations(sim_id=sim_id)[0].config.name, "changed")
+
+    def test_read_during_write(self):
+        # Hold a write transaction open and check that
+        # a reader on another thread is not blocked by it.
+        entered = threading.Event()
+        release = threading.Event()
+        def slow_write():
+            con, cur = ProjectManager.get_con()
+            cur.execute("INSERT INTO api_calls (name, code) VALUES ('slow', 0)")
+            entered.set()
+            release.wait(5)
+        future = ProjectManager._write(slow_write)
+        ProjectManager._writer.submit(lambda: None, urgent=True)
+        self.assertTrue(entered.wait(5))
+        start = time.perf_counter()
+        results = []
+        reader = threading.Thread(target=lambda: results.append(ProjectManager.get_filtered_simulations()))
+        reader.start()
+        reader.join(2)
+        self.assertFalse(reader.is_alive())
+        self.assertLess(time.perf_counter() - start, 1)
+        release.set()
+        future.result(5)
+
+    def test_metric_store(self):
+        sims = { uuid.uuid4(): make_sim(sim_key="metrics") for _ in range(3) }
+        for i, (sim_id, sim) in enumerate(sims.items()):
+            ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+            sim.metric_sink = functools.partial(ProjectManager.add_simulation_metrics, sim_id)
+            for step in range(0, 100, 10 + i):
+                sim.log_metrics({"reward": step * (i + 1), "loss": -step}, step)
+        ProjectManager.flush()
+        self.assertEqual(ProjectManager.get_metric_keys("metrics"), ["loss", "reward"])
+        # Final values of every run in one query
+        last = ProjectManager.get_metrics(["reward"], sim_key="metrics", last_only=True)["reward"]
+        self.assertEqual(len(last), len(sims))
+        for series in last:
+            i = list(sims.keys()).index(series.sim_id)
+            final_step = list(range(0, 100, 10 + i))[-1]
+            self.assertEqual(series.steps, [final_step])
+            self.assertEqual(series.values, [final_step * (i + 1)])
+        # Aligned series share steps, with gaps where a run did not log
+        aligned = ProjectManager.get_metrics(["loss"], align=True)["loss"]
+        self.assertEqual(len({tuple(series.steps) for series in aligned}), 1)
+        self.assertTrue(any(None in series.values for series in aligned))
+        # Thinned series keep their last point
+        thinned = ProjectManager.get_metrics(["loss"], sim_ids=[list(sims.keys())[0]], max_points=4)["loss"]
+        self.assertLessEqual(len(thinned[0].steps), 5)
+        self.assertEqual(thinned[0].steps[-1], 90)
+
+    def test_summary_leaderboard(self):
+        sim_ids = []
+        for i in range(5):
+            sim_id, sim = uuid.uuid4(), make_sim(f"summary{i}")
+            ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+            for step in range(20):
+                sim.log_metric("reward", step * (i % 3), step, wall_time=100 + step)
+            ProjectManager.add_simulation_summaries(sim_id, sim)
+            sim_ids.append(sim_id)
+        ProjectManager.flush()
+        summaries = ProjectManager.get_simulation_summaries([sim_ids[2]])[str(sim_ids[2])]["reward"]
+        self.assertEqual(summaries["final"], 38)
+        self.assertEqual(summaries["maximum"], 38)
+        self.assertEqual(summaries["points"], 20)
+        self.assertAlmostEqual(summaries["mean_last_n"], sum(2*s for s in range(10, 20)) / 10)
+        self.assertAlmostEqual(summaries["steps_per_sec"], 1)
+        # Page through runs ranked by final reward
+        names, cursor = [], None
+        while True:
+            page, cursor = ProjectManager.get_simulation_history(
+                limit=2, cursor=cursor, sort_by="summary", summary_key="reward",
+                descending=True, fields=["name"], include_summaries=True
+            )
+            names.extend(info.name for info in page)
+            self.assertTrue(all("reward" in info.summaries for info in page))
+            if cursor is None:
+                break
+        self.assertEqual(names[0], "summary2")
+        self.assertEqual(sorted(names[1:3]), ["summary1", "summary4"])
+        self.assertEqual(sorted(names[3:5]), ["summary0", "summary3"])
+        with self.assertRaises(ValueError):
+            ProjectManager.get_simulation_history(sort_by="summary")
+
+    def test_config_param_search(self):
+        sim_ids = []
+        for i, algorithm in enumerate(["ppo", "a2c", "ppo", "dqn"]):
+            sim = StoredSimulation(SimulationStartConfig(
+                name=f"param{i}", sim_key="params", sim_family="test", sim_type="stored",
+                kwargs={"algorithm": algorithm, "algorithm_kwargs": {"learning_rate": 10.0**-(i+2)}, "num_steps": 1000*(i+1)}
+            ))
+            sim_ids.append(uuid.uuid4())
+            ProjectManager.add_or_update_simulation(sim_ids[-1], sim)
+        ProjectManager.flush()
+        def names(filters, **kwargs):
+            return [info.name for info in ProjectManager.get_simulations_by_params([ParamFilter(**f) for f in filters], **kwargs)]
+        self.assertEqual(names([{"path": "kwargs.algorithm", "value": "ppo"}]), ["param0", "param2"])
+        self.assertEqual(names([
+            {"path": "kwargs.algorithm", "value": "ppo"},
+            {"path": "kwargs.num_steps", "op": "gt", "value": 1000},
+        ]), ["param2"])
+        self.assertEqual(names([{"path": "kwargs.algorithm_kwargs.learning_rate", "op": "ge", "value": 1e-3}]), ["param0", "param1"])
+        self.assertEqual(names([{"path": "kwargs.algorithm", "op": "in", "value": ["a2c", "dqn"]}], limit=1), ["param1"])
+        with self.assertRaises(ValueError):
+            names([{"path": "kwargs.algorithm", "op": "lt", "value": None}])
+        # Deleted simulations are not found
+        ProjectManager.delete_specific_simulations_immediate([str(sim_ids[0])])
+        self.assertEqual(names([{"path": "kwargs.algorithm", "value": "ppo"}]), ["param2"])
+
+    def test_config_params_written_on_change(self):
+        sim_id, sim = uuid.uuid4(), make_sim()
+        ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+        def mark():
+            con, cur = ProjectManager.get_con()
+            cur.execute("UPDATE sim_config_params SET value_num=-1 WHERE sim_id=? AND path='kwargs.value'", (str(sim_id),))
+        def value():
+            con, cur = ProjectManager.get_con()
+            return cur.execute("SELECT value_num FROM sim_config_params WHERE sim_id=? AND path='kwargs.value'", (str(sim_id),)).fetchone()[0]
+        ProjectManager._writer.run(mark)
+        # Status saves leave the params alone
+        sim.add_status(SimStatus(code=SimStatusCode.INFO, details="running"))
+        ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+        self.assertEqual(value(), -1)
+        # Changing the config reindexes it
+        sim.config.kwargs["value"] = 2
+        ProjectManager.add_or_update_simulation_immediate(sim_id, sim)
+        self.assertEqual(value(), 2)
+
+    def test_background_deletion(self):
+        keep_id, delete_id = uuid.uuid4(), uuid.uuid4()
+        for sim_id in (keep_id, delete_id):
+            ProjectManager.add_or_update_simulation_immediate(sim_id, make_sim())
+        sim_folder = os.path.join(ProjectManager.sims_folder(), str(delete_id))
+        os.makedirs(os.path.join(sim_folder, "media"))
+        for i in range(10):
+            with open(os.path.join(sim_folder, "media", f"{i}.bin"), "wb") as f:
+                f.write(b"0" * 1024)
+        ProjectManager.delete_specific_simulations_immediate([str(delete_id)])
+        # Hidden right away, even before its files are gone
+        remaining = [str(info.sim_id) for info in ProjectManager.get_filtered_simulations()]
+        self.assertEqual(remaining, [str(keep_id)])
+        # Deleted simulations are never saved again
+        ProjectManager.add_or_update_simulation_immediate(delete_id, make_sim())
+        self.assertEqual(len(ProjectManager.get_filtered_simulations()), 1)
+        deadline = time.monotonic() + 10
+        while ProjectManager.get_deletion_status()["pending"] > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(ProjectManager.get_deletion_status()["pending"], 0)
+        self.assertFalse(os.path.exists(sim_folder))
+        con, cur = ProjectManager.get_con()
+        self.assertIsNone(cur.execute("SELECT 1 FROM simulations WHERE sim_id=?", (str(delete_id),)).fetchone())
+
+    def test_deletion_resumes_after_restart(self):
+        sim_id = uuid.uuid4()
+        ProjectManager.add_or_update_simulation_immediate(sim_id, make_sim())
+        sim_folder = os.path.join(ProjectManager.sims_folder(), str(sim_id))
+        os.makedirs(sim_folder)
+        # Shut down before the worker can run
+        ProjectManager._deleter.stop()
+        ProjectManager.delete_all_simulations_immediate()
+        ProjectManager.shutdown()
+        self.assertTrue(os.path.exists(sim_folder))
+        ProjectManager.setup_from_args(ProjectManager.args)
+        deadline = time.monotonic() + 10
+        while os.path.exists(sim_folder) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(os.path.exists(sim_folder))
+        self.assertEqual(len(ProjectManager.get_filtered_simulations()), 0)
+
+class TestDeletionWorker(unittest.TestCase):
+    def test_file_and_missing_entries(self):
+        root = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(root, "stray.bin")
+            with open(file_path, "wb") as f:
+                f.write(b"0" * 100)
+            folder = os.path.join(root, "sim", "media")
+            os.makedirs(folder)
+            open(os.path.join(folder, "0.bin"), "wb").close()
+            pending = [
+                ("file", file_path),
+                ("missing", os.path.join(root, "missing")),
+                ("folder", os.path.join(root, "sim")),
+            ]
+            done = []
+            def complete(key):
+                done.append(key)
+                pending[:] = [entry for entry in pending if entry[0] != key]
+            worker = DeletionWorker(root, lambda n: pending[:n], complete, idle_poll=0.05)
+            worker.start()
+            deadline = time.monotonic() + 10
+            while len(pending) > 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            worker.stop()
+            # A file entry is not retried forever or left blocking the rest
+            self.assertEqual(done, ["file", "missing", "folder"])
+            self.assertEqual(os.listdir(root), [])
+            self.assertEqual((worker.files_deleted, worker.bytes_deleted), (2, 100))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+class TestAsyncProjectDatabase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.project_dir = tempfile.mkdtemp()
+        ProjectManager.setup_from_args(SimpleNamespace(
+            no_project=False,
+            project_dir=self.project_dir,
+            db_write_latency=0.2,
+        ))
+    def tearDown(self) -> None:
+        ProjectManager.shutdown()
+        AsyncProjectManager.shutdown()
+        shutil.rmtree(self.project_dir, ignore_errors=True)
+
+    async def test_reads_and_writes(self):
+        sim_ids = [uuid.uuid4() for _ in range(3)]
+        await asyncio.gather(*[
+            AsyncProjectManager.add_or_update_simulation(sim_id, make_sim()) for sim_id in sim_ids
+        ])
+        infos = await AsyncProjectManager.get_filtered_simulations()
+        self.assertEqual(len(infos), 3)
+        await AsyncProjectManager.delete_specific_simulations([str(sim_ids[0])])
+        page, _ = await AsyncProjectManager.get_simulation_history(fields=["name"])
+        self.assertEqual(set(info.sim_id for info in page), set(sim_ids[1:]))
+
+    async def test_loop_not_blocked(self):
+        # A slow write should not stop other coroutines from running
+        def slow_write():
+            time.sleep(0.5)
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        task = asyncio.create_task(ticker())
+        await AsyncProjectManager._write(slow_write)
+        task.cancel()
+        self.assertGreater(ticks, 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,29 @@
 import unittest
 import logging
 import asyncio
+import os
+import sys
+import tempfile
+import textwrap
+import threading
 import time
 from types import SimpleNamespace
+from uuid import uuid4
 from gymdash.backend.project import ProjectManager
-from gymdash.backend.core.api.models import SimulationStartConfig
-from gymdash.backend.core.simulation.base import Simulation
+from gymdash.backend.core.api.models import (CustomInteractorChannelModel,
+                                             InteractorChannelModel,
+                                             SimulationInteractionModel,
+                                             SimulationStartConfig)
+from gymdash.backend.core.simulation.base import (RPC_QUEUE_SIZE,
+                                                  InteractorRequest,
+                                                  Simulation,
+                                                  SimulationInteractor)
+from gymdash.backend.core.simulation.broadcast import (BACKLOG_SIZE,
+                                                       ControlRequestBroadcaster)
+from gymdash.backend.core.simulation.export import SimulationExporter
 from gymdash.backend.core.simulation.manage import SimulationTracker, SimulationRegistry
+from gymdash.backend.core.simulation.scheduler import ScheduleOptions, SimulationScheduler
+from gymdash.backend.core.simulation.admission import AdmissionController, MachineLoad, ResourceFootprint
 
 logger = logging.getLogger(__name__)
 
@@ -38,10 +55,31 @@ class DemoSimulation(Simulation):
         self.result = f"DemoSimulation({self.runtime}, {self.polltime}) \
                         completed successfully."
 
+class ReportingSimulation(Simulation):
+    """Answers progress and custom queries and logs a metric every poll."""
+    def _setup(self, **kwargs):
+        pass
+
+    def _run(self) -> None:
+        runtime = self.config.kwargs["sim_time"]
+        polltime = self.config.kwargs["poll_time"]
+        timer = 0
+        while timer < runtime:
+            time.sleep(polltime)
+            timer += polltime
+            self.log_metric("timer", timer, int(timer/polltime))
+            self.interactor.set_out_if_in("progress", os.getpid())
+            self.interactor.serve("custom_query", lambda value: (value, os.getpid()))
+
+class FailingStartSimulation(DemoSimulation):
+    def start(self, **kwargs):
+        raise RuntimeError("start failed")
+
 class TestSimulation(unittest.IsolatedAsyncioTestCase):
     @classmethod
     def setUpClass(cls):
         SimulationRegistry.register(SIM_KEY, DemoSimulation)
+        SimulationRegistry.register("reporting", ReportingSimulation)
         ProjectManager.setup_from_args(SimpleNamespace(no_project=True))
     def setUp(self) -> None:
         self.tracker = SimulationTracker()
@@ -77,9 +115,280 @@ class TestSimulation(unittest.IsolatedAsyncioTestCase):
         self.assertNotEqual(self.tracker.get_sim(id), None, f"Tried to get simulation from returned ID '{id}', but the SimulationTracker returned nothing.")
         self.assertEqual(self.tracker.get_sim(id).is_done, True, f"SimulationTracker said simulation was no longer running, but Simulation's 'is_done' flag is False.")
         self.assertNotEqual(self.tracker.get_sim(id).result, "DemoSimulation(5, 0.1) completed successfully.", f"The completed simulation's result should have been 'DemoSimulation(5, 0.1) completed successfully.', but instead it was '{self.tracker.get_sim(id).result}'")
-        
-    
+    async def test_query_resolves_on_answer(self):
+        id, sim = self.tracker.start_sim(SimulationStartConfig(
+            name="Reporting", sim_key="reporting", kwargs={"sim_time": 0.5, "poll_time": 0.01}
+        ))
+        start = time.monotonic()
+        response = await self.tracker.fulfill_query_interaction(SimulationInteractionModel(
+            id=str(id), timeout=5, progress=InteractorChannelModel(triggered=True)
+        ))
+        # Answered within a few simulation polls, not a fixed query tick
+        self.assertLess(time.monotonic() - start, 0.15)
+        self.assertEqual(response["progress"], os.getpid())
+        self.assertFalse(sim.interactor.has_pending)
+        await self.tracker.stop_simulation(id)
+        while self.tracker.any_running(id):
+            await asyncio.sleep(0.01)
+    async def test_concurrent_queries(self):
+        id, sim = self.tracker.start_sim(SimulationStartConfig(
+            name="Reporting", sim_key="reporting", kwargs={"sim_time": 0.5, "poll_time": 0.01}
+        ))
+        responses = await asyncio.gather(*(
+            self.tracker.fulfill_query_interaction(SimulationInteractionModel(
+                id=str(id), timeout=5,
+                progress=InteractorChannelModel(triggered=True),
+                custom_query=CustomInteractorChannelModel(triggered=True, value=i),
+            ))
+            for i in range(20)
+        ))
+        # Each query gets the reply to its own value
+        self.assertEqual([response["custom_query"] for response in responses], [(i, os.getpid()) for i in range(20)])
+        self.assertTrue(all(response["progress"] == os.getpid() for response in responses))
+        self.assertFalse(sim.interactor.has_pending)
+        await self.tracker.stop_simulation(id)
+        while self.tracker.any_running(id):
+            await asyncio.sleep(0.01)
+        # Finished simulations give up new requests instead of hanging
+        self.assertEqual(await sim.interactor.request("progress", timeout=None), (False, None))
+    async def test_control_request_stream(self):
+        id, sim = self.tracker.create_simulation(SimulationStartConfig(
+            name="Paused", sim_key=SIM_KEY, kwargs={"sim_time": 0, "poll_time": 0.1}
+        ))
+        # Made before anyone listens, so kept for the first subscriber
+        sim.interactor.add_control_request("custom_query", "before")
+        stream = self.tracker.control_request_generator()
+        message = await asyncio.wait_for(stream.__anext__(), 1)
+        self.assertIn("before", message)
+        self.assertFalse(sim.interactor.has_requests)
+        # Pushed from the simulation thread without any polling delay
+        start = time.monotonic()
+        threading.Timer(0.05, sim.interactor.add_control_request, ("custom_query", "pause point")).start()
+        message = await asyncio.wait_for(stream.__anext__(), 1)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertTrue(message.startswith("event: retrieval\n"))
+        self.assertIn(str(id), message)
+        self.assertIn("pause point", message)
+        self.tracker.stop()
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(stream.__anext__(), 1)
+        self.assertEqual(self.tracker.control_requests.num_subscribers, 0)
+    async def test_control_request_keepalive(self):
+        stream = self.tracker.control_request_generator(keepalive=0.05)
+        self.assertEqual(await asyncio.wait_for(stream.__anext__(), 1), ": keep-alive\n\n")
+        await stream.aclose()
+        self.assertEqual(self.tracker.control_requests.num_subscribers, 0)
+    async def test_subscribe_after_close_with_full_backlog(self):
+        broadcaster = ControlRequestBroadcaster()
+        for i in range(BACKLOG_SIZE):
+            broadcaster.publish(uuid4(), i)
+        broadcaster.close()
+        queue = broadcaster.subscribe()
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        self.assertEqual(len(items), BACKLOG_SIZE + 1)
+        self.assertIsNone(items[-1])
+    async def test_queue_runs_concurrently(self):
+        self.tracker.scheduler.configure(slots=2, cpu_budget=8)
+        queued = [
+            self.tracker.queue_sim(SimulationStartConfig(
+                name=f"Queued {i}", sim_key=SIM_KEY, kwargs={"sim_time": 0.3, "poll_time": 0.1}
+            ))[0]
+            for i in range(3)
+        ]
+        self.assertEqual(self.tracker.scheduler.num_running, 2)
+        self.assertEqual(self.tracker.scheduler.queued_ids(), [queued[2]])
+        while self.tracker.any_running(queued) or len(self.tracker.scheduler) > 0:
+            await asyncio.sleep(0.05)
+        self.assertTrue(all(self.tracker.get_sim(id).is_done for id in queued))
+        self.assertEqual(self.tracker.scheduler.num_running, 0)
+
+    async def test_failed_launch_frees_slot(self):
+        self.tracker.scheduler.configure(slots=1)
+        config = SimulationStartConfig(name="Fails", sim_key=SIM_KEY, kwargs={"sim_time": 0.1, "poll_time": 0.05})
+        failed_id, failed = self.tracker.queue_sim(FailingStartSimulation(config))
+        self.assertTrue(failed._meta_failed)
+        self.assertIs(self.tracker.get_sim(failed_id), failed)
+        self.assertEqual(self.tracker.scheduler.num_running, 0)
+        # The failed launch does not hold the only slot
+        started_id, _ = self.tracker.queue_sim(config)
+        self.assertTrue(self.tracker.any_running([started_id]))
+        while self.tracker.any_running([started_id]):
+            await asyncio.sleep(0.05)
+
+
+class TestSimulationProcess(unittest.IsolatedAsyncioTestCase):
+
+    async def test_process_relay(self):
+        sim = ReportingSimulation(SimulationStartConfig(
+            name="Process Sim", sim_key="process_test", kwargs={"sim_time": 3, "poll_time": 0.05}
+        ))
+        sim.execution_mode = "process"
+        sim.start()
+        sim.interactor.set_in("progress", True)
+        # Child startup imports the package, so allow it some time
+        for _ in range(400):
+            if sim.interactor.channels["progress"].outgoing.triggered:
+                break
+            await asyncio.sleep(0.05)
+        triggered, pid = sim.interactor.get_out("progress")
+        self.assertTrue(triggered)
+        self.assertNotEqual(pid, os.getpid())
+        replied, (value, pid) = await sim.interactor.request("custom_query", "ping", 20)
+        self.assertTrue(replied)
+        self.assertEqual(value, "ping")
+        self.assertNotEqual(pid, os.getpid())
+        while not sim.is_done:
+            await asyncio.sleep(0.05)
+        self.assertFalse(sim._meta_failed)
+        self.assertGreater(len(sim.retrieve_new_metrics()), 0)
+        self.assertEqual(sim.process.process.exitcode, 0)
+
+    async def test_path_loaded_simulation(self):
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "path_sims.py")
+            with open(file_path, "w") as f:
+                f.write(textwrap.dedent("""
+                    import os
+                    from gymdash.backend.core.simulation.base import Simulation
+
+                    class PathLoadedSimulation(Simulation):
+                        def _setup(self, **kwargs):
+                            pass
+
+                        def _run(self) -> None:
+                            self.log_metric("pid", os.getpid(), 0)
+                """))
+            try:
+                # Loaded the way exported simulations are, not importable by name
+                module = SimulationExporter.import_from_path(SimulationExporter.DEFAULT_MODULE_NAME, file_path)
+                sim = module.PathLoadedSimulation(SimulationStartConfig(
+                    name="Path Sim", sim_key="path_test", kwargs={}
+                ))
+                sim.execution_mode = "process"
+                sim.start()
+                for _ in range(400):
+                    if sim.is_done:
+                        break
+                    await asyncio.sleep(0.05)
+            finally:
+                sys.modules.pop(SimulationExporter.DEFAULT_MODULE_NAME, None)
+        self.assertTrue(sim.is_done)
+        self.assertFalse(sim._meta_failed)
+        self.assertEqual(sim.process.process.exitcode, 0)
+        self.assertGreater(len(sim.retrieve_new_metrics()), 0)
+
+
+class TestInteractorRequests(unittest.TestCase):
+
+    def test_bounded_queue_and_matching(self):
+        interactor = SimulationInteractor()
+        requests = [InteractorRequest("custom_query", i % 2) for i in range(RPC_QUEUE_SIZE)]
+        self.assertTrue(all(interactor.submit(request) for request in requests))
+        full = InteractorRequest("custom_query", 0)
+        self.assertFalse(interactor.submit(full))
+        self.assertTrue(full.done and not full.replied)
+        self.assertFalse(interactor.submit(InteractorRequest("no_such_channel")))
+        # Only requests with a matching value are answered
+        self.assertTrue(interactor.set_out_if_in_value("custom_query", "odd", 1))
+        self.assertEqual([request.response for request in requests if request.replied], ["odd"]*(RPC_QUEUE_SIZE//2))
+        self.assertEqual(interactor.get_in("custom_query"), (True, 0))
+        self.assertTrue(interactor.reply_to(requests[2].request_id, "two"))
+        self.assertFalse(interactor.reply_to(requests[2].request_id, "again"))
+        self.assertEqual(requests[2].response, "two")
+        interactor.close()
+        self.assertFalse(interactor.has_pending)
+        self.assertTrue(all(request.done for request in requests))
+        self.assertFalse(requests[0].replied)
+
+    def test_has_input(self):
+        interactor = SimulationInteractor()
+        self.assertFalse(interactor.has_input)
+        self.assertFalse(interactor.set_out_if_in("progress", 1))
+        interactor.set_in("progress", True)
+        self.assertTrue(interactor.has_input)
+        self.assertTrue(interactor.set_out_if_in("progress", 1))
+        interactor.reset_incoming_channels(["progress"])
+        self.assertFalse(interactor.has_input)
+        interactor.submit(InteractorRequest("stop_simulation"))
+        self.assertTrue(interactor.has_input)
+        self.assertTrue(interactor.set_out_if_in("stop_simulation", True))
+        self.assertFalse(interactor.has_input)
+
+    def test_wait_for_input(self):
+        interactor = SimulationInteractor()
+        self.assertIsNone(interactor.wait_any(("progress", "custom_query"), timeout=0.05))
+        self.assertEqual(interactor.wait_for_in("custom_query", timeout=0.05), (False, None))
+        request = InteractorRequest("custom_query", "go")
+        timer = threading.Timer(0.1, interactor.submit, (request,))
+        start = time.monotonic()
+        timer.start()
+        self.assertEqual(interactor.wait_any(("progress", "custom_query")), "custom_query")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(interactor.wait_for_in("custom_query", timeout=0), (True, "go"))
+        interactor.set_out("custom_query", "went")
+        self.assertEqual(request.response, "went")
+        timer = threading.Timer(0.1, interactor.set_in, ("stop_simulation", True))
+        timer.start()
+        self.assertEqual(interactor.wait_any(("stop_simulation", "custom_query")), "stop_simulation")
+
+
+class TestSimulationScheduler(unittest.TestCase):
+
+    def test_priority_and_fifo_order(self):
+        scheduler = SimulationScheduler(slots=1)
+        for id, priority in (("a", 0), ("b", 5), ("c", 0), ("d", 5)):
+            scheduler.push(id, None, {}, ScheduleOptions(priority=priority))
+        order = []
+        while len(scheduler) > 0:
+            (id, _, _), = scheduler.pop_ready()
+            order.append(id)
+            scheduler.release(id)
+        self.assertEqual(order, ["b", "d", "a", "c"])
+
+    def test_resource_budgets(self):
+        scheduler = SimulationScheduler(slots=4, cpu_budget=4, memory_budget_mb=1000)
+        scheduler.push("big", None, {}, ScheduleOptions(cpu_threads=3))
+        scheduler.push("wide", None, {}, ScheduleOptions(cpu_threads=2))
+        scheduler.push("small", None, {}, ScheduleOptions(cpu_threads=1))
+        # "wide" does not fit next to "big", and "small" may not skip ahead of it
+        self.assertEqual([entry[0] for entry in scheduler.pop_ready()], ["big"])
+        scheduler.release("big")
+        self.assertEqual([entry[0] for entry in scheduler.pop_ready()], ["wide", "small"])
+        scheduler.release("wide")
+        scheduler.release("small")
+        # Runs over budget on their own still start when nothing else runs
+        scheduler.push("huge", None, {}, ScheduleOptions(memory_mb=5000))
+        scheduler.push("next", None, {}, ScheduleOptions(memory_mb=10))
+        self.assertEqual([entry[0] for entry in scheduler.pop_ready()], ["huge"])
+        self.assertIsNotNone(scheduler.remove("next"))
+        self.assertEqual(len(scheduler), 0)
+
+    def test_admission_control(self):
+        load = MachineLoad(cpu_percent=0, memory_available_mb=4000)
+        admission = AdmissionController(
+            min_cpu_idle_percent=0, min_memory_available_mb=1000,
+            footprint_loader=lambda: {"big": ResourceFootprint(memory_mb=2500, cpu_percent=100)},
+            sampler=lambda: load,
+        )
+        # Footprints are loaded up front, never from inside admit()
+        self.assertIsNone(admission.get_footprint("big"))
+        admission.load_footprints()
+        scheduler = SimulationScheduler(slots=8, cpu_budget=64, admission=admission)
+        big = SimpleNamespace(config=SimpleNamespace(sim_key="big"))
+        small = SimpleNamespace(config=SimpleNamespace(sim_key="small"))
+        for id, sim in (("big1", big), ("big2", big), ("small1", small)):
+            scheduler.push(id, sim, {}, ScheduleOptions(memory_mb=100))
+        # The first big run is still warming up, so its footprint is
+        # reserved and a second one would leave under 1000MB available
+        self.assertEqual([entry[0] for entry in scheduler.pop_ready()], ["big1"])
+        self.assertEqual(scheduler.pop_ready(), [])
+        # Footprints blend towards new runs, but memory keeps the newest peak
+        learned = admission.learn("big", memory_mb=500, cpu_percent=50)
+        self.assertEqual(learned.runs, 2)
+        self.assertAlmostEqual(learned.memory_mb, 2500 - 0.3*2000)
+        self.assertAlmostEqual(learned.cpu_percent, 85)
+        self.assertEqual(admission.learn("big", memory_mb=3000, cpu_percent=85).memory_mb, 3000)
 
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
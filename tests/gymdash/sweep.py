@@ -0,0 +1,198 @@
+import unittest
+import logging
+import asyncio
+import functools
+import time
+from types import SimpleNamespace
+from pydantic import ValidationError
+from gymdash.backend.project import ProjectManager
+from gymdash.backend.core.api.models import (EarlyStoppingConfig,
+                                             SimulationStartConfig,
+                                             SweepConfig, SweepParameter)
+from gymdash.backend.core.simulation.base import Simulation
+from gymdash.backend.core.simulation.manage import SimulationRegistry, SimulationTracker
+from gymdash.backend.core.simulation.early_stop import (AsyncSuccessiveHalving,
+                                                        MedianStopping)
+from gymdash.backend.core.simulation.sweep import (apply_assignment,
+                                                   expand_search_space,
+                                                   search_space_size)
+
+logger = logging.getLogger(__name__)
+
+class SleepSimulation(Simulation):
+    def _setup(self, **kwargs):
+        pass
+
+    def _run(self) -> None:
+        time.sleep(self.config.kwargs["sim_time"])
+
+class ScoringSimulation(Simulation):
+    """Logs its quality as the score every step until stopped."""
+    def _setup(self, **kwargs):
+        pass
+
+    def _run(self) -> None:
+        for step in range(1, 31):
+            time.sleep(0.02)
+            self.log_metric("score", self.config.kwargs["quality"], step)
+            if self.interactor.set_out_if_in("stop_simulation", True):
+                self.set_cancelled()
+                return
+
+class PickySimulation(SleepSimulation):
+    def __init__(self, config: SimulationStartConfig) -> None:
+        if config.kwargs["sim_time"] < 0:
+            raise ValueError("sim_time must not be negative")
+        super().__init__(config)
+
+def make_sweep(strategy, parameters, **kwargs):
+    return SweepConfig(
+        name="sweep",
+        base_config=SimulationStartConfig(name="base", sim_key="sweep_sleep", kwargs={"sim_time": 0.1, "alg": {"gamma": 0.9}}),
+        parameters=parameters,
+        strategy=strategy,
+        **kwargs
+    )
+
+class TestSweepExpansion(unittest.TestCase):
+
+    def test_grid(self):
+        sweep = make_sweep("grid", {
+            "alg.lr":   SweepParameter(low=1e-4, high=1e-2, scale="log", grid_points=3),
+            "alg.algo": SweepParameter(values=["ppo", "a2c"]),
+        })
+        assignments = expand_search_space(sweep)
+        self.assertEqual(len(assignments), 6)
+        self.assertEqual(sorted(set(round(a["alg.lr"], 6) for a in assignments)), [1e-4, 1e-3, 1e-2])
+        config = apply_assignment(sweep.base_config, assignments[0], "run")
+        # Dotted paths are set inside nested kwargs without touching the base
+        self.assertEqual(config.kwargs["alg"], {"gamma": 0.9, "lr": assignments[0]["alg.lr"], "algo": "ppo"})
+        self.assertNotIn("lr", sweep.base_config.kwargs["alg"])
+        with self.assertRaises(ValueError):
+            expand_search_space(make_sweep("grid", {"alg.lr": SweepParameter(low=0, high=1)}))
+
+    def test_size_limit(self):
+        # 10^12 configurations are rejected without being built
+        huge = make_sweep("grid", { f"p{i}": SweepParameter(low=0, high=1, grid_points=100) for i in range(6) })
+        self.assertEqual(search_space_size(huge), 100**6)
+        with self.assertRaises(ValueError):
+            expand_search_space(huge, max_configs=1000)
+        with self.assertRaises(ValueError):
+            expand_search_space(make_sweep("random", {"x": SweepParameter(low=0, high=1)}, num_samples=11), max_configs=10)
+        self.assertEqual(len(expand_search_space(make_sweep("random", {"x": SweepParameter(low=0, high=1)}, num_samples=11), max_configs=0)), 11)
+        for bad in ({"num_samples": 0}, {"max_parallel": -1}):
+            with self.assertRaises(ValidationError):
+                make_sweep("random", {"x": SweepParameter(low=0, high=1)}, **bad)
+        with self.assertRaises(ValidationError):
+            SweepParameter(low=0, high=1, grid_points=-2)
+
+    def test_latin_hypercube_covers_strata(self):
+        sweep = make_sweep("latin_hypercube", {
+            "x": SweepParameter(low=0, high=1),
+            "n": SweepParameter(low=0, high=9, integer=True),
+        }, num_samples=10, seed=3)
+        assignments = expand_search_space(sweep)
+        self.assertEqual(sorted(int(a["x"]*10) for a in assignments), list(range(10)))
+        self.assertTrue(all(isinstance(a["n"], int) for a in assignments))
+        # Seeded searches are reproducible
+        self.assertEqual(assignments, expand_search_space(sweep))
+        random_sweep = make_sweep("random", {"x": SweepParameter(low=2, high=3)}, num_samples=5, seed=1)
+        self.assertTrue(all(2 <= a["x"] < 3 for a in expand_search_space(random_sweep)))
+
+
+class TestEarlyStopping(unittest.TestCase):
+
+    def test_asha_keeps_top_fraction(self):
+        policy = AsyncSuccessiveHalving(EarlyStoppingConfig(metric="score", min_step=1, reduction_factor=2))
+        decisions = {}
+        for run, value in (("a", 1), ("b", 0.5), ("c", 2), ("d", 1.5)):
+            policy.observe(run, 1, value)
+            decisions[run] = policy.should_stop(run)
+        self.assertEqual(decisions, {"a": False, "b": True, "c": False, "d": False})
+        # Next rung is at step 2, judged on the value reported there
+        policy.observe("a", 3, 0)
+        policy.observe("c", 2, 3)
+        self.assertFalse(policy.should_stop("c"))
+        self.assertTrue(policy.should_stop("a"))
+
+    def test_policy_sees_every_logged_point(self):
+        policy = AsyncSuccessiveHalving(EarlyStoppingConfig(metric="score", min_step=2, max_step=2, reduction_factor=2))
+        for run, value in (("a", 1), ("b", 2)):
+            policy.observe(run, 2, value)
+            self.assertFalse(policy.should_stop(run))
+        sim = ScoringSimulation(SimulationStartConfig(name="fast", sim_key="sweep_scoring", kwargs={"quality": 0}))
+        sim.add_metric_listener("score", functools.partial(policy.observe, "c"))
+        # Best at the rung, worst by the time anyone checks
+        sim.log_metric("score", 3, 2)
+        for step in range(3, 11):
+            sim.log_metrics({"score": 0, "other": 5}, step)
+        self.assertEqual(sim.latest_metric("score"), (10, 0))
+        self.assertFalse(policy.should_stop("c"))
+
+    def test_median_rule(self):
+        policy = MedianStopping(EarlyStoppingConfig(policy="median", metric="loss", mode="min", min_step=2, min_runs=2))
+        for run in ("a", "b"):
+            for step in range(1, 5):
+                policy.observe(run, step, 1.0)
+        policy.observe("c", 1, 5.0)
+        # Still in its grace period
+        self.assertFalse(policy.should_stop("c"))
+        policy.observe("c", 3, 4.0)
+        self.assertTrue(policy.should_stop("c"))
+        policy.observe("d", 3, 0.5)
+        self.assertFalse(policy.should_stop("d"))
+
+
+class TestSweepRun(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        SimulationRegistry.register("sweep_sleep", SleepSimulation)
+        SimulationRegistry.register("sweep_scoring", ScoringSimulation)
+        SimulationRegistry.register("sweep_picky", PickySimulation)
+        ProjectManager.setup_from_args(SimpleNamespace(no_project=True))
+
+    async def test_bounded_parallelism(self):
+        tracker = SimulationTracker()
+        tracker.scheduler.configure(slots=4, cpu_budget=8)
+        sweep = tracker.start_sweep(make_sweep("grid", {
+            "sim_time": SweepParameter(values=[0.1, 0.2, 0.1, 0.2, 0.1]),
+        }, max_parallel=2))
+        progress = sweep.progress(tracker)
+        self.assertEqual((progress.total, progress.pending, progress.running), (5, 3, 2))
+        most_running = 0
+        while not sweep.is_done(tracker):
+            most_running = max(most_running, len(tracker.running_sim_map))
+            await asyncio.sleep(0.02)
+        self.assertEqual(most_running, 2)
+        progress = sweep.progress(tracker)
+        self.assertEqual((progress.finished, progress.fraction_done), (5, 1))
+        self.assertEqual(sorted(a["sim_time"] for a in progress.assignments.values()), [0.1, 0.1, 0.1, 0.2, 0.2])
+
+    async def test_early_stopping_sweep(self):
+        tracker = SimulationTracker()
+        tracker.scheduler.configure(slots=4, cpu_budget=8)
+        config = make_sweep("grid", {"quality": SweepParameter(values=[0.1, 0.4, 0.2, 0.9])},
+            early_stopping=EarlyStoppingConfig(metric="score", min_step=4, reduction_factor=2))
+        config.base_config.sim_key = "sweep_scoring"
+        sweep = tracker.start_sweep(config)
+        while not sweep.is_done(tracker):
+            tracker.update_sweeps()
+            await asyncio.sleep(0.01)
+        progress = sweep.progress(tracker)
+        self.assertGreater(progress.stopped_early, 0)
+        self.assertEqual(progress.fraction_done, 1)
+        best = next(sim_id for sim_id, a in progress.assignments.items() if a["quality"] == 0.9)
+        self.assertNotIn(best, sweep.stopped)
+        self.assertEqual(sweep.sims[best].latest_metric("score"), (30, 0.9))
+
+    async def test_failed_creation_counts_as_invalid(self):
+        tracker = SimulationTracker()
+        tracker.scheduler.configure(slots=4, cpu_budget=8)
+        config = make_sweep("grid", {"sim_time": SweepParameter(values=[0.05, -1, 0.05])})
+        config.base_config.sim_key = "sweep_picky"
+        sweep = tracker.start_sweep(config)
+        self.assertIs(tracker.get_sweep(sweep.id), sweep)
+        self.assertEqual((sweep.num_invalid, len(sweep.ids)), (1, 2))
+        while not sweep.is_done(tracker):
+            await asyncio.sleep(0.02)
+        self.assertEqual(sweep.progress(tracker).finished, 2)